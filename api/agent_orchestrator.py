@@ -1,6 +1,8 @@
 from __future__ import annotations
 from typing import Dict, Any, List, Tuple
 
+from api.workflow_compiler import compile_template, render
+
 # We will call your existing runtime function from api/app.py:
 # _run_and_log(skill_id, inp, tenant_id)
 # To avoid circular imports, we will import at runtime inside functions.
@@ -21,19 +23,21 @@ DEFAULT_WORKFLOWS = {
     ]
 }
 
+# step templates parsed once per workflow (api/workflow_compiler.py)
+_COMPILED: Dict[str, List[Tuple[str, Any]]] = {}
+
+def _compiled(workflow_id: str) -> List[Tuple[str, Any]]:
+    steps = _COMPILED.get(workflow_id)
+    if steps is None:
+        steps = _COMPILED[workflow_id] = [(skill_id, compile_template(t)) for skill_id, t in DEFAULT_WORKFLOWS[workflow_id]]
+    return steps
+
 def _render(template: Any, memory: Dict[str, Any]) -> Any:
-    # Replace "{key}" in strings using memory dict.
-    if isinstance(template, str):
-        out = template
-        for k, v in memory.items():
-            if isinstance(v, (str, int, float)):
-                out = out.replace("{"+k+"}", str(v))
-        return out
-    if isinstance(template, dict):
-        return {k: _render(v, memory) for k, v in template.items()}
-    if isinstance(template, list):
-        return [_render(x, memory) for x in template]
-    return template
+    # Fill "{key}" slots from memory; keys that are missing or not scalars stay as written.
+    def fill(k: str) -> str:
+        v = memory.get(k)
+        return str(v) if isinstance(v, (str, int, float)) else "{" + k + "}"
+    return render(template, fill)
 
 def run_workflow(workflow_id: str, tenant_id: str, inputs: Dict[str, Any]) -> Dict[str, Any]:
     if workflow_id not in DEFAULT_WORKFLOWS:
@@ -46,7 +50,7 @@ def run_workflow(workflow_id: str, tenant_id: str, inputs: Dict[str, Any]) -> Di
     # Import runtime lazily to avoid circular import
     from api.app import _run_and_log
 
-    for step_idx, (skill_id, payload_template) in enumerate(DEFAULT_WORKFLOWS[workflow_id], start=1):
+    for step_idx, (skill_id, payload_template) in enumerate(_compiled(workflow_id), start=1):
         # Render input with memory
         payload = _render(payload_template, memory)
         if not isinstance(payload, dict):
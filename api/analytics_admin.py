@@ -0,0 +1,71 @@
+from __future__ import annotations
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException
+from api.security_deps import require_role
+from api.billing_analytics import ANALYTICS
+from db.analytics_rollups import ANALYTICS_ROLLUPS
+
+router = APIRouter(prefix="/admin/analytics", tags=["analytics-admin"])
+
+@router.get("/spend/hourly")
+def spend_hourly(since: Optional[str] = None, until: Optional[str] = None, tenant_id: Optional[str] = None,
+                 skill_id: Optional[str] = None, claims: dict = Depends(require_role("admin"))):
+    try:
+        rows = ANALYTICS.spend_histogram(since, until, bucket_sec=3600, tenant_id=tenant_id, skill_id=skill_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"count": len(rows), "buckets": rows}
+
+@router.get("/latency")
+def latency(since: Optional[str] = None, until: Optional[str] = None, skill_id: Optional[str] = None,
+            claims: dict = Depends(require_role("admin"))):
+    try:
+        rows = ANALYTICS.latency_percentiles(since, until, skill_id=skill_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"count": len(rows), "skills": rows}
+
+@router.get("/top-tenants")
+def top_tenants(since: Optional[str] = None, until: Optional[str] = None, n: int = 10, by: str = "gross_usd",
+                skill_id: Optional[str] = None, claims: dict = Depends(require_role("admin"))):
+    try:
+        rows = ANALYTICS.top_tenants(since, until, n=n, by=by, skill_id=skill_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"count": len(rows), "tenants": rows}
+
+@router.get("/stats")
+def stats(claims: dict = Depends(require_role("admin"))):
+    return ANALYTICS.stats()
+
+# usage / audit rollups (db/analytics_rollups.py); source = "usage" | "audit".
+# Filters that don't apply to a source (action for audit, route for usage) are a 400.
+@router.get("/{source}/series")
+def rollup_series(source: str, since: Optional[str] = None, until: Optional[str] = None, grain: Optional[str] = None,
+                  tenant_id: Optional[str] = None, device_id: Optional[str] = None, action: Optional[str] = None,
+                  route: Optional[str] = None, claims: dict = Depends(require_role("admin"))):
+    try:
+        return ANALYTICS_ROLLUPS.timeseries(source, since, until, grain=grain, tenant_id=tenant_id,
+                                            device_id=device_id, action=action, route=route)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/{source}/top")
+def rollup_top(source: str, by: str, metric: Optional[str] = None, n: int = 10, min_count: int = 1,
+               since: Optional[str] = None, until: Optional[str] = None, grain: Optional[str] = None,
+               tenant_id: Optional[str] = None, device_id: Optional[str] = None, action: Optional[str] = None,
+               route: Optional[str] = None, claims: dict = Depends(require_role("admin"))):
+    # e.g. /admin/analytics/audit/top?by=route&metric=error_rate&min_count=20
+    #      /admin/analytics/usage/top?by=action&metric=credits
+    #      /admin/analytics/audit/top?by=device_id&since=<an hour ago>
+    metric = metric or ("events" if source == "usage" else "requests")
+    try:
+        return ANALYTICS_ROLLUPS.top(source, by, metric, n=n, since=since, until=until, grain=grain,
+                                     min_count=min_count, tenant_id=tenant_id, device_id=device_id,
+                                     action=action, route=route)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/rollups/stats")
+def rollup_stats(claims: dict = Depends(require_role("admin"))):
+    return ANALYTICS_ROLLUPS.stats()
@@ -1,15 +1,19 @@
 from fastapi import FastAPI, HTTPException, Depends
 from api.device_deps import require_device_token
 from fastapi.responses import JSONResponse
-from jose import jwt, JWTError
 from fastapi import Request
-from db.audit_db import write_audit
-from db.rate_limit_db import check_rate_limit
+from db.audit_db import enqueue_audit, AUDIT_WRITER
+from db.audit_partitions import AUDIT_PARTITIONS
+from db.analytics_rollups import ANALYTICS_ROLLUPS
+from api.workflow_runs import RUNS as WORKFLOW_RUNS
+from db.migrations import migrate
+from db.rate_limit_db import check_rate_limit, RATE_LIMITER
 from api.kill_switch import is_blocked
 import traceback
 from api.auth import router as auth_router
 from api.audit_api import router as audit_router
 from api.rate_admin import router as rate_admin_router
+from api.analytics_admin import router as analytics_admin_router
 from api.kill_admin import router as kill_admin_router
 from api.submissions_dev import router as submissions_dev_router
 from api.submissions_admin import router as submissions_admin_router
@@ -18,11 +22,15 @@ from api.workflows_run import router as workflows_run_router
 from api.rag_api import router as rag_router
 from api.security_deps import require_access
 from api.workflow_store import create_workflow, submit_workflow, list_workflows
-from api.billing_ledger import record_event
+from api.invocation import SkillInvocation
+from api.ledger_store import LEDGER
+from api.billing_rollups import ROLLUPS
+from api.review_log import REVIEW_LOG
+from api.review_stats import REVIEW_STATS
+from api.wallet_service import InsufficientCredits
 from api.reviews_store import add_review, list_reviews, rating_summary
 from sdk.skill_registry import SKILL_IMPLS
 from registry.governance import enforce
-from registry.wallet import charge_wallet
 from api.wallet_api import router as wallet_router, admin_router as usage_admin_router
 from api.rag_api import router as rag_router
 app = FastAPI(title="AI-Pass Skills API")
@@ -38,28 +46,38 @@ async def all_exception_handler(request, exc):
 
 
 app.include_router(auth_router)
+app.include_router(audit_router)
 app.include_router(kill_admin_router)
+app.include_router(analytics_admin_router)
 app.include_router(submissions_dev_router)
 app.include_router(submissions_admin_router)
 app.include_router(tenant_install_router)
 app.include_router(workflows_run_router)
-# -----------------------
-# Audit Middleware (logs ALL requests)
-# -----------------------
-JWT_SECRET = "CHANGE_ME_SUPER_SECRET"
-JWT_ALG = "HS256"
-
 # ===============================
 # Audit + Rate Limit Middleware (CLEAN VERSION)
 # ===============================
-from fastapi.responses import JSONResponse
-from jose import jwt, JWTError
-from db.audit_db import write_audit
-from db.rate_limit_db import check_rate_limit
-from api.kill_switch import is_blocked
-
-JWT_SECRET = "CHANGE_ME_SUPER_SECRET"
-JWT_ALG = "HS256"
+from api.auth_context import resolve_auth, get_auth
+
+@app.on_event("startup")
+def _start_audit_writer():
+    migrate()           # pending schema migrations (db/migrations.py)
+    AUDIT_WRITER.start()
+    AUDIT_PARTITIONS.start()
+    ANALYTICS_ROLLUPS.start()
+    WORKFLOW_RUNS.start_persistence()
+
+@app.on_event("shutdown")
+def _stop_audit_writer():
+    # flush whatever is still queued before the process exits
+    AUDIT_WRITER.stop()
+    AUDIT_PARTITIONS.stop()
+    ANALYTICS_ROLLUPS.stop()
+    WORKFLOW_RUNS.stop()
+    RATE_LIMITER.stop()
+    LEDGER.close()
+    ROLLUPS.persist()
+    REVIEW_LOG.close()
+    REVIEW_STATS.persist()
 
 @app.middleware("http")
 async def audit_middleware(request: Request, call_next):
@@ -68,31 +86,11 @@ async def audit_middleware(request: Request, call_next):
     if request.url.path in ("/docs", "/openapi.json", "/favicon.ico"):
         return await call_next(request)
 
-    tenant_id = "unknown"
-    user_id = "unknown"
-    device_id = "unknown"
-
-    # Parse access token
-    auth = request.headers.get("authorization", "")
-    if auth.lower().startswith("bearer "):
-        token = auth.split(" ", 1)[1].strip()
-        try:
-            claims = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALG])
-            if claims.get("type") == "access":
-                tenant_id = claims.get("tenant_id", tenant_id)
-                user_id = claims.get("sub", user_id)
-        except JWTError:
-            pass
-
-    # Parse device token
-    dtok = request.headers.get("device-token", "")
-    if dtok:
-        try:
-            dclaims = jwt.decode(dtok, JWT_SECRET, algorithms=[JWT_ALG])
-            if dclaims.get("type") == "device":
-                device_id = dclaims.get("device_id", device_id)
-        except JWTError:
-            pass
+    # Verify access + device tokens once; dependencies read request.state.auth
+    auth = resolve_auth(request)
+    tenant_id = auth.tenant_id
+    user_id = auth.user_id
+    device_id = auth.device_id
 
     ip = request.client.host if request.client else "unknown"
     route = request.url.path
@@ -105,8 +103,10 @@ async def audit_middleware(request: Request, call_next):
 
 # ===== RATE LIMIT =====
     runtime_paths = ("/skills/", "/agents/run", "/workflows/run", "/rag/")
+    rl_headers = {}
     if route.startswith(runtime_paths) or route in runtime_paths:
         rl = check_rate_limit(tenant_id, device_id, f"{method} {route}", cost=1)
+        rl_headers = rl.get("headers") or {}
         if not rl.get("allowed", False):
             return JSONResponse(
                 status_code=429,
@@ -114,7 +114,8 @@ async def audit_middleware(request: Request, call_next):
                     "detail": "Rate limited",
                     "reason": rl.get("reason"),
                     "retry_after": rl.get("retry_after")
-                }
+                },
+                headers={**rl_headers, "Retry-After": str(rl.get("retry_after") or 60)}
             )
 
     # ===== CALL ENDPOINT =====
@@ -123,6 +124,7 @@ async def audit_middleware(request: Request, call_next):
         resp = await call_next(request)
         ok = 200 <= resp.status_code < 400
         status_code = resp.status_code
+        resp.headers.update(rl_headers)
         return resp
     except Exception as e:
         ok = False
@@ -130,9 +132,9 @@ async def audit_middleware(request: Request, call_next):
         err = f"{type(e).__name__}: {e}"
         raise
     finally:
-        # ===== AUDIT LOG =====
+        # ===== AUDIT LOG (batched, off the request path) =====
         try:
-            write_audit({
+            enqueue_audit({
                 "tenant_id": tenant_id,
                 "user_id": user_id,
                 "device_id": device_id,
@@ -159,7 +161,7 @@ async def unhandled_exception_handler(request, exc):
 # -----------------------
 # SAFE runtime wrapper
 # -----------------------
-def _run_and_log_safe(skill_id: str, inp: dict, tenant_id: str):
+def _run_and_log_safe(skill_id: str, inp: dict, tenant_id: str, request: Request | None = None):
     import time
     skill_cls = SKILL_IMPLS.get(skill_id)
     if not skill_cls:
@@ -178,32 +180,19 @@ def _run_and_log_safe(skill_id: str, inp: dict, tenant_id: str):
     data = result.to_dict() if hasattr(result, 'to_dict') else (result.dict() if hasattr(result, 'dict') else result.__dict__)
     data["latency_ms"] = int((time.time() - start) * 1000)
 
-    if data.get("ok"):
-        credits = int(data.get("output", {}).get("_credits", 1))
-        charge_wallet(tenant_id, credits)
-        data["charged_credits"] = credits
-        try:
-            record_event(tenant_id, skill_id, ctx.get("version","unknown"), credits, latency_ms=data["latency_ms"])
-        except Exception:
-            pass
-
-    # Audit log (best-effort)
+    # charge + billing + usage + audit: one transaction
+    auth = get_auth(request) if request is not None else None
+    inv = SkillInvocation(
+        tenant_id, skill_id, ctx.get("version") or "unknown",
+        user_id=auth.user_id if auth else "unknown",
+        device_id=auth.device_id if auth else "unknown",
+        ip=request.client.host if request is not None and request.client else "unknown",
+        route=str(request.url.path) if request is not None else "",
+    )
     try:
-        ip = request.client.host if request and request.client else 'unknown'
-        write_audit({
-            'tenant_id': (claims or {}).get('tenant_id', tenant_id),
-            'user_id': (claims or {}).get('sub', 'unknown'),
-            'device_id': (device or {}).get('device_id', 'unknown'),
-            'ip': ip,
-            'route': str(request.url.path) if request else '',
-            'action': 'SKILL_RUN',
-            'target_id': skill_id,
-            'ok': bool(data.get('ok', False)),
-            'credits': int(data.get('charged_credits', 0)),
-            'error': data.get('error')
-        })
-    except Exception:
-        pass
+        inv.commit(data)
+    except InsufficientCredits as e:
+        raise HTTPException(status_code=402, detail=str(e))
     return data
 
 # -----------------------
@@ -217,21 +206,21 @@ def health():
 # Skills (Tenant only)
 # -----------------------
 @app.post("/skills/summarize")
-def summarize(inp: dict, claims: dict = Depends(require_access), device: dict = Depends(require_device_token)):
+def summarize(inp: dict, request: Request, claims: dict = Depends(require_access), device: dict = Depends(require_device_token)):
     inp["tenant_id"] = claims["tenant_id"]
-    return _run_and_log_safe("summarize", inp, tenant_id=claims["tenant_id"])
+    return _run_and_log_safe("summarize", inp, tenant_id=claims["tenant_id"], request=request)
 
 @app.post("/skills/translate")
-def translate(inp: dict, claims: dict = Depends(require_access), device: dict = Depends(require_device_token)):
-    return _run_and_log_safe("translate", inp, tenant_id=claims["tenant_id"])
+def translate(inp: dict, request: Request, claims: dict = Depends(require_access), device: dict = Depends(require_device_token)):
+    return _run_and_log_safe("translate", inp, tenant_id=claims["tenant_id"], request=request)
 
 @app.post("/skills/clean_text")
-def clean_text(inp: dict, claims: dict = Depends(require_access), device: dict = Depends(require_device_token)):
-    return _run_and_log_safe("clean_text", inp, tenant_id=claims["tenant_id"])
+def clean_text(inp: dict, request: Request, claims: dict = Depends(require_access), device: dict = Depends(require_device_token)):
+    return _run_and_log_safe("clean_text", inp, tenant_id=claims["tenant_id"], request=request)
 
 @app.post("/skills/pii_redactor")
-def pii_redactor(inp: dict, claims: dict = Depends(require_access), device: dict = Depends(require_device_token)):
-    return _run_and_log_safe("pii_redactor", inp, tenant_id=claims["tenant_id"])
+def pii_redactor(inp: dict, request: Request, claims: dict = Depends(require_access), device: dict = Depends(require_device_token)):
+    return _run_and_log_safe("pii_redactor", inp, tenant_id=claims["tenant_id"], request=request)
 
 # -----------------------
 # Workflows
@@ -251,10 +240,10 @@ def root():
 
 
 @app.post("/debug/summarize")
-def debug_summarize(inp: dict, claims: dict = Depends(require_access)):
+def debug_summarize(inp: dict, request: Request, claims: dict = Depends(require_access)):
     try:
         inp["tenant_id"] = claims["tenant_id"]
-        return _run_and_log_safe("summarize", inp, tenant_id=claims["tenant_id"])
+        return _run_and_log_safe("summarize", inp, tenant_id=claims["tenant_id"], request=request)
     except Exception as e:
         import traceback
         return {"ok": False, "error": str(e), "trace": traceback.format_exc()}
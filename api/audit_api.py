@@ -2,7 +2,10 @@ from __future__ import annotations
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from db.database import SessionLocal
-from db.models import AuditLog
+from db.models import AuditLog, AuditRollup
+from db.audit_db import AUDIT_WRITER
+from db.audit_partitions import AUDIT_PARTITIONS
+from db.pagination import keyset_page
 from api.security_deps import require_role
 
 router = APIRouter(prefix="/audit", tags=["audit"])
@@ -15,11 +18,71 @@ def _db():
         db.close()
 
 @router.get("/recent")
-def recent(limit: int = 50, claims: dict = Depends(require_role("admin")), db: Session = Depends(_db)):
-    rows = db.query(AuditLog).order_by(AuditLog.ts.desc()).limit(min(limit, 200)).all()
-    return {"count": len(rows), "logs": [{
+def recent(limit: int = 50, cursor: str | None = None, tenant_id: str | None = None,
+           action: str | None = None, route: str | None = None,
+           since: str | None = None, until: str | None = None,
+           claims: dict = Depends(require_role("admin")), db: Session = Depends(_db)):
+    # open partition only, newest first; pass next_cursor back as ?cursor= for the following page.
+    # closed partitions are served by /audit/archive and /audit/rollups
+    q = db.query(AuditLog)
+    if tenant_id:
+        q = q.filter(AuditLog.tenant_id == tenant_id)
+    if action:
+        q = q.filter(AuditLog.action == action)
+    if route:
+        q = q.filter(AuditLog.route == route)
+    if since:
+        q = q.filter(AuditLog.ts >= since)
+    if until:
+        q = q.filter(AuditLog.ts <= until)
+    try:
+        rows, next_cursor = keyset_page(q, (AuditLog.ts, AuditLog.audit_id), cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"count": len(rows), "next_cursor": next_cursor, "logs": [{
         "audit_id": r.audit_id, "ts": r.ts,
         "tenant_id": r.tenant_id, "user_id": r.user_id, "device_id": r.device_id,
         "ip": r.ip, "route": r.route, "action": r.action, "target_id": r.target_id,
         "ok": r.ok, "credits": r.credits, "error": r.error
     } for r in rows]}
+
+@router.get("/writer/stats")
+def writer_stats(claims: dict = Depends(require_role("admin"))):
+    return {"ok": True, "writer": AUDIT_WRITER.stats()}
+
+@router.get("/partitions")
+def partitions(claims: dict = Depends(require_role("admin"))):
+    return {"ok": True, **AUDIT_PARTITIONS.stats(), "partitions": AUDIT_PARTITIONS.index()["partitions"]}
+
+@router.get("/archive")
+def archive(period: str, limit: int = 100, tenant_id: str | None = None, action: str | None = None,
+            route: str | None = None, since: str | None = None, until: str | None = None,
+            claims: dict = Depends(require_role("admin"))):
+    # oldest first within each close pass of a partition
+    match = {k: v for k, v in (("tenant_id", tenant_id), ("action", action), ("route", route)) if v}
+    limit = max(1, min(limit, 1000))
+    logs = []
+    try:
+        for r in AUDIT_PARTITIONS.read_archive(period, since=since, until=until, **match):
+            logs.append(r)
+            if len(logs) >= limit:
+                break
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"no archived audit partition {period}")
+    return {"count": len(logs), "period": period, "logs": logs}
+
+@router.get("/rollups")
+def rollups(period: str | None = None, tenant_id: str | None = None, route: str | None = None,
+            claims: dict = Depends(require_role("admin")), db: Session = Depends(_db)):
+    q = db.query(AuditRollup)
+    if period:
+        q = q.filter(AuditRollup.period == period)
+    if tenant_id:
+        q = q.filter(AuditRollup.tenant_id == tenant_id)
+    if route:
+        q = q.filter(AuditRollup.route == route)
+    rows = q.order_by(AuditRollup.period.desc(), AuditRollup.tenant_id, AuditRollup.route).limit(1000).all()
+    return {"count": len(rows), "rollups": [{
+        "period": r.period, "tenant_id": r.tenant_id, "route": r.route,
+        "requests": r.requests, "errors": r.errors, "credits": r.credits,
+    } for r in rows]}
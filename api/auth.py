@@ -5,6 +5,7 @@ from passlib.context import CryptContext
 from sqlalchemy.orm import Session
 from db.database import SessionLocal
 from db.models import User, Device
+from db.device_cache import DEVICE_CACHE, bump_version, publish_change
 from pathlib import Path
 import uuid
 import time
@@ -18,6 +19,9 @@ ADMIN_POLICY = REG / "admin_policy.json"
 
 # ---- security settings (MVP) ----
 from api.config import JWT_SECRET, JWT_ALG, ACCESS_TTL_SEC, DEVICE_TTL_SEC   # later: move to env var
+from api.auth_context import verify_jwt
+# one shared implementation, so FastAPI resolves it once per request
+from api.security_deps import require_access, require_role
 
 pwd = CryptContext(schemes=["argon2", "bcrypt"], deprecated="auto")
 
@@ -77,26 +81,10 @@ def make_device_token(device: Device) -> str:
 
 def decode_token(token: str) -> dict:
     try:
-        return jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALG])
+        return verify_jwt(token)
     except JWTError as e:
         raise HTTPException(status_code=401, detail=f"Invalid token: {e}")
 
-def require_access(authorization: str | None = Header(default=None)) -> dict:
-    if not authorization or not authorization.lower().startswith("bearer "):
-        raise HTTPException(status_code=401, detail="Missing Bearer token")
-    token = authorization.split(" ", 1)[1].strip()
-    data = decode_token(token)
-    if data.get("type") != "access":
-        raise HTTPException(status_code=401, detail="Not an access token")
-    return data
-
-def require_role(role: str):
-    def _dep(claims: dict = Depends(require_access)) -> dict:
-        if claims.get("role") != role:
-            raise HTTPException(status_code=403, detail=f"Requires role={role}")
-        return claims
-    return _dep
-
 def require_admin_or_dev(claims: dict = Depends(require_access)) -> dict:
     if claims.get("role") not in ("admin", "developer"):
         raise HTTPException(status_code=403, detail="Requires admin or developer role")
@@ -236,5 +224,32 @@ def rotate_device(payload: dict, device_token: str | None = Header(default=None)
 
     new_token = make_device_token(d)
     db.add(d)
+    bump_version(db)
     db.commit()
+    DEVICE_CACHE.invalidate(device_id)
+    publish_change()
     return {"ok": True, "device_id": device_id, "device_token": new_token}
+
+@router.post("/device/deactivate")
+def deactivate_device(payload: dict, claims: dict = Depends(require_access), db: Session = Depends(db_session)):
+    """
+    payload: { device_id }
+    Owner (or an admin) revokes a device; all its tokens stop working.
+    """
+    device_id = payload.get("device_id","")
+    if not device_id:
+        raise HTTPException(status_code=400, detail="device_id required")
+
+    d = db.query(Device).filter(Device.device_id == device_id).first()
+    if not d:
+        raise HTTPException(status_code=404, detail="Device not found")
+    if claims.get("role") != "admin" and (d.tenant_id != claims.get("tenant_id") or d.user_id != claims.get("sub")):
+        raise HTTPException(status_code=403, detail="Not your device")
+
+    d.is_active = False
+    d.current_jti = ""
+    bump_version(db)
+    db.commit()
+    DEVICE_CACHE.invalidate(device_id)
+    publish_change()
+    return {"ok": True, "device_id": device_id, "is_active": False}
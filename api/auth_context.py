@@ -0,0 +1,136 @@
+"""
+Single auth stage: the middleware verifies the Bearer + Device-Token JWTs once
+and stores the result on request.state.auth; dependencies only read it.
+Verified tokens are kept in a bounded TTL cache (never past their own exp).
+"""
+from __future__ import annotations
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi import Request
+from jose import jwt, JWTError
+
+from api.config import JWT_SECRET, JWT_ALG, TOKEN_CACHE_TTL_SEC, TOKEN_CACHE_MAX_ENTRIES
+
+
+class TokenCache:
+    """Bounded LRU of token -> (claims, expires_at). Entries never outlive the token's own `exp`."""
+
+    def __init__(self, ttl_sec: int = TOKEN_CACHE_TTL_SEC, max_entries: int = TOKEN_CACHE_MAX_ENTRIES):
+        self.ttl_sec = ttl_sec
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            item = self._data.get(token)
+            if item is None:
+                self.misses += 1
+                return None
+            claims, expires_at = item
+            if expires_at <= now:
+                del self._data[token]
+                self.misses += 1
+                return None
+            self._data.move_to_end(token)
+            self.hits += 1
+            return claims
+
+    def put(self, token: str, claims: Dict[str, Any]) -> None:
+        expires_at = time.time() + self.ttl_sec
+        exp = claims.get("exp")
+        if isinstance(exp, (int, float)):
+            expires_at = min(expires_at, float(exp))
+        with self._lock:
+            self._data[token] = (claims, expires_at)
+            self._data.move_to_end(token)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self._data), "max_entries": self.max_entries, "hits": self.hits, "misses": self.misses}
+
+
+TOKEN_CACHE = TokenCache()
+
+
+def verify_jwt(token: str) -> Dict[str, Any]:
+    """Decode + verify a JWT, using the shared cache. Raises JWTError on failure."""
+    claims = TOKEN_CACHE.get(token)
+    if claims is None:
+        claims = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALG])
+        TOKEN_CACHE.put(token, claims)
+    return claims
+
+
+@dataclass(frozen=True)
+class AuthContext:
+    access: Optional[Dict[str, Any]] = None
+    access_error: Optional[str] = None      # 401 detail when access is None
+    device: Optional[Dict[str, Any]] = None
+    device_error: Optional[str] = None      # 401 detail when device is None
+
+    @property
+    def tenant_id(self) -> str:
+        return (self.access or {}).get("tenant_id", "unknown")
+
+    @property
+    def user_id(self) -> str:
+        return (self.access or {}).get("sub", "unknown")
+
+    @property
+    def device_id(self) -> str:
+        return (self.device or {}).get("device_id", "unknown")
+
+
+def _verify_access(authorization: str) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    if not authorization or not authorization.lower().startswith("bearer "):
+        return None, "Missing Bearer token"
+    token = authorization.split(" ", 1)[1].strip()
+    try:
+        claims = verify_jwt(token)
+    except JWTError as e:
+        return None, f"Invalid token: {e}"
+    if claims.get("type") != "access":
+        return None, "Not an access token"
+    return claims, None
+
+
+def _verify_device(device_token: str) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    if not device_token:
+        return None, "Missing Device-Token header"
+    try:
+        claims = verify_jwt(device_token)
+    except JWTError as e:
+        return None, f"Invalid device token: {e}"
+    if claims.get("type") != "device":
+        return None, "Not a device token"
+    return claims, None
+
+
+def resolve_auth(request: Request) -> AuthContext:
+    """Verify both tokens once and attach the result to request.state.auth."""
+    access, access_error = _verify_access(request.headers.get("authorization", ""))
+    device, device_error = _verify_device(request.headers.get("device-token", ""))
+    ctx = AuthContext(access=access, access_error=access_error, device=device, device_error=device_error)
+    request.state.auth = ctx
+    return ctx
+
+
+def get_auth(request: Request) -> AuthContext:
+    """Shared context for dependencies; resolves lazily if the middleware was skipped."""
+    ctx = getattr(request.state, "auth", None)
+    if ctx is None:
+        ctx = resolve_auth(request)
+    return ctx
@@ -0,0 +1,295 @@
+"""
+Columnar analytics over the billing ledger (api/ledger_store.py).
+
+Each ledger segment is decoded once into NumPy columns:
+    ts (epoch s), tenant, developer, skill, version (int32 dictionary codes),
+    credits (int64), gross (int64 micro-USD), latency_ms (float64, NaN if unknown)
+
+Sealed segments never change, so their columns are cached in memory and as
+registry/ledger/seg-XXXXXXXX.cols.npz; only the tail of the active segment is
+parsed on each query. Queries are vectorized over the columns they need (boolean
+time mask + bincount / integer sort + partition), so a window over tens of
+millions of events costs a few array passes instead of a JSON scan.
+"""
+from __future__ import annotations
+import calendar
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from api.ledger_store import LEDGER, SegmentedLedger, seg_file
+from api.billing_rollups import micros
+
+DIMS = ("tenant_id", "developer_id", "skill_id", "version")
+
+
+def iso_to_epoch(ts: Optional[str]) -> Optional[int]:
+    if not ts:
+        return None
+    return calendar.timegm(time.strptime(ts[:19], "%Y-%m-%dT%H:%M:%S"))
+
+
+def epoch_to_iso(sec: int) -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(int(sec)))
+
+
+class Dictionary:
+    """Append-only string <-> int32 code table shared by all segments."""
+
+    def __init__(self):
+        self.values: List[str] = []
+        self.codes: Dict[str, int] = {}
+
+    def code(self, value: str) -> int:
+        c = self.codes.get(value)
+        if c is None:
+            c = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return c
+
+    def remap(self, local_values: Sequence[str]) -> np.ndarray:
+        return np.array([self.code(v) for v in local_values], dtype=np.int32)
+
+    def lookup(self, value: str) -> int:
+        return self.codes.get(value, -1)
+
+
+class Columns:
+    __slots__ = ("ts", "tenant_id", "developer_id", "skill_id", "version", "credits", "gross", "latency")
+
+    def __init__(self, **cols: np.ndarray):
+        for k in self.__slots__:
+            setattr(self, k, cols[k])
+
+    def __len__(self) -> int:
+        return len(self.ts)
+
+    @classmethod
+    def empty(cls) -> "Columns":
+        i32 = np.empty(0, dtype=np.int32)
+        return cls(ts=np.empty(0, dtype=np.int64), tenant_id=i32, developer_id=i32, skill_id=i32, version=i32,
+                   credits=np.empty(0, dtype=np.int64), gross=np.empty(0, dtype=np.int64),
+                   latency=np.empty(0, dtype=np.float64))
+
+    @classmethod
+    def concat(cls, parts: List["Columns"]) -> "Columns":
+        if not parts:
+            return cls.empty()
+        return cls(**{k: np.concatenate([getattr(p, k) for p in parts]) for k in cls.__slots__})
+
+
+def _decode(events: List[Dict[str, Any]]) -> Tuple[Dict[str, np.ndarray], Dict[str, List[str]]]:
+    """Events -> columns with segment-local dictionary codes."""
+    local: Dict[str, Dict[str, int]] = {d: {} for d in DIMS}
+    cols: Dict[str, List[int]] = {d: [] for d in DIMS}
+    for e in events:
+        for d in DIMS:
+            v = e.get(d) or ""
+            table = local[d]
+            c = table.get(v)
+            if c is None:
+                c = table[v] = len(table)
+            cols[d].append(c)
+    n = len(events)
+    ts = np.array([(e.get("ts") or "1970-01-01T00:00:00")[:19] for e in events], dtype="datetime64[s]").astype(np.int64) if n else np.empty(0, dtype=np.int64)
+    arrays = {
+        "ts": ts,
+        "credits": np.fromiter((int(e.get("credits", 0)) for e in events), dtype=np.int64, count=n),
+        "gross": np.fromiter((micros(e.get("gross_usd")) for e in events), dtype=np.int64, count=n),
+        "latency": np.fromiter((np.nan if e.get("latency_ms") is None else float(e["latency_ms"]) for e in events),
+                               dtype=np.float64, count=n),
+    }
+    for d in DIMS:
+        arrays[d] = np.array(cols[d], dtype=np.int32)
+    return arrays, {d: list(local[d]) for d in DIMS}
+
+
+class BillingAnalytics:
+    def __init__(self, ledger: SegmentedLedger = LEDGER, disk_cache: bool = True):
+        self.ledger = ledger
+        self.disk_cache = disk_cache
+        self._lock = threading.Lock()
+        self.dicts = {d: Dictionary() for d in DIMS}
+        self._sealed: Dict[str, Columns] = {}
+        self._sealed_all: Optional[Columns] = None
+        self._sealed_names: Tuple[str, ...] = ()
+        self._tail_name: Optional[str] = None
+        self._tail_offset = 0
+        self._tail_parts: List[Columns] = []
+
+    # ---------- loading ----------
+    def _globalize(self, arrays: Dict[str, np.ndarray], values: Dict[str, List[str]]) -> Columns:
+        for d in DIMS:
+            mapping = self.dicts[d].remap(values[d])
+            arrays[d] = mapping[arrays[d]] if len(arrays[d]) else arrays[d]
+        return Columns(**arrays)
+
+    def _load_sealed(self, entry: Dict[str, Any]) -> Columns:
+        name = entry["name"]
+        path = self.ledger.dir / seg_file(entry)
+        npz = path.with_suffix(".cols.npz")
+        if self.disk_cache and npz.exists() and npz.stat().st_mtime_ns >= path.stat().st_mtime_ns:
+            with np.load(npz, allow_pickle=False) as z:
+                arrays = {k: z[k] for k in Columns.__slots__}
+                values = {d: [str(v) for v in z[f"dict_{d}"]] for d in DIMS}
+        else:
+            arrays, values = _decode([e for _, e in self.ledger.read_segment(name)])
+            if self.disk_cache:
+                tmp = npz.with_name(npz.name + ".tmp.npz")
+                np.savez(tmp, **arrays, **{f"dict_{d}": np.array(values[d], dtype=str) for d in DIMS})
+                tmp.replace(npz)
+        return self._globalize(arrays, values)
+
+    def _refresh(self) -> List[Columns]:
+        self.ledger.ensure()
+        segs = self.ledger.segments()
+        # keyed by revision file: a re-rated segment is decoded again
+        entries = {seg_file(s): s for s in segs if s.get("sealed")}
+        sealed = tuple(entries)
+        active = next((s["name"] for s in segs if not s.get("sealed")), None)
+
+        if sealed != self._sealed_names:
+            for name in sealed:
+                if name not in self._sealed:
+                    self._sealed[name] = self._load_sealed(entries[name])
+            for name in list(self._sealed):
+                if name not in sealed:
+                    del self._sealed[name]
+            self._sealed_all = Columns.concat([self._sealed[n] for n in sealed])
+            self._sealed_names = sealed
+
+        if active != self._tail_name:
+            self._tail_name, self._tail_offset, self._tail_parts = active, 0, []
+        if active is not None:
+            events, end = [], self._tail_offset
+            for end, e in self.ledger.read_segment(active, self._tail_offset):
+                events.append(e)
+            if events:
+                self._tail_parts.append(self._globalize(*_decode(events)))
+                self._tail_parts = [Columns.concat(self._tail_parts)]
+                self._tail_offset = end
+
+        return [p for p in [self._sealed_all] + self._tail_parts if p is not None and len(p)]
+
+    def _window(self, since: Optional[str], until: Optional[str], fields: Sequence[str],
+                **match: Optional[str]) -> Dict[str, np.ndarray]:
+        """Only the requested columns, restricted to [since, until] and the exact-match filters."""
+        with self._lock:
+            parts = self._refresh()
+            codes = {d: self.dicts[d].lookup(v) for d, v in match.items() if v is not None}
+        lo, hi = iso_to_epoch(since), iso_to_epoch(until)
+        out: Dict[str, List[np.ndarray]] = {f: [] for f in fields}
+        for cols in parts:
+            mask = None
+            if lo is not None:
+                mask = cols.ts >= lo
+            if hi is not None:
+                mask = (cols.ts <= hi) if mask is None else (mask & (cols.ts <= hi))
+            for d, code in codes.items():
+                m = getattr(cols, d) == code
+                mask = m if mask is None else (mask & m)
+            for f in fields:
+                # filter each part before concatenating: never copy unused columns
+                col = getattr(cols, f)
+                out[f].append(col if mask is None else col[mask])
+        empty = Columns.empty()
+        return {f: (np.concatenate(v) if len(v) > 1 else v[0]) if v else getattr(empty, f) for f, v in out.items()}
+
+    # ---------- queries ----------
+    def spend_histogram(self, since: Optional[str] = None, until: Optional[str] = None,
+                        bucket_sec: int = 3600, tenant_id: Optional[str] = None,
+                        skill_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        c = self._window(since, until, ("ts", "credits", "gross"), tenant_id=tenant_id, skill_id=skill_id)
+        if not len(c["ts"]):
+            return []
+        b = c["ts"] // bucket_sec
+        first = int(b.min())
+        inv = b - first          # dense bucket offsets: O(n) bincount, no sort
+        events = np.bincount(inv)
+        credits = np.bincount(inv, weights=c["credits"])
+        gross = np.bincount(inv, weights=c["gross"])
+        used = np.flatnonzero(events)
+        return [{
+            "bucket": epoch_to_iso((first + k) * bucket_sec),
+            "events": int(events[k]),
+            "credits": int(credits[k]),
+            "gross_usd": round(float(gross[k]) / 1_000_000, 6),
+        } for k in used.tolist()]
+
+    def latency_percentiles(self, since: Optional[str] = None, until: Optional[str] = None,
+                            skill_id: Optional[str] = None,
+                            percentiles: Sequence[float] = (50, 95, 99)) -> List[Dict[str, Any]]:
+        c = self._window(since, until, ("skill_id", "version", "latency"), skill_id=skill_id)
+        lat, skill, ver = c["latency"], c["skill_id"], c["version"]
+        nan = np.isnan(lat)
+        if nan.any():
+            ok = ~nan
+            lat, skill, ver = lat[ok], skill[ok], ver[ok]
+        if not len(lat):
+            return []
+        nv = len(self.dicts["version"].values) + 1
+        group = skill * nv + ver
+        if group.max() < 2 ** 16:
+            group = group.astype(np.uint16)
+        # stable sort on a 16-bit key is a radix sort (linear); each group is then
+        # a contiguous slice of `lat`, partitioned in place around the needed ranks
+        lat = lat[np.argsort(group, kind="stable")]
+        counts = np.bincount(group)
+        starts = np.r_[0, np.cumsum(counts)[:-1]]
+        q = np.asarray(percentiles, dtype=np.float64) / 100.0
+
+        skills, versions = self.dicts["skill_id"].values, self.dicts["version"].values
+        out = []
+        for g in np.flatnonzero(counts).tolist():
+            n = int(counts[g])
+            seg = lat[starts[g]:starts[g] + n]
+            # linear interpolation between closest ranks (np.percentile's default)
+            pos = (n - 1) * q
+            lo = np.floor(pos).astype(np.int64)
+            hi = np.minimum(lo + 1, n - 1)
+            seg.partition(np.unique(np.r_[lo, hi]))
+            values = seg[lo] + (seg[hi] - seg[lo]) * (pos - lo)
+            row = {"skill_id": skills[g // nv], "version": versions[g % nv], "count": n}
+            for p, v in zip(percentiles, values.tolist()):
+                row[f"p{p:g}"] = round(float(v), 3)
+            out.append(row)
+        return out
+
+    def top_tenants(self, since: Optional[str] = None, until: Optional[str] = None,
+                    n: int = 10, by: str = "gross_usd", skill_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        c = self._window(since, until, ("tenant_id", "credits", "gross"), skill_id=skill_id)
+        if not len(c["tenant_id"]):
+            return []
+        size = len(self.dicts["tenant_id"].values)
+        events = np.bincount(c["tenant_id"], minlength=size)
+        credits = np.bincount(c["tenant_id"], weights=c["credits"], minlength=size)
+        gross = np.bincount(c["tenant_id"], weights=c["gross"], minlength=size)
+        metric = {"gross_usd": gross, "credits": credits, "events": events}.get(by)
+        if metric is None:
+            raise ValueError("by must be one of gross_usd, credits, events")
+        n = max(0, min(int(n), int((events > 0).sum())))
+        if n == 0:
+            return []
+        top = np.argpartition(-metric, n - 1)[:n]
+        top = top[np.lexsort((top, -metric[top]))]
+        names = self.dicts["tenant_id"].values
+        return [{
+            "tenant_id": names[t],
+            "events": int(events[t]),
+            "credits": int(credits[t]),
+            "gross_usd": round(float(gross[t]) / 1_000_000, 6),
+        } for t in top.tolist()]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sealed_segments": len(self._sealed_names),
+            "sealed_rows": len(self._sealed_all) if self._sealed_all is not None else 0,
+            "tail_segment": self._tail_name,
+            "tail_rows": sum(len(p) for p in self._tail_parts),
+            "dictionary_sizes": {d: len(self.dicts[d].values) for d in DIMS},
+        }
+
+
+ANALYTICS = BillingAnalytics()
@@ -0,0 +1,220 @@
+"""
+Bulk re-rating of historical ledger events after a billing policy change.
+
+rerate(since, until, policy) recomputes developer_id, gross_usd,
+platform_fee_usd and developer_net_usd for every event in the window with
+NumPy array math (same formulas as billing_ledger.build_event), then per
+affected segment:
+
+1. writes a new revision file seg-XXXXXXXX.rN.jsonl next to the original
+   (the old revision stays on disk);
+2. swaps it into the ledger index (appends are blocked only for that swap);
+3. folds the per-group difference into the billing rollups.
+
+The active segment is sealed first if the window reaches it, so append_event
+keeps appending to a fresh segment while the job runs. SQL billing_events rows
+are not touched; the ledger is the billing source of truth.
+"""
+from __future__ import annotations
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from api.billing_ledger import get_policy
+from api.billing_rollups import ROLLUPS, BillingRollups, Key
+from api.ledger_store import LEDGER, SegmentedLedger, seg_file
+
+MONEY = ("gross_usd", "platform_fee_usd", "developer_net_usd")
+
+
+def policy_version(pol: Dict[str, Any]) -> str:
+    if pol.get("version"):
+        return str(pol["version"])
+    canon = json.dumps({k: pol.get(k) for k in ("platform_fee_percent", "default_credit_value_usd", "skill_developers")},
+                       sort_keys=True, separators=(",", ":"))
+    return "sha1:" + hashlib.sha1(canon.encode("utf-8")).hexdigest()[:12]
+
+
+def _codes(values: List[str]) -> Tuple[np.ndarray, List[str]]:
+    table: Dict[str, int] = {}
+    codes = np.fromiter((table.setdefault(v, len(table)) for v in values), dtype=np.int64, count=len(values))
+    return codes, list(table)
+
+
+def _micros(x: np.ndarray) -> np.ndarray:
+    # same rounding as billing_rollups.micros (round-half-even of x * 1e6)
+    return np.rint(x * 1_000_000).astype(np.int64)
+
+
+def _group_sums(keys: Dict[str, np.ndarray], names: Dict[str, List[str]],
+                credits: np.ndarray, money: List[np.ndarray], sign: int) -> Dict[Key, List[int]]:
+    """Vectorized GROUP BY (tenant, developer, skill, day) -> [events, credits, gross, fee, net]."""
+    dims = ("tenant_id", "developer_id", "skill_id", "day")
+    combined = np.zeros(len(credits), dtype=np.int64)
+    for d in dims:
+        combined = combined * (len(names[d]) + 1) + keys[d]
+    uniq, inv = np.unique(combined, return_inverse=True)
+    cols = [np.bincount(inv, minlength=len(uniq)).astype(np.int64),
+            np.bincount(inv, weights=credits, minlength=len(uniq)).astype(np.int64)]
+    cols += [np.bincount(inv, weights=m, minlength=len(uniq)).astype(np.int64) for m in money]
+
+    out: Dict[Key, List[int]] = {}
+    for i, k in enumerate(uniq.tolist()):
+        parts = []
+        for d in reversed(dims):
+            k, c = divmod(k, len(names[d]) + 1)
+            parts.append(names[d][c])
+        key = tuple(reversed(parts))
+        out[key] = [sign * int(col[i]) for col in cols]
+    return out
+
+
+def _totals(credits: np.ndarray, money: List[np.ndarray]) -> Dict[str, Any]:
+    return {
+        "events": int(len(credits)),
+        "credits": int(credits.sum()),
+        **{name: round(int(m.sum()) / 1_000_000, 6) for name, m in zip(MONEY, money)},
+    }
+
+
+def _rate_segment(events: List[Dict[str, Any]], since: Optional[str], until: Optional[str],
+                  pol: Dict[str, Any], version: str) -> Optional[Dict[str, Any]]:
+    ts = [e.get("ts") or "" for e in events]
+    in_range = np.fromiter(((not since or t >= since) and (not until or t <= until) for t in ts),
+                           dtype=bool, count=len(events))
+    idx = np.flatnonzero(in_range)
+    if not len(idx):
+        return None
+    sel = [events[i] for i in idx.tolist()]
+
+    credits = np.fromiter((int(e.get("credits", 0)) for e in sel), dtype=np.int64, count=len(sel))
+    old_money = [np.fromiter((float(e.get(f) or 0) for e in sel), dtype=np.float64, count=len(sel)) for f in MONEY]
+
+    skills, skill_names = _codes([e.get("skill_id", "") for e in sel])
+    devmap = pol.get("skill_developers", {})
+    dev_of_skill = [devmap.get(s, "unknown_dev") for s in skill_names]
+
+    credit_usd = float(pol.get("default_credit_value_usd", 0.01))
+    fee_pct = float(pol.get("platform_fee_percent", 25)) / 100.0
+    gross = credits.astype(np.float64) * credit_usd
+    fee = gross * fee_pct
+    net = gross - fee
+    new_money = [np.round(gross, 6), np.round(fee, 6), np.round(net, 6)]
+
+    old_dev, old_dev_names = _codes([e.get("developer_id", "unknown_dev") for e in sel])
+    dev_names = list(old_dev_names)
+    for d in dev_of_skill:
+        if d not in dev_names:
+            dev_names.append(d)
+    new_dev = np.array([dev_names.index(d) for d in dev_of_skill], dtype=np.int64)[skills]
+
+    tenants, tenant_names = _codes([e.get("tenant_id", "") for e in sel])
+    days, day_names = _codes([t[:10] for t in (ts[i] for i in idx.tolist())])
+    names = {"tenant_id": tenant_names, "developer_id": dev_names, "skill_id": skill_names, "day": day_names}
+    base = {"tenant_id": tenants, "skill_id": skills, "day": days}
+
+    old_m = [_micros(m) for m in old_money]
+    new_m = [_micros(m) for m in new_money]
+    delta = _group_sums({**base, "developer_id": old_dev}, names, credits, old_m, -1)
+    for k, v in _group_sums({**base, "developer_id": new_dev}, names, credits, new_m, 1).items():
+        cur = delta.get(k)
+        delta[k] = v if cur is None else [a + b for a, b in zip(cur, v)]
+    delta = {k: v for k, v in delta.items() if any(v)}
+
+    # write the new values back into the event dicts
+    g, f, n = (m.tolist() for m in new_money)
+    devs = [dev_names[c] for c in new_dev.tolist()]
+    for j, e in enumerate(sel):
+        e["developer_id"] = devs[j]
+        e["gross_usd"], e["platform_fee_usd"], e["developer_net_usd"] = g[j], f[j], n[j]
+        e["policy_version"] = version
+
+    return {
+        "rows": len(sel),
+        "before": _totals(credits, old_m),
+        "after": _totals(credits, new_m),
+        "delta": delta,
+    }
+
+
+def _write_revision(path: Path, events: List[Dict[str, Any]]) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(b"".join(json.dumps(e, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+                         for e in events))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _sum_totals(parts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    out = {"events": 0, "credits": 0, **{m: 0.0 for m in MONEY}}
+    for p in parts:
+        for k in out:
+            out[k] += p[k]
+    return {k: (round(v, 6) if isinstance(v, float) else v) for k, v in out.items()}
+
+
+def rerate(since: Optional[str] = None, until: Optional[str] = None, policy: Optional[Dict[str, Any]] = None,
+           dry_run: bool = False, ledger: SegmentedLedger = LEDGER,
+           rollups: BillingRollups = ROLLUPS) -> Dict[str, Any]:
+    t0 = time.time()
+    pol = policy if policy is not None else get_policy()
+    version = policy_version(pol)
+
+    ledger.ensure()
+    if not dry_run:
+        active = ledger.index()["segments"][-1]
+        oldest = min(((e.get("ts") or "") for _, e in ledger.read_segment(active["name"])), default=None)
+        if oldest is not None and (not until or oldest <= until):
+            ledger.seal_active()
+
+    # a dry run also reports on the (unsealed) active segment
+    segments = [s for s in ledger.segments(since, until) if s.get("sealed") or dry_run]
+    results, revisions = [], []
+    for s in segments:
+        events = [e for _, e in ledger.read_segment(s["name"])]
+        r = _rate_segment(events, since, until, pol, version)
+        if r is None:
+            continue
+        r["segment"] = s["name"]
+        results.append(r)
+        if not dry_run:
+            rev = int(s.get("revision", 1)) + 1
+            path = ledger.dir / f'{s["name"][:-len(".jsonl")]}.r{rev}.jsonl'
+            _write_revision(path, events)
+            revisions.append((s, path, rev))
+
+    delta: Dict[Key, List[int]] = {}
+    for r in results:
+        for k, v in r.pop("delta").items():
+            cur = delta.get(k)
+            delta[k] = v if cur is None else [a + b for a, b in zip(cur, v)]
+
+    if not dry_run and revisions:
+        with rollups.hold():
+            rollups.catch_up()
+            resized = {}
+            for s, path, rev in revisions:
+                old_bytes = (ledger.dir / seg_file(s)).stat().st_size
+                ledger.install_revision(s["name"], path, {"revision": rev, "policy_version": version,
+                                                          "rerated_at": time.time()})
+                resized[s["name"]] = (old_bytes, path.stat().st_size)
+            rollups.apply_revision(delta, resized, ledger.epoch())
+
+    return {
+        "policy_version": version,
+        "since": since,
+        "until": until,
+        "dry_run": dry_run,
+        "segments": [{"segment": r["segment"], "rows": r["rows"]} for r in results],
+        "before": _sum_totals([r["before"] for r in results]),
+        "after": _sum_totals([r["after"] for r in results]),
+        "changed_groups": len(delta),
+        "elapsed_sec": round(time.time() - t0, 3),
+    }
@@ -0,0 +1,309 @@
+"""
+Materialized billing rollups keyed by (tenant, developer, skill, day).
+
+Each group holds [events, credits, gross, platform_fee, developer_net] with the
+money columns as integer micro-USD, so sums are exact and independent of
+summation order. Rollups are a pure function of the ledger prefix up to a
+watermark (segment, byte offset):
+
+- append_event() applies the event it just wrote when it directly follows the
+  watermark (the common single-process case);
+- any gap (events from other workers) is closed by catch_up(), which reads the
+  ledger from the watermark before every dashboard query;
+- the state is persisted to registry/billing_rollups.json every
+  BILLING_ROLLUP_PERSIST_SEC and on shutdown, and rebuild() recomputes it
+  from scratch.
+
+scripts/verify_rollups.py compares every group and dashboard against a full
+ledger scan.
+"""
+from __future__ import annotations
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from api.config import BILLING_ROLLUP_PERSIST_SEC
+from api.ledger_store import LEDGER, SegmentedLedger
+from registry.snapshot import read_json, write_json
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+ROLLUP_FILE = BASE_DIR / "registry" / "billing_rollups.json"
+
+Key = Tuple[str, str, str, str]     # (tenant_id, developer_id, skill_id, day)
+EVENTS, CREDITS, GROSS, FEE, NET = range(5)
+
+
+def micros(usd: Any) -> int:
+    return int(round(float(usd or 0) * 1_000_000))
+
+
+def usd(m: int) -> float:
+    return round(m / 1_000_000, 6)
+
+
+def event_key(e: Dict[str, Any]) -> Key:
+    return (e.get("tenant_id", ""), e.get("developer_id", "unknown_dev"), e.get("skill_id", ""), (e.get("ts") or "")[:10])
+
+
+def _add(groups: Dict[Key, List[int]], e: Dict[str, Any]) -> Key:
+    k = event_key(e)
+    g = groups.get(k)
+    if g is None:
+        g = groups[k] = [0, 0, 0, 0, 0]
+    g[EVENTS] += 1
+    g[CREDITS] += int(e.get("credits", 0))
+    g[GROSS] += micros(e.get("gross_usd"))
+    g[FEE] += micros(e.get("platform_fee_usd"))
+    g[NET] += micros(e.get("developer_net_usd"))
+    return k
+
+
+def scan(events: Iterable[Dict[str, Any]]) -> Dict[Key, List[int]]:
+    """Full recomputation (the reference the rollups must equal)."""
+    groups: Dict[Key, List[int]] = {}
+    for e in events:
+        _add(groups, e)
+    return groups
+
+
+class BillingRollups:
+    def __init__(self, ledger: SegmentedLedger = LEDGER, path: Path = ROLLUP_FILE,
+                 persist_sec: float = BILLING_ROLLUP_PERSIST_SEC):
+        self.ledger = ledger
+        self.path = path
+        self.persist_sec = persist_sec
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._groups: Dict[Key, List[int]] = {}
+        self._by_tenant: Dict[str, Set[Key]] = defaultdict(set)
+        self._by_developer: Dict[str, Set[Key]] = defaultdict(set)
+        self._skill_events: Dict[str, int] = defaultdict(int)
+        self._watermark: Tuple[Optional[str], int] = (None, 0)
+        self._epoch = 0                 # ledger revision epoch the groups were computed against
+        self._dirty = False
+        self._last_persist = time.monotonic()
+
+    # ---------- state ----------
+    def _reset(self, groups: Dict[Key, List[int]], watermark: Tuple[Optional[str], int]) -> None:
+        self._groups = groups
+        self._by_tenant = defaultdict(set)
+        self._by_developer = defaultdict(set)
+        self._skill_events = defaultdict(int)
+        for k, g in groups.items():
+            self._by_tenant[k[0]].add(k)
+            self._by_developer[k[1]].add(k)
+            self._skill_events[k[2]] += g[EVENTS]
+        self._watermark = watermark
+
+    def _apply(self, e: Dict[str, Any]) -> None:
+        k = _add(self._groups, e)
+        self._by_tenant[k[0]].add(k)
+        self._by_developer[k[1]].add(k)
+        self._skill_events[k[2]] += 1
+
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        data = read_json(self.path, {"watermark": [None, 0], "groups": []})
+        groups = {tuple(row[:4]): list(row[4:]) for row in data.get("groups", [])}
+        wm = data.get("watermark") or [None, 0]
+        self._reset(groups, (wm[0], int(wm[1])))
+        self._epoch = int(data.get("epoch", 0))
+        self._loaded = True
+
+    def _check_epoch(self) -> None:
+        # a re-rating job replaced ledger segments: take its snapshot, or rebuild
+        epoch = self.ledger.epoch()
+        if epoch == self._epoch:
+            return
+        self._loaded = False
+        self._load()
+        if self._epoch != epoch:
+            self._reset({}, (None, 0))
+            self._epoch = epoch
+            self._dirty = True
+
+    def persist(self) -> None:
+        with self._lock:
+            if not self._loaded:
+                return
+            write_json(self.path, {
+                "epoch": self._epoch,
+                "watermark": list(self._watermark),
+                "groups": [list(k) + list(v) for k, v in sorted(self._groups.items())],
+            }, indent=None)
+            self._dirty = False
+            self._last_persist = time.monotonic()
+
+    def _maybe_persist(self) -> None:
+        if self._dirty and time.monotonic() - self._last_persist >= self.persist_sec:
+            self.persist()
+
+    # ---------- maintenance ----------
+    def note(self, event: Dict[str, Any], position: Tuple[str, int, int]) -> None:
+        """Called right after LEDGER.append(event) returned `position`."""
+        segment, start, end = position
+        with self._lock:
+            self._load()
+            self._check_epoch()
+            if self._watermark == (segment, start):
+                self._apply(event)
+                self._watermark = (segment, end)
+                self._dirty = True
+            else:
+                self._catch_up()
+            self._maybe_persist()
+
+    def _catch_up(self) -> int:
+        n = 0
+        seg, off = self._watermark
+        for seg, off, e in self.ledger.scan_from(seg, off):
+            self._apply(e)
+            n += 1
+        if n:
+            self._watermark = (seg, off)
+            self._dirty = True
+        return n
+
+    def catch_up(self) -> int:
+        with self._lock:
+            self._load()
+            self._check_epoch()
+            n = self._catch_up()
+            self._maybe_persist()
+            return n
+
+    def rebuild(self) -> int:
+        with self._lock:
+            self._loaded = True
+            self._reset({}, (None, 0))
+            self._epoch = self.ledger.epoch()
+            n = self._catch_up()
+            self.persist()
+            return n
+
+    def hold(self) -> threading.RLock:
+        """Blocks rollup readers and writers in this process (held around ledger revision swaps)."""
+        return self._lock
+
+    def apply_revision(self, delta: Dict[Key, List[int]], resized: Dict[str, Tuple[int, int]], epoch: int) -> None:
+        """
+        Fold a re-rating into the rollups: `delta` is new-minus-old per group,
+        `resized` maps re-written segments to (old bytes, new bytes) so a
+        watermark at the end of one stays valid. Call with hold() taken, once the
+        revisions are installed; catch_up() must have run before installing them.
+        """
+        with self._lock:
+            self._load()
+            seg, off = self._watermark
+            if seg in resized:
+                old, new = resized[seg]
+                if off != old:
+                    # watermark inside a rewritten segment: offsets no longer line up
+                    self.rebuild()
+                    return
+                self._watermark = (seg, new)
+            for k, d in delta.items():
+                g = self._groups.get(k)
+                if g is None:
+                    g = self._groups[k] = [0, 0, 0, 0, 0]
+                    self._by_tenant[k[0]].add(k)
+                    self._by_developer[k[1]].add(k)
+                for i, v in enumerate(d):
+                    g[i] += v
+                self._skill_events[k[2]] += d[EVENTS]
+                if not g[EVENTS]:
+                    del self._groups[k]
+                    self._by_tenant[k[0]].discard(k)
+                    self._by_developer[k[1]].discard(k)
+            self._epoch = epoch
+            self.persist()
+
+    def groups(self) -> Dict[Key, List[int]]:
+        self.catch_up()
+        with self._lock:
+            return {k: list(v) for k, v in self._groups.items()}
+
+    def watermark(self) -> Tuple[Optional[str], int]:
+        return self._watermark
+
+    # ---------- queries ----------
+    def _rows(self, tenant_id: Optional[str] = None, developer_id: Optional[str] = None) -> List[Tuple[Key, List[int]]]:
+        self.catch_up()
+        with self._lock:
+            if tenant_id is not None:
+                keys = self._by_tenant.get(tenant_id, ())
+            elif developer_id is not None:
+                keys = self._by_developer.get(developer_id, ())
+            else:
+                keys = self._groups.keys()
+            return [(k, list(self._groups[k])) for k in keys]
+
+    def skill_events(self) -> Dict[str, int]:
+        """Billed events per skill (marketplace usage counter)."""
+        self.catch_up()
+        with self._lock:
+            return {k: v for k, v in self._skill_events.items() if v}
+
+    def tenant_has_events(self, tenant_id: str) -> bool:
+        self.catch_up()
+        return bool(self._by_tenant.get(tenant_id))
+
+    def tenant(self, tenant_id: str) -> Dict[str, Any]:
+        rows = self._rows(tenant_id=tenant_id)
+        by_skill: Dict[str, List[int]] = defaultdict(lambda: [0, 0])
+        n = credits = gross = 0
+        for k, v in rows:
+            n += v[EVENTS]
+            credits += v[CREDITS]
+            gross += v[GROSS]
+            s = by_skill[k[2]]
+            s[0] += v[CREDITS]
+            s[1] += v[GROSS]
+        return {
+            "total_events": n,
+            "total_credits_used": credits,
+            "total_spend_usd": usd(gross),
+            "by_skill": {sk: {"credits": c, "gross_usd": usd(g)} for sk, (c, g) in sorted(by_skill.items())},
+        }
+
+    def developer(self, developer_id: str) -> Dict[str, Any]:
+        rows = self._rows(developer_id=developer_id)
+        by_skill: Dict[str, List[int]] = defaultdict(lambda: [0, 0, 0])
+        n = gross = fee = net = 0
+        for k, v in rows:
+            n += v[EVENTS]
+            gross += v[GROSS]
+            fee += v[FEE]
+            net += v[NET]
+            s = by_skill[k[2]]
+            s[0] += v[CREDITS]
+            s[1] += v[GROSS]
+            s[2] += v[NET]
+        return {
+            "total_events": n,
+            "gross_usd": usd(gross),
+            "platform_fee_usd": usd(fee),
+            "net_usd": usd(net),
+            "by_skill": {sk: {"credits": c, "gross_usd": usd(g), "net_usd": usd(nt)}
+                         for sk, (c, g, nt) in sorted(by_skill.items())},
+        }
+
+    def platform(self) -> Dict[str, Any]:
+        n = gross = fee = net = 0
+        for _, v in self._rows():
+            n += v[EVENTS]
+            gross += v[GROSS]
+            fee += v[FEE]
+            net += v[NET]
+        return {
+            "total_events": n,
+            "gross_usd": usd(gross),
+            "platform_fee_usd": usd(fee),
+            "developer_net_usd": usd(net),
+        }
+
+
+ROLLUPS = BillingRollups()
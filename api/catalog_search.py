@@ -0,0 +1,241 @@
+"""
+In-process inverted index over registry/skills.json.
+
+Fields (weight): skill_id (3), tags (2), category (2), developer (1.5),
+description (1). Tokens are lowercase alphanumeric runs, so "clean_text"
+indexes as clean + text.
+
+A query token matches
+  exactly                          full weight
+  as a prefix of an indexed term   PREFIX_WEIGHT  (sorted vocabulary + bisect)
+  within edit distance 1 (2 for tokens of 8+ chars)
+                                   TYPO_WEIGHT    (symmetric-delete neighbourhoods)
+and documents are scored with BM25 over the weighted term frequencies. Lookups
+touch only the postings of matched terms, so latency tracks result size, not
+catalog size.
+
+The catalog is diffed against the index whenever skills.json changes: only
+added, changed or removed skills are re-indexed.
+"""
+from __future__ import annotations
+import bisect
+import math
+import re
+import threading
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from registry.snapshot import read_json, signature
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+SKILLS_FILE = BASE_DIR / "registry" / "skills.json"
+
+FIELDS = (("skill_id", 3.0), ("tags", 2.0), ("category", 2.0), ("developer", 1.5), ("description", 1.0))
+PREFIX_WEIGHT = 0.7
+TYPO_WEIGHT = 0.5
+MAX_EXPANSIONS = 50
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall((text or "").lower())
+
+
+def _field_text(skill: Dict[str, Any], field: str) -> str:
+    if field == "developer":
+        v = skill.get("developer_id") or skill.get("developer") or ""
+    else:
+        v = skill.get(field) or ""
+    if isinstance(v, (list, tuple)):
+        v = " ".join(str(x) for x in v)
+    return str(v)
+
+
+def _deletes(term: str, depth: int) -> Set[str]:
+    out, frontier = set(), {term}
+    for _ in range(depth):
+        nxt = set()
+        for w in frontier:
+            for i in range(len(w)):
+                nxt.add(w[:i] + w[i + 1:])
+        out |= nxt
+        frontier = nxt
+    return out
+
+
+def _max_typos(term: str) -> int:
+    if len(term) < 4:
+        return 0
+    return 2 if len(term) >= 8 else 1
+
+
+def _edit_distance(a: str, b: str, limit: int) -> int:
+    """Damerau-Levenshtein (optimal string alignment), early exit above `limit`."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev2, prev = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        best = cur[0]
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if prev2 is not None and i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+            best = min(best, cur[j])
+        if best > limit:
+            return limit + 1
+        prev2, prev = prev, cur
+    return prev[-1]
+
+
+class CatalogIndex:
+    def __init__(self, path: Path = SKILLS_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._sig = None
+        self.docs: Dict[str, Dict[str, Any]] = {}                     # skill_id -> indexed skill dict
+        self.doc_terms: Dict[str, Dict[str, float]] = {}              # skill_id -> term -> weighted tf
+        self.doc_len: Dict[str, float] = {}
+        self.postings: Dict[str, Dict[str, float]] = defaultdict(dict)  # term -> skill_id -> weighted tf
+        self.vocab: List[str] = []                                    # sorted, for prefix lookups
+        self.deletes: Dict[str, Set[str]] = defaultdict(set)          # deletion variant -> terms
+        self.total_len = 0.0
+
+    # ---------- maintenance ----------
+    def _add_term(self, term: str) -> None:
+        bisect.insort(self.vocab, term)
+        for d in _deletes(term, _max_typos(term)):
+            self.deletes[d].add(term)
+
+    def _drop_term(self, term: str) -> None:
+        i = bisect.bisect_left(self.vocab, term)
+        if i < len(self.vocab) and self.vocab[i] == term:
+            del self.vocab[i]
+        for d in _deletes(term, _max_typos(term)):
+            s = self.deletes.get(d)
+            if s is not None:
+                s.discard(term)
+                if not s:
+                    del self.deletes[d]
+        self.postings.pop(term, None)
+
+    def _remove(self, sid: str) -> None:
+        for term in self.doc_terms.pop(sid, {}):
+            p = self.postings.get(term)
+            if p is not None:
+                p.pop(sid, None)
+                if not p:
+                    self._drop_term(term)
+        self.total_len -= self.doc_len.pop(sid, 0.0)
+        self.docs.pop(sid, None)
+
+    def _upsert(self, skill: Dict[str, Any]) -> None:
+        sid = skill.get("skill_id")
+        if not sid:
+            return
+        self._remove(sid)
+        tf: Dict[str, float] = defaultdict(float)
+        for field, weight in FIELDS:
+            for t in tokenize(_field_text(skill, field)):
+                tf[t] += weight
+        for term, w in tf.items():
+            if term not in self.postings or not self.postings[term]:
+                self._add_term(term)
+            self.postings[term][sid] = w
+        self.docs[sid] = dict(skill)
+        self.doc_terms[sid] = dict(tf)
+        self.doc_len[sid] = sum(tf.values())
+        self.total_len += self.doc_len[sid]
+
+    def sync(self, skills: Iterable[Dict[str, Any]]) -> Dict[str, int]:
+        """Diff `skills` against the index; re-index only what changed."""
+        with self._lock:
+            seen = set()
+            added = changed = 0
+            for s in skills:
+                sid = s.get("skill_id")
+                if not sid:
+                    continue
+                seen.add(sid)
+                old = self.docs.get(sid)
+                if old == s:
+                    continue
+                added += old is None
+                changed += old is not None
+                self._upsert(s)
+            gone = [sid for sid in self.docs if sid not in seen]
+            for sid in gone:
+                self._remove(sid)
+            return {"added": added, "changed": changed, "removed": len(gone)}
+
+    def refresh(self) -> "CatalogIndex":
+        sig = signature(self.path)
+        if sig != self._sig:
+            data = read_json(self.path, [])
+            self.sync(data if isinstance(data, list) else data.get("skills", []))
+            self._sig = sig
+        return self
+
+    # ---------- query ----------
+    def _expand(self, token: str) -> List[Tuple[str, float]]:
+        """(term, weight) candidates for one query token."""
+        out: Dict[str, float] = {}
+        if self.postings.get(token):
+            out[token] = 1.0
+        i = bisect.bisect_left(self.vocab, token)
+        n = 0
+        while i < len(self.vocab) and self.vocab[i].startswith(token) and n < MAX_EXPANSIONS:
+            t = self.vocab[i]
+            if t != token:
+                out.setdefault(t, PREFIX_WEIGHT)
+            i += 1
+            n += 1
+        k = _max_typos(token)
+        if k:
+            cands: Set[str] = set()
+            for d in _deletes(token, k) | {token}:
+                if d in self.postings and self.postings[d]:
+                    cands.add(d)
+                cands |= self.deletes.get(d, set())
+            for t in cands:
+                if t not in out and _edit_distance(token, t, k) <= k:
+                    out[t] = TYPO_WEIGHT
+        return list(out.items())
+
+    def search(self, q: str, limit: Optional[int] = None) -> Dict[str, float]:
+        """skill_id -> BM25 relevance for every matching skill (all when limit is None)."""
+        self.refresh()
+        tokens = tokenize(q)
+        if not tokens:
+            return {}
+        with self._lock:
+            n_docs = len(self.docs) or 1
+            avg_len = (self.total_len / n_docs) or 1.0
+            scores: Dict[str, float] = defaultdict(float)
+            for token in dict.fromkeys(tokens):
+                best: Dict[str, float] = {}
+                for term, weight in self._expand(token):
+                    posting = self.postings.get(term, {})
+                    idf = math.log(1 + (n_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+                    for sid, tf in posting.items():
+                        norm = tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * self.doc_len[sid] / avg_len))
+                        s = weight * idf * norm
+                        if s > best.get(sid, 0.0):
+                            best[sid] = s          # a token counts once per skill (its best match)
+                for sid, s in best.items():
+                    scores[sid] += s
+        if limit is not None:
+            top = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)[:limit]
+            return dict(top)
+        return dict(scores)
+
+    def stats(self) -> Dict[str, int]:
+        return {"skills": len(self.docs), "terms": len(self.vocab), "delete_variants": len(self.deletes)}
+
+
+CATALOG = CatalogIndex()
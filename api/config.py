@@ -1,4 +1,101 @@
+import os
+
 JWT_SECRET = "CHANGE_ME_SUPER_SECRET"
 JWT_ALG = "HS256"
 ACCESS_TTL_SEC = 60 * 30
 DEVICE_TTL_SEC = 60 * 60 * 24 * 30
+
+# database (db/database.py)
+#   AIPASS_DATABASE_URL  any SQLAlchemy URL, e.g. postgresql+psycopg2://user:pw@host/aipass;
+#                        empty = the aipass.sqlite3 file at the repo root
+#   AIPASS_DB_PROFILE    sqlite only: "production" (WAL, synchronous=NORMAL, busy timeout, mmap)
+#                        or "default" (driver defaults: rollback journal, full sync)
+DATABASE_URL = os.getenv("AIPASS_DATABASE_URL", "")
+DB_PROFILE = os.getenv("AIPASS_DB_PROFILE", "production")
+DB_POOL_SIZE = int(os.getenv("AIPASS_DB_POOL_SIZE", "10"))      # per worker process: ~ request threads touching the db
+DB_MAX_OVERFLOW = int(os.getenv("AIPASS_DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT_SEC = 10
+DB_POOL_RECYCLE_SEC = 1800                                        # server databases: drop connections older than this
+SQLITE_BUSY_TIMEOUT_MS = 5000
+SQLITE_MMAP_BYTES = 256 * 1024 * 1024
+SQLITE_CACHE_KIB = 64 * 1024
+
+# verified token -> claims cache (api/auth_context.py)
+TOKEN_CACHE_TTL_SEC = 60
+TOKEN_CACHE_MAX_ENTRIES = 10_000
+
+# device binding cache (db/device_cache.py): workers on one host see device changes on the
+# next request through a signal file (empty = logs/device_cache.signal at the repo root; point it
+# at shared storage for multi-host deployments). DEVICE_CACHE_CHECK_SEC is the fallback poll of
+# the cross-process version row for workers that don't share the file; 0 = check on every request
+DEVICE_CACHE_SIGNAL_FILE = os.getenv("AIPASS_DEVICE_SIGNAL_FILE", "")
+DEVICE_CACHE_CHECK_SEC = 1.0
+DEVICE_CACHE_MAX_ENTRIES = 50_000
+
+# batched audit writer (db/audit_db.py)
+AUDIT_QUEUE_MAX = 10_000
+AUDIT_BATCH_ROWS = 500
+AUDIT_FLUSH_MS = 250
+AUDIT_ENQUEUE_TIMEOUT_MS = 0        # >0: block the caller this long when the queue is full before dropping
+
+# audit partitions (db/audit_partitions.py): audit_logs holds only the open partition;
+# closed ones become gzip JSONL archives under logs/audit/ plus per-(tenant, route) rollups
+AUDIT_PARTITION = os.getenv("AIPASS_AUDIT_PARTITION", "day")     # "day" | "month"
+AUDIT_ARCHIVE_BLOCK_ROWS = 1000     # rows per independently decompressible gzip member (time index granularity)
+AUDIT_ARCHIVE_RETENTION_DAYS = 365  # delete archives older than this; 0 = keep forever
+AUDIT_ROLLUP_RETENTION_DAYS = 0     # delete rollups older than this; 0 = keep forever
+AUDIT_CLOSE_CHECK_SEC = 60.0        # how often a worker checks for partitions to close
+AUDIT_CLOSE_GRACE_SEC = 600         # close a partition only this long after it ended (late batched writes, clock skew)
+
+# usage / audit analytics (db/analytics_rollups.py): minute / hour / day GROUP BY rollups of
+# usage_events and audit_logs, maintained incrementally behind a per-source watermark
+ANALYTICS_ROLLUP_SEC = 30.0         # how often a worker rolls up new rows
+ANALYTICS_ROLLUP_LAG_SEC = 60       # rows younger than this are left for the next pass (batched audit writes land late)
+ANALYTICS_ROLLUP_MAX_SPAN_SEC = 6 * 3600    # source time covered by one GROUP BY (backfills run in several)
+ANALYTICS_RETENTION_DAYS = {"minute": 2, "hour": 90, "day": 0}  # 0 = keep forever
+ANALYTICS_MAX_POINTS = 2000         # time-series buckets per response
+
+# rate limiting (db/rate_limit_db.py + db/rate_limiter.py)
+#   memory: per-worker sliding windows, persisted to rate_counters every RATE_PERSIST_SEC
+#   shared: one atomic UPSERT over all four counters per request (multi-worker deployments)
+RATE_LIMIT_BACKEND = os.getenv("AIPASS_RATE_BACKEND", "memory")
+RATE_PERSIST_SEC = 5.0
+RATE_SUSPENSION_REFRESH_SEC = 5.0
+
+# wallets (api/wallet_service.py): balance a tenant's wallet starts with, whichever path creates it first
+WALLET_STARTER_CREDITS = 1000
+
+# kill switch (api/kill_switch.py): max delay before a worker notices a rule file change
+KILL_SWITCH_CHECK_SEC = 1.0
+
+# billing ledger (api/ledger_store.py): append-only JSONL segments under registry/ledger/
+LEDGER_SEGMENT_MAX_BYTES = 64 * 1024 * 1024
+LEDGER_SEGMENT_MAX_AGE_SEC = 24 * 3600
+LEDGER_FSYNC_EVERY = 64             # fsync after this many appends ...
+LEDGER_FSYNC_MS = 200               # ... or this long since the last fsync, whichever comes first
+
+# billing rollups (api/billing_rollups.py): snapshot interval of registry/billing_rollups.json
+BILLING_ROLLUP_PERSIST_SEC = 5.0
+
+# catalog search (api/catalog_search.py): weight of the best text match when blended into the marketplace rank score
+SEARCH_TEXT_WEIGHT = 1000.0
+
+# review stats (api/review_stats.py): per-user / per-tenant counters behind reviews_store._abuse_score
+REVIEW_RATE_WINDOW_SEC = 3600       # recent-rate window
+REVIEW_RATE_MAX = 5                 # reviews per window before the rate counts toward the abuse score
+REVIEW_SHORT_TEXT_CHARS = 5         # texts shorter than this count as short
+REVIEW_STATS_PERSIST_SEC = 5.0      # snapshot interval of registry/review_stats.json
+
+# workflow runner (api/workflow_runner.py): steps whose template inputs don't depend on each
+# other run concurrently, at most this many per run (1 = strictly sequential). The caller's
+# thread runs one of them; the rest go to a step pool shared by all runs of the worker.
+WORKFLOW_MAX_PARALLEL = 8
+WORKFLOW_STEP_POOL = 64             # threads in that shared pool (~ concurrent runs x fan-out)
+WORKFLOW_COMPILE_CACHE_MAX = 256    # compiled step templates kept (api/workflow_compiler.py), LRU
+
+# workflow run registry (api/workflow_runs.py): per-worker, in memory
+WORKFLOW_RUNS_MAX = 1000            # finished runs kept for /workflows/runs/{run_id}
+WORKFLOW_RUN_TTL_SEC = 3600         # ... and for how long after they finish
+WORKFLOW_BACKGROUND_RUNS = 16       # runs started with POST /workflows/run?wait=false executing at once
+# >0: also write the latest run status to reports/workflow_latest.json this often (background thread)
+WORKFLOW_STATUS_PERSIST_SEC = float(os.getenv("AIPASS_WORKFLOW_STATUS_PERSIST_SEC", "0"))
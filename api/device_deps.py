@@ -1,39 +1,20 @@
 from __future__ import annotations
-from fastapi import Depends, HTTPException, Header
-from jose import jwt, JWTError
-from sqlalchemy.orm import Session
+from fastapi import Depends, HTTPException, Request
 
-from db.database import SessionLocal
-from db.models import Device
+from db.device_cache import DEVICE_CACHE
+from api.auth_context import get_auth
 from api.security_deps import require_access
 
-JWT_SECRET = "CHANGE_ME_SUPER_SECRET"
-JWT_ALG = "HS256"
-
-def _db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 def require_device_token(
-    claims: dict = Depends(require_access),
-    device_token: str | None = Header(default=None, alias="Device-Token"),
-    db: Session = Depends(_db)
+    request: Request,
+    claims: dict = Depends(require_access)
 ) -> dict:
     try:
-        if not device_token:
-            raise HTTPException(status_code=401, detail="Missing Device-Token header")
-
-        # Decode device JWT
-        try:
-            dclaims = jwt.decode(device_token, JWT_SECRET, algorithms=[JWT_ALG])
-        except JWTError as e:
-            raise HTTPException(status_code=401, detail=f"Invalid device token: {e}")
-
-        if dclaims.get("type") != "device":
-            raise HTTPException(status_code=401, detail="Not a device token")
+        # Device JWT was already verified by the auth stage (api/auth_context.py)
+        ctx = get_auth(request)
+        dclaims = ctx.device
+        if dclaims is None:
+            raise HTTPException(status_code=401, detail=ctx.device_error)
 
         device_id = dclaims.get("device_id")
         tenant_id = dclaims.get("tenant_id")
@@ -46,8 +27,8 @@ def require_device_token(
         if tenant_id != claims.get("tenant_id"):
             raise HTTPException(status_code=403, detail="Device tenant mismatch")
 
-        # Load device from DB
-        d = db.query(Device).filter(Device.device_id == device_id).first()
+        # Device binding state (in-process cache, see db/device_cache.py)
+        d = DEVICE_CACHE.get(device_id)
         if not d or not d.is_active:
             raise HTTPException(status_code=401, detail="Device not found/inactive")
 
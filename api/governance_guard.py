@@ -1,8 +1,10 @@
 from __future__ import annotations
 from pathlib import Path
 from typing import Dict, Any
-import json
 import time
+from registry.snapshot import read_json, write_json
+from registry.governance import INDEX as GOVERNANCE_INDEX
+from api import wallet_service
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 REG = BASE_DIR / "registry"
@@ -11,53 +13,33 @@ SKILLS_FILE = REG / "skills.json"
 LOCKS_FILE = REG / "locks.json"
 APPROVALS_FILE = REG / "approvals.json"
 INSTALLS_FILE = REG / "tenant_installs.json"
-WALLETS_FILE = REG / "tenant_wallets.json"
 RATE_LIMITS_FILE = REG / "rate_limits.json"
 RATE_STATE_FILE = REG / "rate_state.json"
 
-def _read(path: Path, default):
-    if not path.exists():
-        path.parent.mkdir(parents=True, exist_ok=True)
-        path.write_text(json.dumps(default, indent=2), encoding="utf-8")
-        return default
-    return json.loads(path.read_text(encoding="utf-8"))
-
-def _write(path: Path, data):
-    path.parent.mkdir(parents=True, exist_ok=True)
-    path.write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding="utf-8")
-
 def get_skill_meta(skill_id: str) -> Dict[str, Any] | None:
-    skills = _read(SKILLS_FILE, [])
+    skills = read_json(SKILLS_FILE, [])
     for s in skills:
         if s.get("skill_id") == skill_id:
             return s
     return None
 
+# O(1) lookups served by the shared governance index (registry/governance.py)
 def tenant_installed_version(tenant_id: str, skill_id: str) -> str | None:
-    data = _read(INSTALLS_FILE, {"tenants": {}})
-    t = data.get("tenants", {}).get(tenant_id, {})
-    return t.get("installed", {}).get(skill_id)
+    return GOVERNANCE_INDEX.refresh().installed.get((tenant_id, skill_id))
 
 def is_approved(skill_id: str, version: str) -> bool:
-    appr = _read(APPROVALS_FILE, {"approved": []})
-    return any(a.get("skill_id") == skill_id and a.get("version") == version for a in appr.get("approved", []))
+    return (skill_id, version) in GOVERNANCE_INDEX.refresh().approved
 
 def locked_version(skill_id: str) -> str | None:
-    locks = _read(LOCKS_FILE, {"locks": {}})
-    item = locks.get("locks", {}).get(skill_id)
-    return item.get("locked_version") if item else None
+    return GOVERNANCE_INDEX.refresh().locks.get(skill_id)
 
 def charge_wallet(tenant_id: str, credits: int) -> None:
-    wallets = _read(WALLETS_FILE, {"tenants": {}})
-    t = wallets.setdefault("tenants", {}).setdefault(tenant_id, {"credits": 0})
-    if t["credits"] < credits:
-        raise ValueError(f"Insufficient credits. Have {t['credits']}, need {credits}.")
-    t["credits"] -= credits
-    _write(WALLETS_FILE, wallets)
+    # raises InsufficientCredits (a ValueError) with the same message as before
+    wallet_service.charge_or_raise(tenant_id, credits)
 
 def rate_limit_check(tenant_id: str, skill_id: str) -> None:
-    limits = _read(RATE_LIMITS_FILE, {"default_per_minute": 60, "overrides": {}})
-    state = _read(RATE_STATE_FILE, {"state": {}})
+    limits = read_json(RATE_LIMITS_FILE, {"default_per_minute": 60, "overrides": {}})
+    state = read_json(RATE_STATE_FILE, {"state": {}}, mutable=True)
 
     key = f"{tenant_id}:{skill_id}"
     limit = int(limits.get("overrides", {}).get(key, limits.get("default_per_minute", 60)))
@@ -71,11 +53,11 @@ def rate_limit_check(tenant_id: str, skill_id: str) -> None:
         s["count"] = 0
 
     if s["count"] >= limit:
-        _write(RATE_STATE_FILE, state)
+        write_json(RATE_STATE_FILE, state)
         raise ValueError(f"Rate limit exceeded ({limit}/min) for {key}")
 
     s["count"] += 1
-    _write(RATE_STATE_FILE, state)
+    write_json(RATE_STATE_FILE, state)
 
 def enforce(tenant_id: str, skill_id: str) -> Dict[str, Any]:
     # 1) tenant must install skill
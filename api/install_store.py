@@ -1,8 +1,9 @@
 from __future__ import annotations
 from pathlib import Path
 from typing import Dict, Any, List
-import json
 import time
+from registry.snapshot import read_json, signature, write_json
+from registry.governance import INDEX as GOVERNANCE_INDEX
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 REGISTRY_DIR = BASE_DIR / "registry"
@@ -13,19 +14,8 @@ VISIBILITY_FILE = REGISTRY_DIR / "visibility.json"
 def now_iso() -> str:
     return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
 
-def _read_json(path: Path, default):
-    if not path.exists():
-        path.parent.mkdir(parents=True, exist_ok=True)
-        path.write_text(json.dumps(default, indent=2), encoding="utf-8")
-        return default
-    return json.loads(path.read_text(encoding="utf-8"))
-
-def _write_json(path: Path, data):
-    path.parent.mkdir(parents=True, exist_ok=True)
-    path.write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding="utf-8")
-
 def get_visibility() -> Dict[str, Any]:
-    return _read_json(VISIBILITY_FILE, {"skills": {}})
+    return read_json(VISIBILITY_FILE, {"skills": {}})
 
 def can_tenant_see_skill(tenant_id: str, skill_id: str) -> bool:
     vis = get_visibility()
@@ -39,19 +29,18 @@ def can_tenant_see_skill(tenant_id: str, skill_id: str) -> bool:
         return tenant_id in allowed
     return False
 
-def get_installs() -> Dict[str, Any]:
-    return _read_json(INSTALLS_FILE, {"tenants": {}})
+def get_installs(mutable: bool = False) -> Dict[str, Any]:
+    return read_json(INSTALLS_FILE, {"tenants": {}}, mutable=mutable)
 
 def get_tenant_install_state(tenant_id: str) -> Dict[str, Any]:
     data = get_installs()
-    tenants = data.setdefault("tenants", {})
-    return tenants.setdefault(tenant_id, {"installed": {}, "history": []})
+    return data.get("tenants", {}).get(tenant_id, {"installed": {}, "history": []})
 
 def install_skill(tenant_id: str, skill_id: str, version: str, actor: str) -> Dict[str, Any]:
     if not can_tenant_see_skill(tenant_id, skill_id):
         raise PermissionError("Skill not visible for this tenant")
 
-    data = get_installs()
+    data = get_installs(mutable=True)
     tenants = data.setdefault("tenants", {})
     state = tenants.setdefault(tenant_id, {"installed": {}, "history": []})
 
@@ -68,11 +57,13 @@ def install_skill(tenant_id: str, skill_id: str, version: str, actor: str) -> Di
         "actor": actor
     })
 
-    _write_json(INSTALLS_FILE, data)
+    before = signature(INSTALLS_FILE)
+    write_json(INSTALLS_FILE, data)
+    GOVERNANCE_INDEX.note_install(tenant_id, skill_id, version, before)
     return state
 
 def rollback_skill(tenant_id: str, skill_id: str, actor: str) -> Dict[str, Any]:
-    data = get_installs()
+    data = get_installs(mutable=True)
     tenants = data.setdefault("tenants", {})
     state = tenants.setdefault(tenant_id, {"installed": {}, "history": []})
 
@@ -95,5 +86,7 @@ def rollback_skill(tenant_id: str, skill_id: str, actor: str) -> Dict[str, Any]:
         "actor": actor
     })
 
-    _write_json(INSTALLS_FILE, data)
+    before = signature(INSTALLS_FILE)
+    write_json(INSTALLS_FILE, data)
+    GOVERNANCE_INDEX.note_install(tenant_id, skill_id, prev, before)
     return state
@@ -0,0 +1,87 @@
+"""
+Unit of work for one skill invocation.
+
+The wallet charge, BillingEvent, UsageEvent and SKILL_RUN audit row are staged
+in one session and committed together: either all of them land or none do.
+The JSON billing ledger is appended only after the commit succeeds.
+"""
+from __future__ import annotations
+import logging
+from typing import Any, Dict, Optional
+
+from db.database import SessionLocal
+from db.audit_db import add_audit, enqueue_audit
+from db.billing_db import add_billing
+from api.billing_ledger import build_event, append_event
+from api.metering import add_usage
+from api import wallet_service
+from api.wallet_service import InsufficientCredits
+from api.config import WALLET_STARTER_CREDITS
+
+log = logging.getLogger(__name__)
+
+class SkillInvocation:
+    def __init__(self, tenant_id: str, skill_id: str, version: str, *,
+                 user_id: str = "unknown", device_id: str = "unknown",
+                 ip: str = "unknown", route: str = ""):
+        self.tenant_id = tenant_id
+        self.skill_id = skill_id
+        self.version = version or "unknown"
+        self.user_id = user_id
+        self.device_id = device_id
+        self.ip = ip
+        self.route = route
+
+    def _audit(self, ok: bool, credits: int, error: Optional[str]) -> Dict[str, Any]:
+        return {
+            "tenant_id": self.tenant_id,
+            "user_id": self.user_id,
+            "device_id": self.device_id,
+            "ip": self.ip,
+            "route": self.route,
+            "action": "SKILL_RUN",
+            "target_id": self.skill_id,
+            "ok": ok,
+            "credits": credits,
+            "error": error,
+        }
+
+    def commit(self, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Record the outcome of a run. Successful runs are charged
+        `output._credits` (default 1); failed runs only get usage + audit rows.
+        Returns the billing event, or None for failed runs.
+        Raises InsufficientCredits (nothing written except a best-effort audit).
+        """
+        ok = bool(data.get("ok"))
+        credits = int((data.get("output") or {}).get("_credits", 1)) if ok else 0
+        event = build_event(self.tenant_id, self.skill_id, self.version, credits,
+                            latency_ms=data.get("latency_ms")) if ok else None
+
+        db = SessionLocal()
+        try:
+            if ok and not wallet_service.charge_in(db, self.tenant_id, credits, starter=WALLET_STARTER_CREDITS):
+                raise InsufficientCredits(
+                    f"Insufficient credits. Have {wallet_service.balance(self.tenant_id)}, need {credits}.")
+            if event:
+                add_billing(db, event)
+            add_usage(db, tenant_id=self.tenant_id, user_id=self.user_id, device_id=self.device_id,
+                      action="SKILL_RUN", credits=credits, ok=ok, ref_id=self.skill_id,
+                      error=data.get("error"))
+            add_audit(db, self._audit(ok, credits, data.get("error")))
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            # the transaction is gone; keep a trace of the attempt off the request path
+            enqueue_audit(self._audit(False, 0, f"{type(e).__name__}: {e}"))
+            raise
+        finally:
+            db.close()
+
+        if event:
+            data["charged_credits"] = credits
+            try:
+                append_event(event)
+            except Exception:
+                log.exception("billing ledger append failed for %s/%s", self.tenant_id, self.skill_id)
+        return event
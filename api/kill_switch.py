@@ -1,11 +1,24 @@
 from __future__ import annotations
 import json
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, FrozenSet
+
+from api.config import KILL_SWITCH_CHECK_SEC
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 PATH = BASE_DIR / "registry" / "kill_switch.json"
 
+KINDS = ("skills", "workflows", "tenants", "devices")
+
+# route matchers: /skills/<skill_id>, /workflows/<id> (also /workflows/run/<id> -> "run")
+_SKILL_RE = re.compile(r"/skills/([^/]*)")
+_WORKFLOW_RE = re.compile(r"/workflows/([^/]*)")
+
 def _load() -> Dict[str, Any]:
     if not PATH.exists():
         PATH.parent.mkdir(parents=True, exist_ok=True)
@@ -13,7 +26,83 @@ def _load() -> Dict[str, Any]:
     return json.loads(PATH.read_text(encoding="utf-8"))
 
 def _save(data: Dict[str, Any]) -> None:
-    PATH.write_text(json.dumps(data, indent=2), encoding="utf-8")
+    # atomic replace so readers in other workers never see a half-written file
+    tmp = PATH.with_suffix(".tmp")
+    tmp.write_text(json.dumps(data, indent=2), encoding="utf-8")
+    os.replace(tmp, PATH)
+
+@dataclass(frozen=True)
+class RuleSnapshot:
+    version: int
+    mtime_ns: int
+    tenants: FrozenSet[str]
+    devices: FrozenSet[str]
+    skills: FrozenSet[str]
+    workflows: FrozenSet[str]
+
+    @classmethod
+    def compile(cls, data: Dict[str, Any], mtime_ns: int) -> "RuleSnapshot":
+        return cls(
+            version=int(data.get("version", 0)),
+            mtime_ns=mtime_ns,
+            tenants=frozenset(data.get("tenants", [])),
+            devices=frozenset(data.get("devices", [])),
+            skills=frozenset(data.get("skills", [])),
+            workflows=frozenset(data.get("workflows", [])),
+        )
+
+    def match(self, tenant_id: str, device_id: str, route: str) -> str | None:
+        if self.tenants and tenant_id in self.tenants:
+            return "tenant_killed"
+        if self.devices and device_id in self.devices:
+            return "device_killed"
+        if self.skills:
+            m = _SKILL_RE.search(route)
+            if m:
+                skill_id = m.group(1).strip()
+                if skill_id in self.skills:
+                    return f"skill_killed:{skill_id}"
+        # Workflow route: /workflows/run with workflow_id in query/body (middleware can’t read body safely)
+        # We'll block workflows by route only when route contains workflow id, or use admin endpoint check in workflow runner too.
+        if self.workflows:
+            m = _WORKFLOW_RE.search(route)
+            if m:
+                wf_id = m.group(1).strip()
+                if wf_id in self.workflows:
+                    return f"workflow_killed:{wf_id}"
+        return None
+
+_EMPTY = RuleSnapshot(version=-1, mtime_ns=-1, tenants=frozenset(), devices=frozenset(), skills=frozenset(), workflows=frozenset())
+_snapshot = _EMPTY
+_checked_at = 0.0
+_lock = threading.Lock()
+
+def _file_mtime() -> int:
+    try:
+        return PATH.stat().st_mtime_ns
+    except FileNotFoundError:
+        return -1
+
+def _publish(data: Dict[str, Any]) -> RuleSnapshot:
+    global _snapshot, _checked_at
+    snap = RuleSnapshot.compile(data, _file_mtime())
+    with _lock:
+        _snapshot = snap
+        _checked_at = time.monotonic()
+    return snap
+
+def current_rules() -> RuleSnapshot:
+    """Compiled rules; the file is stat()ed at most every KILL_SWITCH_CHECK_SEC and parsed only if it changed."""
+    global _checked_at
+    t = time.monotonic()
+    snap = _snapshot
+    if t - _checked_at < KILL_SWITCH_CHECK_SEC:
+        return snap
+    mtime = _file_mtime()
+    if mtime == snap.mtime_ns and mtime != -1:
+        _checked_at = t
+        return snap
+    return _publish(_load())
 
 def get_rules() -> Dict[str, Any]:
     return _load()
@@ -23,43 +112,21 @@ def is_blocked(tenant_id: str, device_id: str, route: str) -> str | None:
     Returns a string reason if blocked, else None.
     route example: "POST /skills/summarize" or "/skills/summarize"
     """
-    data = _load()
-
-    if tenant_id in set(data.get("tenants", [])):
-        return "tenant_killed"
-    if device_id in set(data.get("devices", [])):
-        return "device_killed"
+    return current_rules().match(tenant_id, device_id, route)
 
-    # Skill route: /skills/<skill_id>
-    if "/skills/" in route:
-        skill_id = route.split("/skills/", 1)[1].split("/", 1)[0].strip()
-        if skill_id in set(data.get("skills", [])):
-            return f"skill_killed:{skill_id}"
-
-    # Workflow route: /workflows/run with workflow_id in query/body (middleware can’t read body safely)
-    # We'll block workflows by route only when route contains workflow id, or use admin endpoint check in workflow runner too.
-    # Here: allow /workflows/<id> or /workflows/run/<id> patterns
-    if "/workflows/" in route:
-        tail = route.split("/workflows/", 1)[1]
-        wf_id = tail.split("/", 1)[0].strip()
-        if wf_id in set(data.get("workflows", [])):
-            return f"workflow_killed:{wf_id}"
-
-    return None
-
-def add_block(kind: str, value: str) -> Dict[str, Any]:
-    data = _load()
-    if kind not in data:
+def _update(kind: str, fn) -> Dict[str, Any]:
+    if kind not in KINDS:
         raise ValueError("kind must be skills|workflows|tenants|devices")
-    if value not in data[kind]:
-        data[kind].append(value)
+    data = _load()
+    data[kind] = fn(data.get(kind, []))
+    data["version"] = int(data.get("version", 0)) + 1
     _save(data)
+    # this worker switches immediately; others notice the new mtime/version within KILL_SWITCH_CHECK_SEC
+    _publish(data)
     return data
 
+def add_block(kind: str, value: str) -> Dict[str, Any]:
+    return _update(kind, lambda items: items if value in items else items + [value])
+
 def remove_block(kind: str, value: str) -> Dict[str, Any]:
-    data = _load()
-    if kind not in data:
-        raise ValueError("kind must be skills|workflows|tenants|devices")
-    data[kind] = [x for x in data[kind] if x != value]
-    _save(data)
-    return data
+    return _update(kind, lambda items: [x for x in items if x != value])
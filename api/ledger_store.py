@@ -0,0 +1,419 @@
+"""
+Append-only, segmented billing ledger.
+
+Events are JSON lines in registry/ledger/seg-XXXXXXXX.jsonl. The active segment
+is rotated when it reaches LEDGER_SEGMENT_MAX_BYTES or LEDGER_SEGMENT_MAX_AGE_SEC;
+on rotation it is fsynced and its (first_ts, last_ts, count, bytes) recorded in
+registry/ledger/index.json, so range reads skip whole segments. Each writer keeps
+those stats for the active segment up to date as it appends (folding in lines
+other processes appended since its last write), so rotation does not rescan.
+
+Durability: every append is flushed to the OS (survives a process crash);
+fsync is batched every LEDGER_FSYNC_EVERY events, on rotation / shutdown, and
+by a background flusher once the oldest unsynced append is LEDGER_FSYNC_MS old
+(so a burst followed by silence is still synced in time). A torn last line left
+by a crash is trimmed when a writer opens the segment, and skipped by readers.
+
+Appends from several worker processes are serialised with an advisory file
+lock (POSIX) around the write and the rotation check.
+"""
+from __future__ import annotations
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # non-POSIX: in-process lock only
+    fcntl = None
+
+from api.config import (
+    LEDGER_SEGMENT_MAX_BYTES, LEDGER_SEGMENT_MAX_AGE_SEC, LEDGER_FSYNC_EVERY, LEDGER_FSYNC_MS,
+)
+from registry.snapshot import read_json, write_json
+
+log = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+REG = BASE_DIR / "registry"
+LEDGER_DIR = REG / "ledger"
+LEGACY_LEDGER = REG / "billing_ledger.json"
+
+
+def _seg_name(seq: int) -> str:
+    return f"seg-{seq:08d}.jsonl"
+
+
+def _seg_seq(name: str) -> int:
+    return int(name[4:12])
+
+
+def seg_file(entry: Dict[str, Any]) -> str:
+    """File holding the current revision of a segment (re-rating writes seg-X.rN.jsonl)."""
+    return entry.get("file") or entry["name"]
+
+
+def _fsync_dir(path: Path) -> None:
+    try:
+        fd = os.open(str(path), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _fold(stats: Dict[str, Any], e: Dict[str, Any]) -> None:
+    # first_ts/last_ts are the min/max ts: writers from several processes can interleave slightly out of order
+    stats["count"] += 1
+    ts = e.get("ts") or ""
+    if stats["first_ts"] is None or ts < stats["first_ts"]:
+        stats["first_ts"] = ts
+    if stats["last_ts"] is None or ts > stats["last_ts"]:
+        stats["last_ts"] = ts
+
+
+def _scan_segment(path: Path) -> Dict[str, Any]:
+    """count / first_ts / last_ts / bytes of the complete lines in a segment."""
+    stats: Dict[str, Any] = {"count": 0, "first_ts": None, "last_ts": None}
+    for _, e in _iter_file(path):
+        _fold(stats, e)
+    stats["bytes"] = path.stat().st_size if path.exists() else 0
+    return stats
+
+
+def _iter_file(path: Path, offset: int = 0) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """(end offset, event) for each complete line from `offset`."""
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return
+    with f:
+        f.seek(offset)
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                break          # torn tail (crash or in-flight append)
+            offset += len(raw)
+            try:
+                yield offset, json.loads(raw)
+            except ValueError:
+                continue
+
+
+class SegmentedLedger:
+    def __init__(self, directory: Path = LEDGER_DIR, max_bytes: int = LEDGER_SEGMENT_MAX_BYTES,
+                 max_age_sec: int = LEDGER_SEGMENT_MAX_AGE_SEC, fsync_every: int = LEDGER_FSYNC_EVERY,
+                 fsync_ms: int = LEDGER_FSYNC_MS, legacy: Optional[Path] = LEGACY_LEDGER):
+        self.dir = Path(directory)
+        self.index_path = self.dir / "index.json"
+        self.lock_path = self.dir / ".lock"
+        self.max_bytes = max_bytes
+        self.max_age_sec = max_age_sec
+        self.fsync_every = fsync_every
+        self.fsync_sec = fsync_ms / 1000.0
+        self.legacy = legacy
+
+        self._lock = threading.Lock()
+        self._fh = None                 # append handle of the active segment
+        self._fh_name: Optional[str] = None
+        self._pending = 0
+        self._pending_since = 0.0       # monotonic time of the oldest unsynced append
+        self._seg_stats: Optional[Dict[str, Any]] = None   # active segment: count/first_ts/last_ts up to "bytes"
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.appended = 0
+        self.fsyncs = 0
+        self.rotations = 0
+
+    # ---------- index ----------
+    def index(self) -> Dict[str, Any]:
+        return read_json(self.index_path, {"version": 1, "segments": []})
+
+    def _save_index(self, idx: Dict[str, Any]) -> None:
+        write_json(self.index_path, idx, indent=2)
+        _fsync_dir(self.dir)
+
+    @contextmanager
+    def _file_lock(self):
+        if fcntl is None:
+            yield
+            return
+        with open(self.lock_path, "a") as lf:
+            fcntl.flock(lf, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lf, fcntl.LOCK_UN)
+
+    # ---------- writer ----------
+    def _bootstrap(self) -> Dict[str, Any]:
+        """First segment; imports the legacy whole-file ledger once."""
+        idx = {"version": 1, "segments": [{"name": _seg_name(1), "created": time.time(), "sealed": False}]}
+        path = self.dir / _seg_name(1)
+        if self.legacy is not None and self.legacy.exists():
+            try:
+                events = json.loads(self.legacy.read_text(encoding="utf-8")).get("events", [])
+            except ValueError:
+                events = []
+            with open(path, "ab") as f:
+                for e in events:
+                    f.write(json.dumps(e, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self.legacy.rename(self.legacy.with_name(self.legacy.name + ".migrated"))
+            log.info("imported %d legacy ledger events into %s", len(events), path)
+        else:
+            path.touch()
+        idx["segments"][0].update(_scan_segment(path))
+        self._save_index(idx)
+        return idx
+
+    def _open_active(self, idx: Dict[str, Any]) -> None:
+        name = idx["segments"][-1]["name"]
+        if self._fh is not None and self._fh_name == name:
+            return
+        self._close_fh()
+        path = self.dir / name
+        # trim a torn tail left by a crash before appending after it
+        if path.exists() and path.stat().st_size:
+            with open(path, "rb+") as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    f.seek(0)
+                    f.truncate(f.read().rfind(b"\n") + 1)
+        self._fh = open(path, "ab")
+        self._fh_name = name
+        if self._seg_stats is None or self._seg_stats["name"] != name:
+            # callers _catch_up() next: nothing to read for a segment this process just rotated to,
+            # a one-off scan when the process first opens a segment others have been writing
+            self._seg_stats = {"name": name, "count": 0, "first_ts": None, "last_ts": None, "bytes": 0}
+
+    def _catch_up(self, size: int) -> None:
+        """Fold lines other processes appended to the active segment since our last look."""
+        st = self._seg_stats
+        if st["bytes"] >= size:
+            return
+        for end, e in _iter_file(self.dir / st["name"], st["bytes"]):
+            if end > size:
+                break
+            _fold(st, e)
+            st["bytes"] = end
+
+    def _close_fh(self) -> None:
+        if self._fh is not None:
+            self._fh.flush()
+            os.fsync(self._fh.fileno())
+            self._fh.close()
+            self._fh = None
+            self._fh_name = None
+            self._pending = 0
+
+    def _rotate(self, idx: Dict[str, Any]) -> Dict[str, Any]:
+        active = idx["segments"][-1]
+        self._open_active(idx)
+        self._catch_up(os.fstat(self._fh.fileno()).st_size)
+        st = self._seg_stats
+        self._close_fh()
+        sealed = dict(active, sealed=True, count=st["count"], first_ts=st["first_ts"], last_ts=st["last_ts"],
+                      bytes=st["bytes"])
+        nxt = {"name": _seg_name(_seg_seq(active["name"]) + 1), "created": time.time(), "sealed": False}
+        (self.dir / nxt["name"]).touch()
+        idx = {**idx, "segments": idx["segments"][:-1] + [sealed, nxt]}
+        self._save_index(idx)
+        self.rotations += 1
+        return idx
+
+    def _needs_rotation(self, active: Dict[str, Any]) -> bool:
+        if time.time() - float(active.get("created", 0)) >= self.max_age_sec:
+            return os.path.getsize(self.dir / active["name"]) > 0
+        return os.path.getsize(self.dir / active["name"]) >= self.max_bytes
+
+    def ensure(self) -> None:
+        """Create the ledger (importing the legacy file) if it does not exist yet."""
+        if self.index_path.exists():
+            return
+        with self._lock:
+            self.dir.mkdir(parents=True, exist_ok=True)
+            with self._file_lock():
+                if not self.index_path.exists():
+                    self._bootstrap()
+
+    def append(self, event: Dict[str, Any]) -> Tuple[str, int, int]:
+        """Returns (segment, start offset, end offset) of the written line."""
+        if self._thread is None:
+            self.start()
+        line = json.dumps(event, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+        with self._lock:
+            self.dir.mkdir(parents=True, exist_ok=True)
+            with self._file_lock():
+                idx = self.index() if self.index_path.exists() else self._bootstrap()
+                if self._needs_rotation(idx["segments"][-1]):
+                    idx = self._rotate(idx)
+                self._open_active(idx)
+                self._catch_up(os.fstat(self._fh.fileno()).st_size)
+                self._fh.write(line)
+                self._fh.flush()
+                end = self._fh.tell()
+                name = self._fh_name
+                _fold(self._seg_stats, event)
+                self._seg_stats["bytes"] = end
+            self.appended += 1
+            if not self._pending:
+                self._pending_since = time.monotonic()
+            self._pending += 1
+            if self._pending >= self.fsync_every:
+                self._fsync()
+        return name, end - len(line), end
+
+    def _fsync(self) -> None:
+        if self._fh is not None and self._pending:
+            os.fsync(self._fh.fileno())
+            self.fsyncs += 1
+        self._pending = 0
+
+    def sync(self) -> None:
+        with self._lock:
+            self._fsync()
+
+    # ---------- background flusher ----------
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="ledger-fsync", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        tick = max(self.fsync_sec / 4, 0.01)
+        while not self._stop.wait(tick):
+            try:
+                if self._pending and time.monotonic() - self._pending_since >= self.fsync_sec:
+                    self.sync()
+            except Exception:
+                log.exception("ledger fsync failed")
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+        with self._lock:
+            self._close_fh()
+
+    # ---------- readers ----------
+    def segments(self, since: Optional[str] = None, until: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Index entries overlapping [since, until] (ISO timestamps, inclusive)."""
+        if not self.index_path.exists():
+            return []
+        out = []
+        for s in self.index()["segments"]:
+            if s.get("sealed"):
+                if not s.get("count"):
+                    continue
+                if since and s["last_ts"] < since:
+                    continue
+                if until and s["first_ts"] > until:
+                    continue
+            out.append(s)
+        return out
+
+    def iter_events(self, since: Optional[str] = None, until: Optional[str] = None,
+                    **match: Any) -> Iterator[Dict[str, Any]]:
+        """
+        Stream events in append order. `since`/`until` bound e["ts"];
+        keyword filters match fields exactly (e.g. tenant_id="t1").
+        """
+        if not self.index_path.exists() and self.legacy is not None and self.legacy.exists():
+            # not migrated yet (no paid call since upgrade)
+            source = [read_json(self.legacy, {"events": []}).get("events", [])]
+        else:
+            source = ((e for _, e in _iter_file(self.dir / seg_file(s))) for s in self.segments(since, until))
+        for events in source:
+            for e in events:
+                ts = e.get("ts") or ""
+                if since and ts < since:
+                    continue
+                if until and ts > until:
+                    continue
+                if match and any(e.get(k) != v for k, v in match.items()):
+                    continue
+                yield e
+
+    def read_segment(self, name: str, offset: int = 0) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """(end offset, event) for the complete lines of one segment (current revision) from `offset`."""
+        entry = next((s for s in self.index()["segments"] if s["name"] == name), {"name": name})
+        return _iter_file(self.dir / seg_file(entry), offset)
+
+    def scan_from(self, segment: Optional[str] = None, offset: int = 0) -> Iterator[Tuple[str, int, Dict[str, Any]]]:
+        """
+        (segment, end offset, event) for every event after position (segment, offset);
+        segment=None starts at the beginning. The last yielded position is a
+        resumable watermark.
+        """
+        self.ensure()
+        start = _seg_seq(segment) if segment else 0
+        for s in self.index()["segments"]:
+            seq = _seg_seq(s["name"])
+            if seq < start:
+                continue
+            for end, e in _iter_file(self.dir / seg_file(s), offset if seq == start else 0):
+                yield s["name"], end, e
+
+    # ---------- revisions (api/billing_rerate.py) ----------
+    def epoch(self) -> int:
+        """Bumped whenever a sealed segment is replaced by a new revision."""
+        return int(self.index().get("epoch", 0)) if self.index_path.exists() else 0
+
+    def seal_active(self) -> Optional[str]:
+        """Rotate now if the active segment has data; returns the sealed segment name."""
+        self.ensure()
+        with self._lock:
+            with self._file_lock():
+                idx = self.index()
+                active = idx["segments"][-1]
+                if os.path.getsize(self.dir / active["name"]) == 0:
+                    return None
+                self._rotate(idx)
+                return active["name"]
+
+    def install_revision(self, name: str, path: Path, meta: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Point sealed segment `name` at a fully written revision file in the ledger
+        directory. Appends are only blocked for the index swap.
+        """
+        with self._lock:
+            with self._file_lock():
+                idx = self.index()
+                segs = []
+                for s in idx["segments"]:
+                    if s["name"] == name:
+                        if not s.get("sealed"):
+                            raise ValueError(f"segment {name} is active; seal it first")
+                        s = dict(s, file=path.name, bytes=path.stat().st_size, **meta)
+                    segs.append(s)
+                idx = {**idx, "segments": segs, "epoch": int(idx.get("epoch", 0)) + 1}
+                self._save_index(idx)
+                return idx
+
+    def stats(self) -> Dict[str, Any]:
+        segs = self.index()["segments"] if self.index_path.exists() else []
+        return {
+            "segments": len(segs),
+            "sealed_events": sum(int(s.get("count") or 0) for s in segs if s.get("sealed")),
+            "active_segment": segs[-1]["name"] if segs else None,
+            "appended": self.appended,
+            "fsyncs": self.fsyncs,
+            "rotations": self.rotations,
+            "pending_fsync": self._pending,
+        }
+
+
+LEDGER = SegmentedLedger()
@@ -1,6 +1,7 @@
 import time, uuid
-from db.database import SessionLocal
-from db.wallet_models import Wallet, UsageEvent
+from db.wallet_models import UsageEvent
+from api import wallet_service
+from api.config import WALLET_STARTER_CREDITS
 
 DEFAULT_COSTS = {
     "SKILL_RUN": 1,
@@ -9,34 +10,16 @@ DEFAULT_COSTS = {
     "CHAT": 1,
 }
 
-def ensure_wallet(tenant_id: str, starter: int = 100):
-    db = SessionLocal()
-    w = db.query(Wallet).filter(Wallet.tenant_id == tenant_id).first()
-    if not w:
-        w = Wallet(tenant_id=tenant_id, balance=starter)
-        db.add(w); db.commit()
-    db.close()
+def ensure_wallet(tenant_id: str, starter: int = WALLET_STARTER_CREDITS):
+    wallet_service.ensure_wallet(tenant_id, starter)
 
 def charge(tenant_id: str, credits: int) -> bool:
-    db = SessionLocal()
-    w = db.query(Wallet).filter(Wallet.tenant_id == tenant_id).first()
-    if not w:
-        w = Wallet(tenant_id=tenant_id, balance=0)
-        db.add(w); db.commit()
+    return wallet_service.charge(tenant_id, credits, starter=WALLET_STARTER_CREDITS)
 
-    if w.balance < credits:
-        db.close()
-        return False
-
-    w.balance -= credits
-    db.commit()
-    db.close()
-    return True
-
-def log_usage(*, tenant_id: str, user_id: str, device_id: str|None,
+def add_usage(db, *, tenant_id: str, user_id: str, device_id: str|None,
               action: str, credits: int, ok: bool, ref_id: str|None=None,
-              error: str|None=None, units: int = 1):
-    db = SessionLocal()
+              error: str|None=None, units: int = 1) -> str:
+    # staged in the caller's session (no commit)
     ev = UsageEvent(
         id=str(uuid.uuid4()),
         ts=int(time.time()),
@@ -50,4 +33,5 @@ def log_usage(*, tenant_id: str, user_id: str, device_id: str|None,
         ref_id=ref_id,
         error=error
     )
-    db.add(ev); db.commit(); db.close()
+    db.add(ev)
+    return ev.id
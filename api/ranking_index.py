@@ -0,0 +1,138 @@
+from __future__ import annotations
+import heapq
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from registry.snapshot import read_json, signature
+from api.billing_rollups import ROLLUPS
+from api.review_log import REVIEW_LOG
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+REG = BASE_DIR / "registry"
+FEATURED_FILE = REG / "featured.json"
+
+class RatingAgg:
+    __slots__ = ("count", "total", "stars")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.stars = [0, 0, 0, 0, 0, 0]     # index 1..5
+
+    def add(self, rating: int) -> None:
+        self.count += 1
+        self.total += rating
+        self.stars[rating] += 1
+
+    @property
+    def avg(self) -> float:
+        return round(self.total / self.count, 2) if self.count else 0.0
+
+    def summary(self, skill_id: str) -> Dict[str, Any]:
+        if not self.count:
+            return {"skill_id": skill_id, "count": 0, "avg": 0.0, "stars": {}}
+        return {"skill_id": skill_id, "count": self.count, "avg": self.avg,
+                "stars": {s: n for s, n in enumerate(self.stars) if n}}
+
+class RankingIndex:
+    """
+    Marketplace ranking inputs, kept up to date instead of recomputed per request:
+      ratings   skill_id -> count / sum / star histogram   (review log)
+      usage     skill_id -> billed events                  (billing rollups)
+      featured  set of skill_ids                           (featured.json)
+    Ratings are folded from the review log up to a byte watermark, so only
+    reviews appended since (by any worker) are read; add_review patches the
+    index through note_review.
+    """
+
+    def __init__(self):
+        self.ratings: Dict[str, RatingAgg] = {}
+        self.featured: frozenset = frozenset()
+        self._sigs: Dict[str, Any] = {}
+        self._reviews_off = 0
+        self._lock = threading.Lock()
+
+    def _add_rating(self, review: Dict[str, Any]) -> None:
+        agg = self.ratings.get(review.get("skill_id"))
+        if agg is None:
+            agg = self.ratings[review.get("skill_id")] = RatingAgg()
+        agg.add(int(review["rating"]))
+
+    def _catch_up_ratings(self) -> None:
+        size = REVIEW_LOG.size()
+        if size == self._reviews_off:
+            return
+        if size < self._reviews_off:
+            self.ratings, self._reviews_off = {}, 0     # log was replaced
+        for end, rec in REVIEW_LOG.scan_from(self._reviews_off):
+            if rec.get("op") == "add":
+                self._add_rating(rec["review"])
+            self._reviews_off = end
+
+    def _build_featured(self) -> None:
+        self.featured = frozenset(read_json(FEATURED_FILE, {"featured_skills": []}).get("featured_skills", []))
+
+    def refresh(self) -> "RankingIndex":
+        with self._lock:
+            self._catch_up_ratings()
+        sig = signature(FEATURED_FILE)
+        if self._sigs.get(FEATURED_FILE.name) != sig:
+            with self._lock:
+                self._build_featured()
+                self._sigs[FEATURED_FILE.name] = signature(FEATURED_FILE)
+        return self
+
+    # --- incremental update, called right after reviews_store appended to the log ---
+    def note_review(self, review: Dict[str, Any], position: Tuple[int, int]) -> None:
+        start, end = position
+        with self._lock:
+            if self._reviews_off == start:
+                self._add_rating(review)
+                self._reviews_off = end
+            else:
+                self._catch_up_ratings()
+
+    # --- reads ---
+    def rating(self, skill_id: str) -> Dict[str, Any]:
+        return self.refresh().ratings.get(skill_id, RatingAgg()).summary(skill_id)
+
+    def usage(self) -> Dict[str, int]:
+        return ROLLUPS.skill_events()
+
+    def rank(self, skills: Iterable[Dict[str, Any]], limit: Optional[int] = None,
+             offset: int = 0, boost: Optional[Dict[str, float]] = None) -> List[Dict[str, Any]]:
+        """
+        Skills ordered by rank score (+ boost, e.g. search relevance; ties keep
+        input order). With `limit`, only the first offset+limit are selected,
+        via a bounded heap.
+        """
+        self.refresh()
+        ratings, featured, usage = self.ratings, self.featured, self.usage()
+        boost = boost or {}
+        empty = RatingAgg()
+
+        def score(s: Dict[str, Any]) -> float:
+            sid = s.get("skill_id")
+            r = ratings.get(sid, empty)
+            feat = 1 if sid in featured else 0
+            # weighted score
+            return (feat * 1000) + (r.avg * 100) + (r.count * 2) + (int(usage.get(sid, 0)) * 1) + boost.get(sid, 0.0)
+
+        if limit is None:
+            top = sorted(skills, key=score, reverse=True)[offset:]
+        else:
+            top = heapq.nlargest(offset + max(0, limit), skills, key=score)[offset:]
+
+        out = []
+        for s in top:
+            sid = s.get("skill_id")
+            s2 = dict(s)
+            s2["rating"] = ratings.get(sid, empty).summary(sid)
+            s2["usage_count"] = usage.get(sid, 0)
+            s2["featured"] = sid in featured
+            s2["_rank_score"] = score(s)
+            out.append(s2)
+        return out
+
+RANKING = RankingIndex()
@@ -0,0 +1,194 @@
+"""
+Append-only review log (registry/reviews.jsonl).
+
+One JSON line per change:
+  {"op": "add",   "review": {...}}
+  {"op": "reply", "review_id": "...", "developer_response": {...}}
+
+Submitting a review appends one line instead of rewriting the whole
+reviews.json, so its cost does not depend on how many reviews exist. Readers
+fold the log from a byte offset: the in-process view below, the ranking index
+and the review stats each keep their own watermark and only read what was
+appended since.
+
+The legacy reviews.json is imported once, when the log is created, and renamed
+to reviews.json.migrated. Appends from several workers are serialised with an
+advisory file lock; a torn last line is trimmed by the next writer and skipped
+by readers.
+"""
+from __future__ import annotations
+import json
+import logging
+import os
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # non-POSIX: in-process lock only
+    fcntl = None
+
+log = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+REG = BASE_DIR / "registry"
+REVIEW_LOG_FILE = REG / "reviews.jsonl"
+LEGACY_REVIEWS_FILE = REG / "reviews.json"
+
+
+def _line(record: Dict[str, Any]) -> bytes:
+    return json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+
+
+class ReviewLog:
+    def __init__(self, path: Path = REVIEW_LOG_FILE, legacy: Optional[Path] = LEGACY_REVIEWS_FILE):
+        self.path = path
+        self.legacy = legacy
+        self.lock_path = path.with_name(path.name + ".lock")
+        self._lock = threading.RLock()
+        self._fh = None
+        # folded view of the log up to self._offset
+        self._offset = 0
+        self._reviews: List[Dict[str, Any]] = []
+        self._by_id: Dict[str, Dict[str, Any]] = {}
+        self._by_skill: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+
+    @contextmanager
+    def _file_lock(self):
+        if fcntl is None:
+            yield
+            return
+        with open(self.lock_path, "a") as lf:
+            fcntl.flock(lf, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lf, fcntl.LOCK_UN)
+
+    # ---------- writer ----------
+    def _bootstrap(self) -> None:
+        """Create the log, importing the legacy whole-file reviews once."""
+        reviews = []
+        if self.legacy is not None and self.legacy.exists():
+            try:
+                reviews = json.loads(self.legacy.read_text(encoding="utf-8")).get("reviews", [])
+            except ValueError:
+                reviews = []
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(b"".join(_line({"op": "add", "review": r}) for r in reviews))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        if reviews:
+            self.legacy.rename(self.legacy.with_name(self.legacy.name + ".migrated"))
+            log.info("imported %d legacy reviews into %s", len(reviews), self.path)
+
+    def ensure(self) -> None:
+        if self.path.exists():
+            return
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self._file_lock():
+                if not self.path.exists():
+                    self._bootstrap()
+
+    def _open(self) -> None:
+        if self._fh is not None:
+            return
+        # trim a torn tail left by a crash before appending after it
+        if self.path.stat().st_size:
+            with open(self.path, "rb+") as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    f.seek(0)
+                    f.truncate(f.read().rfind(b"\n") + 1)
+        self._fh = open(self.path, "ab")
+
+    def append(self, record: Dict[str, Any]) -> Tuple[int, int]:
+        """Returns (start offset, end offset) of the written line."""
+        line = _line(record)
+        self.ensure()
+        with self._lock:
+            with self._file_lock():
+                self._open()
+                self._fh.write(line)
+                self._fh.flush()
+                os.fsync(self._fh.fileno())
+                end = self._fh.tell()
+        return end - len(line), end
+
+    def close(self) -> None:
+        with self._lock:
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+
+    # ---------- readers ----------
+    def size(self) -> int:
+        self.ensure()
+        try:
+            return self.path.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def scan_from(self, offset: int = 0) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """(end offset, record) for each complete line from `offset`."""
+        self.ensure()
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break          # torn tail (crash or in-flight append)
+                offset += len(raw)
+                try:
+                    yield offset, json.loads(raw)
+                except ValueError:
+                    continue
+
+    def _apply(self, rec: Dict[str, Any]) -> None:
+        if rec.get("op") == "add":
+            r = rec.get("review") or {}
+            self._reviews.append(r)
+            self._by_id[r.get("review_id")] = r
+            self._by_skill[r.get("skill_id")].append(r)
+        elif rec.get("op") == "reply":
+            r = self._by_id.get(rec.get("review_id"))
+            if r is not None:
+                r["developer_response"] = rec.get("developer_response")
+
+    def catch_up(self) -> int:
+        """Fold records appended since the last call (by any worker) into the view."""
+        with self._lock:
+            size = self.size()
+            if size == self._offset:
+                return 0
+            if size < self._offset:
+                # log was replaced: start over
+                self._offset = 0
+                self._reviews, self._by_id, self._by_skill = [], {}, defaultdict(list)
+            n = 0
+            for end, rec in self.scan_from(self._offset):
+                self._apply(rec)
+                self._offset = end
+                n += 1
+            return n
+
+    def reviews(self, skill_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        self.catch_up()
+        with self._lock:
+            if skill_id:
+                return list(self._by_skill.get(skill_id, ()))
+            return list(self._reviews)
+
+    def get(self, review_id: str) -> Optional[Dict[str, Any]]:
+        self.catch_up()
+        with self._lock:
+            r = self._by_id.get(review_id)
+            return dict(r) if r is not None else None
+
+
+REVIEW_LOG = ReviewLog()
@@ -0,0 +1,198 @@
+"""
+Per-user and per-tenant review counters for abuse scoring.
+
+Each subject keeps
+  [reviews, rating_mask, short_texts, window_start, window_count, prev_count]
+where rating_mask has bit r set for every star rating r the subject has given
+(distinct ratings = popcount) and the last three columns are a fixed review-rate
+window of REVIEW_RATE_WINDOW_SEC, read as a sliding estimate like the memory
+rate limiter (current + previous * overlap). Windows follow the review ts, so
+the counters are a pure function of the review log.
+
+Like the billing rollups, the stats are maintained from the review log up to a
+byte watermark: add_review applies its own review through note(), catch_up()
+reads whatever other workers appended, and the state is snapshotted to
+registry/review_stats.json every REVIEW_STATS_PERSIST_SEC and on shutdown.
+rebuild() (scripts/backfill_review_stats.py) recomputes it from scratch.
+"""
+from __future__ import annotations
+import calendar
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from api.config import REVIEW_RATE_WINDOW_SEC, REVIEW_STATS_PERSIST_SEC, REVIEW_SHORT_TEXT_CHARS
+from api.review_log import REVIEW_LOG, ReviewLog
+from registry.snapshot import read_json, write_json
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+STATS_FILE = BASE_DIR / "registry" / "review_stats.json"
+
+REVIEWS, RATING_MASK, SHORT_TEXTS, WINDOW_START, WINDOW_COUNT, PREV_COUNT = range(6)
+
+
+def _epoch(ts: str) -> int:
+    try:
+        return calendar.timegm(time.strptime(ts, "%Y-%m-%dT%H:%M:%SZ"))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _hit(s: List[int], rating: int, short: bool, ts: int, window_sec: int) -> None:
+    s[REVIEWS] += 1
+    if 1 <= rating <= 5:
+        s[RATING_MASK] |= 1 << rating
+    s[SHORT_TEXTS] += short
+    ws = ts - ts % window_sec
+    if ws > s[WINDOW_START]:
+        # previous window only counts if it is the one right before this one
+        s[PREV_COUNT] = s[WINDOW_COUNT] if s[WINDOW_START] == ws - window_sec else 0
+        s[WINDOW_START] = ws
+        s[WINDOW_COUNT] = 0
+    if ws == s[WINDOW_START]:
+        s[WINDOW_COUNT] += 1
+    # (a review older than the current window, e.g. a late writer, only moves the totals)
+
+
+def features(s: Optional[List[int]], now: Optional[float] = None,
+             window_sec: int = REVIEW_RATE_WINDOW_SEC) -> Dict[str, Any]:
+    if s is None:
+        return {"reviews": 0, "distinct_ratings": 0, "short_texts": 0, "recent": 0.0}
+    now = time.time() if now is None else now
+    ws = int(now) - int(now) % window_sec
+    overlap = 1.0 - (now - ws) / window_sec
+    if s[WINDOW_START] == ws:
+        recent = s[WINDOW_COUNT] + s[PREV_COUNT] * overlap
+    elif s[WINDOW_START] == ws - window_sec:
+        recent = s[WINDOW_COUNT] * overlap
+    else:
+        recent = 0.0
+    return {
+        "reviews": s[REVIEWS],
+        "distinct_ratings": bin(s[RATING_MASK]).count("1"),
+        "short_texts": s[SHORT_TEXTS],
+        "recent": round(recent, 3),
+    }
+
+
+class ReviewStats:
+    def __init__(self, log: ReviewLog = REVIEW_LOG, path: Path = STATS_FILE,
+                 window_sec: int = REVIEW_RATE_WINDOW_SEC, persist_sec: float = REVIEW_STATS_PERSIST_SEC):
+        self.log = log
+        self.path = path
+        self.window_sec = window_sec
+        self.persist_sec = persist_sec
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._users: Dict[str, List[int]] = {}
+        self._tenants: Dict[str, List[int]] = {}
+        self._watermark = 0
+        self._dirty = False
+        self._last_persist = time.monotonic()
+
+    # ---------- state ----------
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        data = read_json(self.path, {"watermark": 0, "users": {}, "tenants": {}})
+        self._users = {k: list(v) for k, v in data.get("users", {}).items()}
+        self._tenants = {k: list(v) for k, v in data.get("tenants", {}).items()}
+        self._watermark = int(data.get("watermark", 0))
+        if int(data.get("window_sec", self.window_sec)) != self.window_sec:
+            self._reset()
+        self._loaded = True
+
+    def _reset(self) -> None:
+        self._users, self._tenants, self._watermark = {}, {}, 0
+        self._dirty = True
+
+    def persist(self) -> None:
+        with self._lock:
+            if not self._loaded:
+                return
+            write_json(self.path, {
+                "watermark": self._watermark,
+                "window_sec": self.window_sec,
+                "users": self._users,
+                "tenants": self._tenants,
+            }, indent=None)
+            self._dirty = False
+            self._last_persist = time.monotonic()
+
+    def _maybe_persist(self) -> None:
+        if self._dirty and time.monotonic() - self._last_persist >= self.persist_sec:
+            self.persist()
+
+    # ---------- maintenance ----------
+    def _apply(self, review: Dict[str, Any]) -> None:
+        rating = int(review.get("rating", 0))
+        short = len(review.get("text") or "") < REVIEW_SHORT_TEXT_CHARS
+        ts = _epoch(review.get("ts"))
+        for table, key in ((self._users, review.get("user_id")), (self._tenants, review.get("tenant_id"))):
+            s = table.get(key)
+            if s is None:
+                s = table[key] = [0, 0, 0, 0, 0, 0]
+            _hit(s, rating, short, ts, self.window_sec)
+
+    def _catch_up(self) -> int:
+        size = self.log.size()
+        if size == self._watermark:
+            return 0
+        if size < self._watermark:
+            self._reset()          # log was replaced
+        n = 0
+        for end, rec in self.log.scan_from(self._watermark):
+            if rec.get("op") == "add":
+                self._apply(rec.get("review") or {})
+                n += 1
+            self._watermark = end
+            self._dirty = True
+        return n
+
+    def note(self, review: Dict[str, Any], position: Tuple[int, int]) -> None:
+        """Called right after REVIEW_LOG.append() wrote `review` at `position`."""
+        start, end = position
+        with self._lock:
+            self._load()
+            if self._watermark == start:
+                self._apply(review)
+                self._watermark = end
+                self._dirty = True
+            else:
+                self._catch_up()
+            self._maybe_persist()
+
+    def catch_up(self) -> int:
+        with self._lock:
+            self._load()
+            n = self._catch_up()
+            self._maybe_persist()
+            return n
+
+    def rebuild(self) -> int:
+        with self._lock:
+            self._loaded = True
+            self._reset()
+            n = self._catch_up()
+            self.persist()
+            return n
+
+    # ---------- queries ----------
+    def user(self, user_id: str, now: Optional[float] = None) -> Dict[str, Any]:
+        self.catch_up()
+        with self._lock:
+            return features(self._users.get(user_id), now, self.window_sec)
+
+    def tenant(self, tenant_id: str, now: Optional[float] = None) -> Dict[str, Any]:
+        self.catch_up()
+        with self._lock:
+            return features(self._tenants.get(tenant_id), now, self.window_sec)
+
+    def stats(self) -> Dict[str, Any]:
+        self.catch_up()
+        with self._lock:
+            return {"users": len(self._users), "tenants": len(self._tenants), "watermark": self._watermark}
+
+
+REVIEW_STATS = ReviewStats()
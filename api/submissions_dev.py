@@ -16,8 +16,13 @@ def _db():
         db.close()
 
 @router.get("/workflows")
-def list_my_workflows(claims: dict = Depends(require_role("developer")), db: Session = Depends(_db)):
-    return {"count": 0, "workflows": dev_list_workflows(db, claims["sub"])}
+def list_my_workflows(limit: int = 50, cursor: str | None = None,
+                      claims: dict = Depends(require_role("developer")), db: Session = Depends(_db)):
+    try:
+        rows, next_cursor = dev_list_workflows(db, claims["sub"], limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"count": len(rows), "next_cursor": next_cursor, "workflows": rows}
 
 @router.post("/workflows/create")
 def create_workflow(payload: dict, claims: dict = Depends(require_role("developer")), db: Session = Depends(_db)):
@@ -41,5 +46,10 @@ def submit(payload: dict, claims: dict = Depends(require_role("developer")), db:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/submissions")
-def my_submissions(claims: dict = Depends(require_role("developer")), db: Session = Depends(_db)):
-    return {"count": 0, "submissions": dev_list_submissions(db, claims["sub"])}
+def my_submissions(limit: int = 50, cursor: str | None = None,
+                   claims: dict = Depends(require_role("developer")), db: Session = Depends(_db)):
+    try:
+        rows, next_cursor = dev_list_submissions(db, claims["sub"], limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"count": len(rows), "next_cursor": next_cursor, "submissions": rows}
@@ -5,6 +5,9 @@ import json
 import time
 import uuid
 
+from api import wallet_service
+from api.config import WALLET_STARTER_CREDITS
+
 BASE_DIR = Path(__file__).resolve().parent.parent
 LOG_DIR = BASE_DIR / "logs"
 LOG_DIR.mkdir(parents=True, exist_ok=True)
@@ -26,40 +29,13 @@ def append_invocation(event: Dict[str, Any]) -> None:
         f.write(json.dumps(event, ensure_ascii=False) + "\n")
 
 
-def _load_wallet() -> Dict[str, Any]:
-    if not WALLET_FILE.exists():
-        return {"tenants": {}}
-    try:
-        return json.loads(WALLET_FILE.read_text(encoding="utf-8"))
-    except Exception:
-        return {"tenants": {}}
-
-
-def _save_wallet(data: Dict[str, Any]) -> None:
-    # Atomic save
-    tmp = WALLET_FILE.with_suffix(".tmp")
-    tmp.write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding="utf-8")
-    tmp.replace(WALLET_FILE)
+# Balances: api/wallet_service.py. logs/wallet.json is legacy and only read by
+# scripts/reconcile_wallets.py.
 
-
-def ensure_tenant_wallet(tenant_id: str, starting_credits: int = 1000) -> Dict[str, Any]:
-    data = _load_wallet()
-    tenants = data.setdefault("tenants", {})
-    if tenant_id not in tenants:
-        tenants[tenant_id] = {"credits_total": starting_credits, "credits_used": 0}
-        _save_wallet(data)
-    return tenants[tenant_id]
+def ensure_tenant_wallet(tenant_id: str, starting_credits: int = WALLET_STARTER_CREDITS) -> Dict[str, Any]:
+    return {"tenant_id": tenant_id, "balance": wallet_service.ensure_wallet(tenant_id, starting_credits)}
 
 
 def spend_credits(tenant_id: str, credits: int) -> Dict[str, Any]:
-    data = _load_wallet()
-    tenants = data.setdefault("tenants", {})
-    wallet = tenants.get(tenant_id) or {"credits_total": 1000, "credits_used": 0}
-
-    wallet["credits_total"] = int(wallet.get("credits_total", 1000))
-    wallet["credits_used"] = int(wallet.get("credits_used", 0))
-
-    wallet["credits_used"] += int(credits)
-    tenants[tenant_id] = wallet
-    _save_wallet(data)
-    return wallet
+    charged = wallet_service.charge(tenant_id, int(credits), starter=WALLET_STARTER_CREDITS)
+    return {"tenant_id": tenant_id, "charged": charged, "balance": wallet_service.balance(tenant_id)}
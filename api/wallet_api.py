@@ -1,8 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException
 from db.database import SessionLocal
-from db.wallet_models import Wallet, UsageEvent
+from db.wallet_models import UsageEvent
+from db.pagination import keyset_page
 from api.security_deps import require_access, require_role
-from api.metering import ensure_wallet
+from api import wallet_service
+from api.config import WALLET_STARTER_CREDITS
 
 router = APIRouter(prefix="/wallet", tags=["wallet"])
 admin_router = APIRouter(prefix="/admin/usage", tags=["admin-usage"])
@@ -10,20 +12,33 @@ admin_router = APIRouter(prefix="/admin/usage", tags=["admin-usage"])
 @router.get("/balance")
 def wallet_balance(claims=Depends(require_access)):
     tenant_id = claims["tenant_id"]
-    ensure_wallet(tenant_id, starter=100)
-    db = SessionLocal()
-    w = db.query(Wallet).filter(Wallet.tenant_id == tenant_id).first()
-    db.close()
-    return {"tenant_id": tenant_id, "balance": (w.balance if w else 0)}
+    return {"tenant_id": tenant_id, "balance": wallet_service.ensure_wallet(tenant_id, starter=WALLET_STARTER_CREDITS)}
 
 @admin_router.get("/recent")
-def usage_recent(limit: int = 50, claims=Depends(require_role("admin"))):
+def usage_recent(limit: int = 50, cursor: str | None = None, tenant_id: str | None = None,
+                 action: str | None = None, since: int | None = None, until: int | None = None,
+                 claims=Depends(require_role("admin"))):
+    # newest first; since/until are unix seconds, next_cursor pages further back
     db = SessionLocal()
-    rows = db.query(UsageEvent).order_by(UsageEvent.ts.desc()).limit(limit).all()
-    out = []
-    for r in rows:
-        d = r.__dict__.copy()
-        d.pop("_sa_instance_state", None)
-        out.append(d)
-    db.close()
-    return {"count": len(out), "events": out}
+    try:
+        q = db.query(UsageEvent)
+        if tenant_id:
+            q = q.filter(UsageEvent.tenant_id == tenant_id)
+        if action:
+            q = q.filter(UsageEvent.action == action)
+        if since is not None:
+            q = q.filter(UsageEvent.ts >= since)
+        if until is not None:
+            q = q.filter(UsageEvent.ts <= until)
+        try:
+            rows, next_cursor = keyset_page(q, (UsageEvent.ts, UsageEvent.id), cursor, limit)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        out = []
+        for r in rows:
+            d = r.__dict__.copy()
+            d.pop("_sa_instance_state", None)
+            out.append(d)
+    finally:
+        db.close()
+    return {"count": len(out), "next_cursor": next_cursor, "events": out}
@@ -0,0 +1,118 @@
+"""
+The one place tenant balances are read and charged.
+
+Runtime charging, /wallet/balance, the billing dashboards and the legacy
+helpers (registry/wallet, governance_guard, metering, telemetry) all go through
+this module. The backend is pluggable: SQL `wallets` table by default,
+in-memory for tests (set_backend(MemoryWalletBackend())).
+"""
+from __future__ import annotations
+import threading
+from typing import Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from db import wallet_db
+
+class InsufficientCredits(ValueError):
+    pass
+
+class SqlWalletBackend:
+    name = "sql"
+
+    def balance(self, tenant_id: str) -> Optional[int]:
+        return wallet_db.get_balance(tenant_id)
+
+    def ensure(self, tenant_id: str, starter: int) -> int:
+        return wallet_db.ensure_wallet(tenant_id, starter)
+
+    def charge(self, tenant_id: str, credits: int, starter: Optional[int] = None) -> bool:
+        return wallet_db.charge(tenant_id, credits, starter=starter)
+
+    def charge_in(self, db: Session, tenant_id: str, credits: int, starter: Optional[int] = None) -> bool:
+        # joins the caller's transaction (no commit)
+        return wallet_db.charge_in(db, tenant_id, credits, starter=starter)
+
+    def credit(self, tenant_id: str, credits: int) -> int:
+        return wallet_db.credit(tenant_id, credits)
+
+    def set_balances(self, balances: Dict[str, int], overwrite: bool = True) -> int:
+        return wallet_db.set_balances(balances, overwrite=overwrite)
+
+    def all_balances(self) -> Dict[str, int]:
+        return wallet_db.all_balances()
+
+class MemoryWalletBackend:
+    name = "memory"
+
+    def __init__(self, balances: Dict[str, int] | None = None):
+        self._b: Dict[str, int] = dict(balances or {})
+        self._lock = threading.Lock()
+
+    def balance(self, tenant_id: str) -> Optional[int]:
+        return self._b.get(tenant_id)
+
+    def ensure(self, tenant_id: str, starter: int) -> int:
+        with self._lock:
+            return self._b.setdefault(tenant_id, int(starter))
+
+    def charge(self, tenant_id: str, credits: int, starter: Optional[int] = None) -> bool:
+        with self._lock:
+            if tenant_id not in self._b:
+                if starter is None:
+                    return False
+                self._b[tenant_id] = int(starter)
+            if self._b[tenant_id] < credits:
+                return False
+            self._b[tenant_id] -= int(credits)
+            return True
+
+    def credit(self, tenant_id: str, credits: int) -> int:
+        with self._lock:
+            self._b[tenant_id] = self._b.get(tenant_id, 0) + int(credits)
+            return self._b[tenant_id]
+
+    def set_balances(self, balances: Dict[str, int], overwrite: bool = True) -> int:
+        n = 0
+        with self._lock:
+            for t, b in balances.items():
+                if overwrite or t not in self._b:
+                    self._b[t] = int(b)
+                    n += 1
+        return n
+
+    def all_balances(self) -> Dict[str, int]:
+        return dict(self._b)
+
+_backend = SqlWalletBackend()
+
+def get_backend():
+    return _backend
+
+def set_backend(backend) -> None:
+    global _backend
+    _backend = backend
+
+def balance(tenant_id: str) -> int:
+    return _backend.balance(tenant_id) or 0
+
+def ensure_wallet(tenant_id: str, starter: int) -> int:
+    return _backend.ensure(tenant_id, starter)
+
+def charge(tenant_id: str, credits: int, starter: Optional[int] = None) -> bool:
+    """Atomic conditional decrement. False on insufficient funds."""
+    return _backend.charge(tenant_id, int(credits), starter=starter)
+
+def charge_in(db: Session, tenant_id: str, credits: int, starter: Optional[int] = None) -> bool:
+    """Same as charge(), but joins the caller's transaction when the backend supports it."""
+    fn = getattr(_backend, "charge_in", None)
+    if fn is None:
+        return _backend.charge(tenant_id, int(credits), starter=starter)
+    return fn(db, tenant_id, int(credits), starter=starter)
+
+def charge_or_raise(tenant_id: str, credits: int, starter: Optional[int] = None) -> None:
+    if not charge(tenant_id, credits, starter=starter):
+        raise InsufficientCredits(f"Insufficient credits. Have {balance(tenant_id)}, need {int(credits)}.")
+
+def credit(tenant_id: str, credits: int) -> int:
+    return _backend.credit(tenant_id, credits)
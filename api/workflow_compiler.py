@@ -0,0 +1,174 @@
+"""
+Workflow step templates compiled once, rendered many times.
+
+A step input is split once on its {var} slots (literal, name, literal, ...):
+a string becomes a Template; a dict / list becomes a JsonTemplate over its
+JSON text, rendered by filling the slots and parsing the result in one C pass
+(inputs that don't round-trip through JSON fall back to a tree of dict / list
+nodes). Slots are filled through a callback, so the missing-value and
+formatting rules stay with the caller:
+
+    workflow_runner      missing -> "", dict / list -> JSON
+    agent_orchestrator   missing or non-scalar -> "{name}" left as is
+
+compile_steps() caches per digest of the steps (marketplace runs send their
+steps in the payload, so (workflow_id, version) alone can't identify them),
+in an LRU of WORKFLOW_COMPILE_CACHE_MAX entries. Rendered values are fresh
+dicts / lists; the cached tree is never handed out.
+"""
+from __future__ import annotations
+import hashlib
+import json
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, FrozenSet, List, Tuple
+
+from api.config import WORKFLOW_COMPILE_CACHE_MAX
+
+VAR = re.compile(r"\{([a-zA-Z0-9_]+)\}")
+_dumps = json.JSONEncoder(ensure_ascii=False).encode
+_loads = json.JSONDecoder().decode
+
+
+class Template:
+    """A string with {var} slots: parts = (literal, name, literal, ..., literal)."""
+    __slots__ = ("parts",)
+
+    def __init__(self, parts: Tuple[str, ...]):
+        self.parts = parts
+
+    @property
+    def names(self) -> Tuple[str, ...]:
+        return self.parts[1::2]
+
+
+class JsonTemplate:
+    """A whole dict / list as its JSON text split on {var} slots; rendering fills
+    the (JSON-escaped) slots and parses the text, which also yields fresh objects."""
+    __slots__ = ("parts",)
+
+    def __init__(self, parts: Tuple[str, ...]):
+        self.parts = parts
+
+    @property
+    def names(self) -> Tuple[str, ...]:
+        return self.parts[1::2]
+
+
+class DictNode:
+    __slots__ = ("items",)
+
+    def __init__(self, items: Tuple[Tuple[Any, Any], ...]):
+        self.items = items
+
+
+class ListNode:
+    __slots__ = ("items",)
+
+    def __init__(self, items: Tuple[Any, ...]):
+        self.items = items
+
+
+def _keys_plain(value: Any) -> bool:
+    # dict keys are never templated, so they must not look like slots in the JSON text
+    if isinstance(value, dict):
+        return all(isinstance(k, str) and not VAR.search(k) and _keys_plain(v) for k, v in value.items())
+    if isinstance(value, list):
+        return all(_keys_plain(v) for v in value)
+    return True
+
+
+def _as_json(value: Any) -> Any:
+    try:
+        text = json.dumps(value)
+    except (TypeError, ValueError):
+        return None
+    if not _keys_plain(value) or json.loads(text) != value:
+        return None
+    # slot names are [a-zA-Z0-9_], which JSON never escapes, so each slot in a string
+    # value appears verbatim in the text; JSON syntax itself never contains "{name}"
+    return JsonTemplate(tuple(VAR.split(text)))
+
+
+def compile_template(value: Any) -> Any:
+    if isinstance(value, str):
+        parts = VAR.split(value)
+        return value if len(parts) == 1 else Template(tuple(parts))
+    if isinstance(value, (dict, list)):
+        compiled = _as_json(value)
+        if compiled is not None:
+            return compiled
+    if isinstance(value, dict):
+        return DictNode(tuple((k, compile_template(v)) for k, v in value.items()))
+    if isinstance(value, list):
+        return ListNode(tuple(compile_template(v) for v in value))
+    return value
+
+
+def slots(node: Any) -> FrozenSet[str]:
+    """Var names a compiled template reads."""
+    if isinstance(node, (Template, JsonTemplate)):
+        return frozenset(node.names)
+    if isinstance(node, (DictNode, ListNode)):
+        items = node.items if isinstance(node, ListNode) else (v for _, v in node.items)
+        return frozenset().union(*(slots(v) for v in items))
+    return frozenset()
+
+
+def render(node: Any, fill: Callable[[str], str]) -> Any:
+    t = type(node)
+    if t is Template:
+        out = list(node.parts)
+        for i in range(1, len(out), 2):
+            out[i] = fill(out[i])
+        return "".join(out)
+    if t is JsonTemplate:
+        out = list(node.parts)
+        for i in range(1, len(out), 2):
+            out[i] = _dumps(fill(out[i]))[1:-1]
+        return _loads("".join(out))
+    if t is DictNode:
+        return {k: render(v, fill) for k, v in node.items}
+    if t is ListNode:
+        return [render(v, fill) for v in node.items]
+    return node
+
+
+class CompiledSteps:
+    __slots__ = ("inputs", "reads")
+
+    def __init__(self, steps: List[Dict[str, Any]]):
+        self.inputs = tuple(compile_template(st.get("input", {}) or {}) for st in steps)
+        self.reads = tuple(slots(n) for n in self.inputs)
+
+
+_cache: "OrderedDict[str, CompiledSteps]" = OrderedDict()
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+
+
+def steps_digest(steps: List[Dict[str, Any]]) -> str:
+    return hashlib.sha1(json.dumps(steps, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def compile_steps(steps: List[Dict[str, Any]]) -> CompiledSteps:
+    key = steps_digest(steps)
+    with _lock:
+        hit = _cache.get(key)
+        if hit is not None:
+            _cache.move_to_end(key)
+            _stats["hits"] += 1
+            return hit
+    compiled = CompiledSteps(steps)
+    with _lock:
+        _stats["misses"] += 1
+        _cache[key] = compiled
+        while len(_cache) > WORKFLOW_COMPILE_CACHE_MAX:
+            _cache.popitem(last=False)
+    return compiled
+
+
+def cache_stats() -> Dict[str, int]:
+    with _lock:
+        return {"entries": len(_cache), **_stats}
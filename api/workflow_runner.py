@@ -1,31 +1,21 @@
-import json, time, os, re
-from pathlib import Path
-from typing import Any, Dict, List, Callable
+import json, time, os, threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Dict, Iterable, List, Callable, Optional, Set, Tuple
+
+from api.config import WORKFLOW_MAX_PARALLEL, WORKFLOW_STEP_POOL
+from api.workflow_compiler import CompiledSteps, compile_steps, render
+from api.workflow_runs import RUNS
 
 def _now_ts() -> int:
     return int(time.time())
 
-def _ensure_reports():
-    Path("reports").mkdir(parents=True, exist_ok=True)
-
-def _write_status(obj: Dict[str, Any]):
-    _ensure_reports()
-    Path("reports/workflow_latest.json").write_text(json.dumps(obj, indent=2), encoding="utf-8")
-
-def _template_apply(value: Any, vars: Dict[str, Any]) -> Any:
-    if isinstance(value, str):
-        def repl(m):
-            k = m.group(1)
-            v = vars.get(k, "")
-            if isinstance(v, (dict, list)):
-                return json.dumps(v)
-            return str(v)
-        return re.sub(r"\{([a-zA-Z0-9_]+)\}", repl, value)
-    if isinstance(value, dict):
-        return {k: _template_apply(v, vars) for k, v in value.items()}
-    if isinstance(value, list):
-        return [_template_apply(v, vars) for v in value]
-    return value
+def _fill(vars: Dict[str, Any]) -> Callable[[str], str]:
+    def fill(k: str) -> str:
+        v = vars.get(k, "")
+        if isinstance(v, (dict, list)):
+            return json.dumps(v)
+        return str(v)
+    return fill
 
 def _rag_query_internal(tenant_id: str, query: str, top_k: int = 3) -> Dict[str, Any]:
     """
@@ -58,21 +48,95 @@ def _rag_query_internal(tenant_id: str, query: str, top_k: int = 3) -> Dict[str,
 
     return {"ok": False, "matches": [], "error": f"RAG backend not found: {type(last_err).__name__}: {last_err}"}
 
-def run_marketplace_workflow(
-    tenant_id: str,
-    user_id: str,
-    device_id: str,
-    workflow_id: str,
-    version: str,
-    steps: List[Dict[str, Any]],
-    skill_call_fn: Callable[[str, Dict[str, Any]], Dict[str, Any]],
-    initial_vars: Dict[str, Any] | None = None,
-) -> Dict[str, Any]:
-    start = time.time()
-    vars: Dict[str, Any] = dict(initial_vars or {})
-    results: List[Dict[str, Any]] = []
+# ---------- step dependencies ----------
+RAG_OUTPUTS = frozenset({"rag_matches", "rag_context"})
+
+def _step_outputs(step: Dict[str, Any], output_keys_fn: Optional[Callable[[str], Optional[Iterable[str]]]]) -> Optional[Set[str]]:
+    """Vars a step may set; None = unknown (any var)."""
+    if step.get("type") == "rag_query":
+        return set(RAG_OUTPUTS)
+    declared = step.get("outputs")
+    if isinstance(declared, list):
+        return set(declared)
+    if output_keys_fn and step.get("skill_id"):
+        keys = output_keys_fn(step["skill_id"])
+        if keys is not None:
+            return set(keys)
+    return None
+
+def plan_steps(steps: List[Dict[str, Any]],
+               output_keys_fn: Optional[Callable[[str], Optional[Iterable[str]]]] = None,
+               compiled: Optional[CompiledSteps] = None) -> List[List[int]]:
+    """
+    deps[j] = earlier steps that may set a var step j's templates read.
+
+    In the sequential runner step j saw the var values of the latest earlier
+    step that set them, so once deps[j] are done, rendering j against the
+    initial vars overlaid with their outputs (in step order) gives the same
+    input. A step's outputs are its `outputs: [...]` list, else the skill's
+    declared output keys (closed output_schema only), else unknown - and a
+    step with unknown outputs is a dependency of every later step that reads
+    any var.
+    """
+    reads = (compiled or compile_steps(steps)).reads
+    writes = [_step_outputs(st, output_keys_fn) for st in steps]
+    deps: List[List[int]] = []
+    for j in range(len(steps)):
+        deps.append([i for i in range(j) if reads[j] and (writes[i] is None or writes[i] & reads[j])])
+    return deps
+
+_POOL: Optional[ThreadPoolExecutor] = None
+_POOL_LOCK = threading.Lock()
+
+def _pool() -> ThreadPoolExecutor:
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = ThreadPoolExecutor(max_workers=max(1, WORKFLOW_STEP_POOL), thread_name_prefix="workflow-step")
+        return _POOL
+
+def _run_step(tenant_id: str, step: Dict[str, Any], inp: Dict[str, Any],
+              skill_call_fn: Callable[[str, Dict[str, Any]], Dict[str, Any]]) -> Tuple[Dict[str, Any], Dict[str, Any], int]:
+    """-> (step_out, vars the step sets, latency_ms)"""
+    step_start = time.time()
+    step_type = step.get("type")
+    skill_id = step.get("skill_id")
+    sets: Dict[str, Any] = {}
+
+    step_out: Dict[str, Any]
+    if step_type == "rag_query":
+        query = inp.get("query", "")
+        top_k = int(inp.get("top_k", 3))
+        rag = _rag_query_internal(tenant_id=tenant_id, query=str(query), top_k=top_k)
+
+        matches = rag.get("matches", []) or []
+        context = "\n".join([m.get("text", "") for m in matches if isinstance(m, dict)]).strip()
 
-    status = {
+        sets["rag_matches"] = matches
+        sets["rag_context"] = context
+        step_out = {"ok": rag.get("ok", False), "output": {"matches": matches, "context": context}, "error": rag.get("error")}
+    else:
+        if not skill_id:
+            step_out = {"ok": False, "output": {}, "error": "step must include type=rag_query OR skill_id"}
+        else:
+            step_out = skill_call_fn(skill_id, inp)
+            if step_out.get("ok"):
+                out_obj = step_out.get("output") or {}
+                if isinstance(out_obj, dict):
+                    sets.update(out_obj)
+                # plan_steps trusted the declared outputs; a step setting more would race its readers
+                declared = step.get("outputs")
+                undeclared = sorted(set(sets) - set(declared)) if isinstance(declared, list) else []
+                if undeclared:
+                    sets = {}
+                    step_out = {**step_out, "ok": False, "error": f"step set undeclared outputs: {undeclared}"}
+
+    return step_out, sets, int((time.time() - step_start) * 1000)
+
+def initial_status(tenant_id: str, user_id: str, device_id: str, workflow_id: str, version: str,
+                   steps: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Initial status of a run, as published to the run registry."""
+    return {
         "ts": _now_ts(),
         "tenant_id": tenant_id,
         "user_id": user_id,
@@ -84,71 +148,133 @@ def run_marketplace_workflow(
         "steps_done": 0,
         "last_step": None,
     }
-    _write_status(status)
 
-    for idx, step in enumerate(steps):
-        step_start = time.time()
-        step_type = step.get("type")
-        skill_id = step.get("skill_id")
-        inp = step.get("input", {}) or {}
+def run_marketplace_workflow(
+    tenant_id: str,
+    user_id: str,
+    device_id: str,
+    workflow_id: str,
+    version: str,
+    steps: List[Dict[str, Any]],
+    skill_call_fn: Callable[[str, Dict[str, Any]], Dict[str, Any]],
+    initial_vars: Dict[str, Any] | None = None,
+    output_keys_fn: Optional[Callable[[str], Optional[Iterable[str]]]] = None,
+    run_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Runs each step as soon as its dependencies (plan_steps) are done, at most
+    WORKFLOW_MAX_PARALLEL at a time: the first ready step (and a chain with a
+    single ready step) runs on the caller's thread, the others on the shared
+    step pool. Results and vars are as if the steps ran in order. After a
+    failure at step f no new step after f is started; steps already running
+    when the failure is reported still finish (and are published to the run
+    registry), but results / vars only cover steps 0..f.
 
-        # Apply {var} templates
-        inp = _template_apply(inp, vars)
+    Progress is published to the run registry (api/workflow_runs.py) under
+    run_id (generated if not given), which the final result also carries.
+    """
+    start = time.time()
+    initial: Dict[str, Any] = dict(initial_vars or {})
+    compiled = compile_steps(steps)
+    deps = plan_steps(steps, output_keys_fn, compiled)
 
-        step_out: Dict[str, Any]
-        if step_type == "rag_query":
-            query = inp.get("query", "")
-            top_k = int(inp.get("top_k", 3))
-            rag = _rag_query_internal(tenant_id=tenant_id, query=str(query), top_k=top_k)
+    status = initial_status(tenant_id, user_id, device_id, workflow_id, version, steps)
+    run_id = RUNS.start(status, run_id)
+    try:
+        return _execute(run_id, status, start, initial, compiled, deps, steps, tenant_id, skill_call_fn)
+    except Exception as e:
+        RUNS.fail(run_id, f"{type(e).__name__}: {e}")
+        raise
 
-            matches = rag.get("matches", []) or []
-            context = "\n".join([m.get("text", "") for m in matches if isinstance(m, dict)]).strip()
+def _execute(run_id: str, status: Dict[str, Any], start: float, initial: Dict[str, Any], compiled: CompiledSteps,
+             deps: List[List[int]], steps: List[Dict[str, Any]], tenant_id: str,
+             skill_call_fn: Callable[[str, Dict[str, Any]], Dict[str, Any]]) -> Dict[str, Any]:
+    finished: Dict[int, Tuple[Dict[str, Any], Dict[str, Any]]] = {}   # index -> (result, vars it set)
 
-            vars["rag_matches"] = matches
-            vars["rag_context"] = context
-            step_out = {"ok": rag.get("ok", False), "output": {"matches": matches, "context": context}, "error": rag.get("error")}
-        else:
-            if not skill_id:
-                step_out = {"ok": False, "output": {}, "error": "step must include type=rag_query OR skill_id"}
-            else:
-                step_out = skill_call_fn(skill_id, inp)
-                if step_out.get("ok"):
-                    out_obj = step_out.get("output") or {}
-                    if isinstance(out_obj, dict):
-                        for k, v in out_obj.items():
-                            vars[k] = v
-
-        latency_ms = int((time.time() - step_start) * 1000)
-        results.append({
+    def _input(idx: int) -> Dict[str, Any]:
+        vars: Dict[str, Any] = dict(initial)
+        for d in deps[idx]:
+            vars.update(finished[d][1])
+        # Fill the {var} slots of the compiled input
+        return render(compiled.inputs[idx], _fill(vars))
+
+    failed_at: Optional[int] = None
+
+    def _record(idx: int, step_out: Dict[str, Any], sets: Dict[str, Any], latency_ms: int) -> None:
+        nonlocal failed_at
+        step = steps[idx]
+        step_type = step.get("type")
+        skill_id = step.get("skill_id")
+        ok = bool(step_out.get("ok", False))
+        result = {
             "index": idx,
             "type": step_type or "skill",
             "skill_id": skill_id,
-            "ok": bool(step_out.get("ok", False)),
+            "ok": ok,
             "latency_ms": latency_ms,
             "output": step_out.get("output", {}),
             "error": step_out.get("error"),
-        })
+        }
+        finished[idx] = (result, sets)
 
-        status["steps_done"] = idx + 1
-        status["last_step"] = {"index": idx, "type": step_type or "skill", "skill_id": skill_id, "ok": bool(step_out.get("ok", False))}
-        status["ok"] = status["ok"] and bool(step_out.get("ok", False))
-        _write_status(status)
+        status["steps_done"] += 1
+        status["last_step"] = {"index": idx, "type": step_type or "skill", "skill_id": skill_id, "ok": ok}
+        status["ok"] = status["ok"] and ok
+        RUNS.step(run_id, result, status)
 
         # Stop early on failure
-        if not step_out.get("ok", False):
+        if not ok and (failed_at is None or idx < failed_at):
+            failed_at = idx
+
+    # the caller's thread is one of the run's WORKFLOW_MAX_PARALLEL slots
+    pool_slots = max(0, WORKFLOW_MAX_PARALLEL - 1)
+    waiting = list(range(len(steps)))
+    running: Dict[Any, int] = {}   # pool future -> index
+    while True:
+        inline: Optional[int] = None
+        for idx in list(waiting):
+            if failed_at is not None and idx > failed_at:
+                break
+            if not all(d in finished for d in deps[idx]):
+                continue
+            if inline is None:
+                inline = idx
+            elif len(running) < pool_slots:
+                running[_pool().submit(_run_step, tenant_id, steps[idx], _input(idx), skill_call_fn)] = idx
+            else:
+                break
+            waiting.remove(idx)
+
+        if inline is not None:
+            _record(inline, *_run_step(tenant_id, steps[inline], _input(inline), skill_call_fn))
+            done = [fut for fut in running if fut.done()]
+        elif running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+        else:
             break
+        for fut in sorted(done, key=running.get):
+            _record(running.pop(fut), *fut.result())
+
+    last = failed_at if failed_at is not None else len(steps) - 1
+    results: List[Dict[str, Any]] = []
+    vars: Dict[str, Any] = dict(initial)
+    for idx in range(last + 1):
+        result, sets = finished[idx]
+        results.append(result)
+        vars.update(sets)
 
     total_ms = int((time.time() - start) * 1000)
     final = {
-        "ok": bool(status["ok"]),
-        "workflow_id": workflow_id,
-        "version": version,
+        "ok": all(r["ok"] for r in results),
+        "run_id": run_id,
+        "workflow_id": status["workflow_id"],
+        "version": status["version"],
         "tenant_id": tenant_id,
-        "user_id": user_id,
-        "device_id": device_id,
+        "user_id": status["user_id"],
+        "device_id": status["device_id"],
         "results": results,
         "vars": {k: vars[k] for k in list(vars.keys())[:200]},
         "latency_ms": total_ms,
     }
-    _write_status({**status, "finished": True, "latency_ms": total_ms})
+    RUNS.finish(run_id, final, {"finished": True, "latency_ms": total_ms})
     return final
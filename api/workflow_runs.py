@@ -0,0 +1,211 @@
+"""
+In-memory registry of workflow runs (api/workflow_runner.py), keyed by run_id.
+
+Each run keeps its status (the fields the runner used to write to
+reports/workflow_latest.json), the step results in the order they finished,
+and the final result. Readers:
+
+- get():    status + results so far, for GET /workflows/runs/{run_id}
+- follow(): async; yields step results as they finish, then the final result,
+            for the NDJSON stream GET /workflows/runs/{run_id}/stream. It waits on
+            an asyncio.Event the runner threads set via call_soon_threadsafe, so an
+            open stream holds no threadpool thread.
+
+Background runs (wait=false) are registered as "queued" when submitted and
+switch to "running" when the runner picks them up. Finished runs are dropped after WORKFLOW_RUN_TTL_SEC or when more than
+WORKFLOW_RUNS_MAX are kept; queued and running ones are never dropped. The registry is
+per worker: a run is visible on the worker that executes it.
+
+With WORKFLOW_STATUS_PERSIST_SEC > 0 a background thread writes the most
+recently updated run's status to reports/workflow_latest.json at that
+interval (only when it changed), off the request path.
+"""
+from __future__ import annotations
+import asyncio
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from api.config import WORKFLOW_RUNS_MAX, WORKFLOW_RUN_TTL_SEC, WORKFLOW_STATUS_PERSIST_SEC
+from registry.snapshot import write_json
+
+log = logging.getLogger(__name__)
+
+STATUS_FILE = Path("reports/workflow_latest.json")
+
+
+class Run:
+    __slots__ = ("run_id", "status", "results", "final", "finished_at", "lock", "waiters")
+
+    def __init__(self, run_id: str, status: Dict[str, Any], state: str = "running"):
+        self.run_id = run_id
+        self.status = {**status, "run_id": run_id, "state": state}
+        self.results: List[Dict[str, Any]] = []
+        self.final: Optional[Dict[str, Any]] = None
+        self.finished_at: Optional[float] = None
+        self.lock = threading.Lock()
+        self.waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = []   # follow() readers
+
+    def wake(self) -> None:
+        """Signal the follow() readers; call with self.lock held."""
+        for loop, event in self.waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:    # reader's loop already closed
+                pass
+
+
+class RunRegistry:
+    def __init__(self, max_runs: int = WORKFLOW_RUNS_MAX, ttl_sec: float = WORKFLOW_RUN_TTL_SEC,
+                 persist_sec: float = WORKFLOW_STATUS_PERSIST_SEC, status_file: Path = STATUS_FILE):
+        self.max_runs = max_runs
+        self.ttl_sec = ttl_sec
+        self.persist_sec = persist_sec
+        self.status_file = status_file
+        self._runs: "OrderedDict[str, Run]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._latest: Optional[Dict[str, Any]] = None      # last status update, for persistence
+        self._written: Optional[Dict[str, Any]] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.started = 0
+
+    # ---------- writer side (the runner) ----------
+    def start(self, status: Dict[str, Any], run_id: Optional[str] = None, state: str = "running") -> str:
+        """Register a run. A run_id registered earlier as "queued" (wait=false submissions)
+        is taken over in place, so readers that already found it keep following it."""
+        with self._lock:
+            queued = self._runs.get(run_id) if run_id else None
+            if queued is not None and queued.finished_at is None:
+                with queued.lock:
+                    queued.status.update({**status, "run_id": queued.run_id, "state": state})
+                    self._latest = dict(queued.status)
+                    queued.wake()
+                return queued.run_id
+            run = Run(run_id or uuid.uuid4().hex, status, state)
+            self._evict(time.time())
+            self._runs[run.run_id] = run
+            self._latest = dict(run.status)
+            self.started += 1
+        return run.run_id
+
+    def step(self, run_id: str, result: Dict[str, Any], status: Dict[str, Any]) -> None:
+        run = self._runs.get(run_id)
+        if run is None:
+            return
+        with run.lock:
+            run.results.append(result)
+            run.status.update(status)
+            self._latest = dict(run.status)
+            run.wake()
+
+    def finish(self, run_id: str, final: Dict[str, Any], status: Dict[str, Any]) -> None:
+        run = self._runs.get(run_id)
+        if run is None:
+            return
+        with run.lock:
+            run.status.update(status)
+            run.status["state"] = "finished"
+            run.final = final
+            run.finished_at = time.time()
+            self._latest = dict(run.status)
+            run.wake()
+
+    def fail(self, run_id: str, error: str) -> None:
+        """The runner raised: finish the run with the error so followers stop waiting."""
+        self.finish(run_id, {"ok": False, "run_id": run_id, "error": error}, {"ok": False, "error": error})
+
+    def _evict(self, now: float) -> None:
+        for rid, run in list(self._runs.items()):
+            if run.finished_at is not None and now - run.finished_at > self.ttl_sec:
+                del self._runs[rid]
+        if len(self._runs) >= self.max_runs:
+            for rid in [rid for rid, run in self._runs.items() if run.finished_at is not None]:
+                del self._runs[rid]
+                if len(self._runs) < self.max_runs:
+                    break
+
+    # ---------- readers ----------
+    def get(self, run_id: str) -> Optional[Dict[str, Any]]:
+        run = self._runs.get(run_id)
+        if run is None:
+            return None
+        with run.lock:
+            out = {**run.status, "results": sorted(run.results, key=lambda r: r["index"])}
+            if run.final is not None:
+                out["final"] = run.final
+            return out
+
+    async def follow(self, run_id: str, heartbeat_sec: float = 15.0) -> AsyncIterator[Dict[str, Any]]:
+        """Step results in finishing order ({"event": "step", ...}), then {"event": "finished", ...}.
+        Yields {"event": "heartbeat"} when nothing happened for heartbeat_sec."""
+        run = self._runs.get(run_id)
+        if run is None:
+            return
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with run.lock:
+            run.waiters.append(waiter)
+        try:
+            sent = 0
+            while True:
+                with run.lock:
+                    waiter[1].clear()
+                    new = run.results[sent:]
+                    final = run.final
+                sent += len(new)
+                for r in new:
+                    yield {"event": "step", "run_id": run_id, **r}
+                if final is not None and sent == len(run.results):
+                    yield {"event": "finished", **final}
+                    return
+                if new:
+                    continue
+                try:
+                    await asyncio.wait_for(waiter[1].wait(), heartbeat_sec)
+                except asyncio.TimeoutError:
+                    yield {"event": "heartbeat", "run_id": run_id, "steps_done": run.status.get("steps_done", 0)}
+        finally:
+            with run.lock:
+                run.waiters.remove(waiter)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            queued = sum(1 for r in self._runs.values() if r.status.get("state") == "queued")
+            running = sum(1 for r in self._runs.values() if r.finished_at is None) - queued
+            return {"runs": len(self._runs), "queued": queued, "running": running, "started": self.started}
+
+    # ---------- optional persistence ----------
+    def persist(self) -> None:
+        latest = self._latest
+        if latest is None or latest == self._written:
+            return
+        write_json(self.status_file, latest, indent=None)
+        self._written = latest
+
+    def start_persistence(self) -> None:
+        if self.persist_sec <= 0 or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="workflow-status", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.persist_sec):
+            try:
+                self.persist()
+            except Exception:
+                log.exception("workflow status persistence failed")
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5.0)
+            self._thread = None
+            self.persist()
+
+
+RUNS = RunRegistry()
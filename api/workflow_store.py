@@ -1,9 +1,9 @@
 from __future__ import annotations
 from pathlib import Path
 from typing import Dict, Any, List
-import json
 import uuid
 import time
+from registry.snapshot import read_json, write_json
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 REG = BASE_DIR / "registry"
@@ -18,26 +18,15 @@ ADMIN_FILE = REG / "admin_policy.json"
 def now_iso() -> str:
     return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
 
-def _read(path: Path, default):
-    if not path.exists():
-        path.parent.mkdir(parents=True, exist_ok=True)
-        path.write_text(json.dumps(default, indent=2), encoding="utf-8")
-        return default
-    return json.loads(path.read_text(encoding="utf-8"))
-
-def _write(path: Path, data):
-    path.parent.mkdir(parents=True, exist_ok=True)
-    path.write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding="utf-8")
-
 def admin_token() -> str:
-    pol = _read(ADMIN_FILE, {"admin_token":"CHANGE_ME_ADMIN_TOKEN"})
+    pol = read_json(ADMIN_FILE, {"admin_token":"CHANGE_ME_ADMIN_TOKEN"})
     return pol.get("admin_token","CHANGE_ME_ADMIN_TOKEN")
 
 # -------------------------
 # Workflows (draft storage)
 # -------------------------
 def list_workflows() -> List[Dict[str, Any]]:
-    return _read(WF_FILE, {"workflows": []}).get("workflows", [])
+    return read_json(WF_FILE, {"workflows": []}).get("workflows", [])
 
 def get_workflow(workflow_id: str) -> Dict[str, Any] | None:
     for w in list_workflows():
@@ -69,22 +58,22 @@ def create_workflow(payload: Dict[str, Any]) -> Dict[str, Any]:
         "updated_ts": now_iso()
     }
 
-    data = _read(WF_FILE, {"workflows": []})
+    data = read_json(WF_FILE, {"workflows": []}, mutable=True)
     data["workflows"].append(w)
-    _write(WF_FILE, data)
+    write_json(WF_FILE, data)
     return w
 
 def submit_workflow(workflow_id: str) -> Dict[str, Any]:
-    data = _read(WF_FILE, {"workflows": []})
+    data = read_json(WF_FILE, {"workflows": []}, mutable=True)
     for w in data["workflows"]:
         if w["workflow_id"] == workflow_id:
             if w["status"] not in ("DRAFT","REJECTED"):
                 raise ValueError(f"Cannot submit from status {w['status']}")
             w["status"] = "SUBMITTED"
             w["updated_ts"] = now_iso()
-            _write(WF_FILE, data)
+            write_json(WF_FILE, data)
 
-            subs = _read(SUB_FILE, [])
+            subs = read_json(SUB_FILE, [], mutable=True)
             sub = {
                 "submission_id": str(uuid.uuid4()),
                 "workflow_id": workflow_id,
@@ -93,7 +82,7 @@ def submit_workflow(workflow_id: str) -> Dict[str, Any]:
                 "reason": None
             }
             subs.append(sub)
-            _write(SUB_FILE, subs)
+            write_json(SUB_FILE, subs)
             return {"workflow": w, "submission": sub}
     raise ValueError("workflow not found")
 
@@ -101,14 +90,14 @@ def submit_workflow(workflow_id: str) -> Dict[str, Any]:
 # Approval + Locks
 # -------------------------
 def approvals() -> Dict[str, Any]:
-    return _read(APP_FILE, {"approved": []})
+    return read_json(APP_FILE, {"approved": []})
 
 def locks() -> Dict[str, Any]:
-    return _read(LOCK_FILE, {"locks": {}})
+    return read_json(LOCK_FILE, {"locks": {}})
 
 def approve_workflow(submission_id: str) -> Dict[str, Any]:
-    subs = _read(SUB_FILE, [])
-    wf_data = _read(WF_FILE, {"workflows": []})
+    subs = read_json(SUB_FILE, [], mutable=True)
+    wf_data = read_json(WF_FILE, {"workflows": []}, mutable=True)
 
     sub = next((s for s in subs if s["submission_id"] == submission_id), None)
     if not sub:
@@ -124,25 +113,25 @@ def approve_workflow(submission_id: str) -> Dict[str, Any]:
     wf["status"] = "APPROVED"
     wf["updated_ts"] = now_iso()
 
-    app = approvals()
+    app = read_json(APP_FILE, {"approved": []}, mutable=True)
     app["approved"].append({
         "workflow_id": wf["workflow_id"],
         "version": wf["version"],
         "approved_ts": now_iso()
     })
-    _write(APP_FILE, app)
+    write_json(APP_FILE, app)
 
-    lock = locks()
+    lock = read_json(LOCK_FILE, {"locks": {}}, mutable=True)
     lock["locks"][wf["workflow_id"]] = {"locked_version": wf["version"], "locked_ts": now_iso()}
-    _write(LOCK_FILE, lock)
+    write_json(LOCK_FILE, lock)
 
-    _write(SUB_FILE, subs)
-    _write(WF_FILE, wf_data)
+    write_json(SUB_FILE, subs)
+    write_json(WF_FILE, wf_data)
     return {"workflow": wf, "submission": sub, "lock": lock["locks"][wf["workflow_id"]]}
 
 def reject_workflow(submission_id: str, reason: str) -> Dict[str, Any]:
-    subs = _read(SUB_FILE, [])
-    wf_data = _read(WF_FILE, {"workflows": []})
+    subs = read_json(SUB_FILE, [], mutable=True)
+    wf_data = read_json(WF_FILE, {"workflows": []}, mutable=True)
 
     sub = next((s for s in subs if s["submission_id"] == submission_id), None)
     if not sub:
@@ -156,8 +145,8 @@ def reject_workflow(submission_id: str, reason: str) -> Dict[str, Any]:
     sub["status"] = "REJECTED"
     sub["reason"] = reason
 
-    _write(SUB_FILE, subs)
-    _write(WF_FILE, wf_data)
+    write_json(SUB_FILE, subs)
+    write_json(WF_FILE, wf_data)
     return {"workflow": wf, "submission": sub}
 
 def is_workflow_approved(workflow_id: str, version: str) -> bool:
@@ -173,7 +162,7 @@ def locked_workflow_version(workflow_id: str) -> str | None:
 # Tenant install workflow
 # -------------------------
 def tenant_install_workflow(tenant_id: str, workflow_id: str, version: str):
-    data = _read(TENANT_WF_FILE, {"tenants": {}})
+    data = read_json(TENANT_WF_FILE, {"tenants": {}}, mutable=True)
     t = data["tenants"].setdefault(tenant_id, {"installed": {}, "history": []})
     prev = t["installed"].get(workflow_id)
 
@@ -185,9 +174,9 @@ def tenant_install_workflow(tenant_id: str, workflow_id: str, version: str):
         "from_version": prev,
         "to_version": version
     })
-    _write(TENANT_WF_FILE, data)
+    write_json(TENANT_WF_FILE, data)
     return t
 
 def tenant_workflow_version(tenant_id: str, workflow_id: str) -> str | None:
-    data = _read(TENANT_WF_FILE, {"tenants": {}})
+    data = read_json(TENANT_WF_FILE, {"tenants": {}})
     return data.get("tenants", {}).get(tenant_id, {}).get("installed", {}).get(workflow_id)
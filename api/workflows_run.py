@@ -1,15 +1,24 @@
+import json
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from typing import Dict, Any
 
 from api.deps import require_access
 from api.device_deps import require_device_token
-from api.workflow_runner import run_marketplace_workflow
+from api.workflow_runner import initial_status, run_marketplace_workflow
+from api.workflow_runs import RUNS
+from api.config import WORKFLOW_BACKGROUND_RUNS
 
 from skills.summarization.skill import SummarizeSkill
 from skills.translation.skill import TranslateSkill
 
 router = APIRouter(prefix="/workflows", tags=["workflows"])
 
+# runs started with ?wait=false (this thread runs the run's inline steps, the rest use the runner's step pool)
+_BACKGROUND = ThreadPoolExecutor(max_workers=WORKFLOW_BACKGROUND_RUNS, thread_name_prefix="workflow-run")
+
 def _skill_registry():
     return {
         "summarize": SummarizeSkill(),
@@ -32,13 +41,29 @@ def _call_skill(skill_id: str, inp: Dict[str, Any]) -> Dict[str, Any]:
         "latency_ms": int(getattr(res, "latency_ms", 0) or 0),
     }
 
+def _output_keys(skill_id: str):
+    # declared output_schema keys: lets steps that don't read them run in parallel (workflow_runner.plan_steps).
+    # Only for closed schemas: every returned key becomes a var, so with additionalProperties
+    # (the JSON Schema default) the outputs are unknown.
+    s = _skill_registry().get(skill_id)
+    schema = getattr(s, "output_schema", None) or {}
+    props = schema.get("properties")
+    if schema.get("additionalProperties", True) is not False or not isinstance(props, dict):
+        return None
+    return list(props)
+
 @router.post("/run")
 def run_workflow(
     request: Request,
     payload: Dict[str, Any],
+    wait: bool = True,
     claims: dict = Depends(require_access),
     device: dict = Depends(require_device_token),
 ):
+    # wait=false: return the run_id at once; follow /workflows/runs/{run_id}[/stream]
+    # A step may declare `outputs: ["var", ...]`, the vars it sets: steps reading none of them
+    # can run alongside it (workflow_runner.plan_steps). Without it, a skill step's outputs are
+    # its skill's output_schema keys; a step setting an undeclared var is a failed step.
     if claims.get("role") != "tenant":
         raise HTTPException(status_code=403, detail="tenant only")
 
@@ -49,8 +74,14 @@ def run_workflow(
     steps = payload.get("steps", [])
     if not isinstance(steps, list) or not steps:
         raise HTTPException(status_code=400, detail="steps[] required")
+    for i, st in enumerate(steps):
+        if not isinstance(st, dict):
+            raise HTTPException(status_code=400, detail=f"steps[{i}] must be an object")
+        outs = st.get("outputs")
+        if outs is not None and not (isinstance(outs, list) and all(isinstance(o, str) for o in outs)):
+            raise HTTPException(status_code=400, detail=f"steps[{i}].outputs must be a list of var names")
 
-    out = run_marketplace_workflow(
+    kwargs = dict(
         tenant_id=tenant_id,
         user_id=user_id,
         device_id=device_id,
@@ -59,5 +90,39 @@ def run_workflow(
         steps=steps,
         skill_call_fn=_call_skill,
         initial_vars=(payload.get("input", {}) or {}),
+        output_keys_fn=_output_keys,
     )
-    return out
+    if wait:
+        return run_marketplace_workflow(**kwargs)
+
+    # registered before submitting so the status / stream URLs work while the run waits for a slot
+    run_id = RUNS.start(initial_status(tenant_id, user_id, device_id, kwargs["workflow_id"], kwargs["version"], steps),
+                        uuid.uuid4().hex, state="queued")
+    try:
+        _BACKGROUND.submit(run_marketplace_workflow, run_id=run_id, **kwargs)
+    except RuntimeError as e:
+        RUNS.fail(run_id, f"{type(e).__name__}: {e}")
+        raise HTTPException(status_code=503, detail="workflow runner is shutting down")
+    return {"ok": True, "run_id": run_id, "status": f"/workflows/runs/{run_id}",
+            "stream": f"/workflows/runs/{run_id}/stream"}
+
+def _own_run(run_id: str, claims: dict) -> Dict[str, Any]:
+    run = RUNS.get(run_id)
+    if run is None or run.get("tenant_id") != claims.get("tenant_id"):
+        raise HTTPException(status_code=404, detail="run not found (finished runs expire; runs live on the worker that ran them)")
+    return run
+
+@router.get("/runs/{run_id}")
+def run_status(run_id: str, claims: dict = Depends(require_access)):
+    return _own_run(run_id, claims)
+
+@router.get("/runs/{run_id}/stream")
+async def run_stream(run_id: str, claims: dict = Depends(require_access)):
+    # NDJSON: one {"event": "step", ...} line per step as it finishes, then {"event": "finished", ...}
+    # async so waiting streams don't hold threadpool threads (RunRegistry.follow)
+    _own_run(run_id, claims)
+
+    async def lines():
+        async for ev in RUNS.follow(run_id):
+            yield json.dumps(ev) + "\n"
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
@@ -0,0 +1,389 @@
+"""
+Minute / hour / day rollups of usage_events and audit_logs for /admin/analytics.
+
+Each pass of roll() takes the source rows in [watermark, now - ANALYTICS_ROLLUP_LAG_SEC),
+runs one GROUP BY (minute bucket, dimensions) over them, folds the minute groups
+into hour and day buckets and adds everything into usage_buckets / audit_buckets
+with an UPSERT. The watermark moves in the same transaction, with a
+compare-and-set on its old value, so each source row is counted exactly once even
+when several workers run the job; a worker that loses the race rolls back.
+
+    source  dimensions                   measures
+    usage   tenant_id, device_id, action  events, units, credits, errors
+    audit   tenant_id, device_id, route   requests, errors, credits
+
+Queries read only the bucket tables: a time range is snapped to whole buckets
+of one grain (picked from the range length unless given) and answered from
+the primary key / (grain, tenant_id, bucket) index.
+
+Audit partitions (db/audit_partitions.py) are only closed, and their rows
+deleted from audit_logs, once the audit watermark is past the partition's end,
+so every row reaches audit_buckets first. Rows written after the watermark
+passed their minute (late batched writes) are only counted in audit_rollups.
+Minute buckets are kept ANALYTICS_RETENTION_DAYS["minute"] days, etc.
+"""
+from __future__ import annotations
+import calendar
+import logging
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import case, delete, func, update
+from sqlalchemy.exc import IntegrityError
+
+from api.config import (
+    ANALYTICS_ROLLUP_SEC, ANALYTICS_ROLLUP_LAG_SEC, ANALYTICS_ROLLUP_MAX_SPAN_SEC, ANALYTICS_RETENTION_DAYS,
+    ANALYTICS_MAX_POINTS,
+)
+from db.database import SessionLocal, dialect_insert
+from db.models import AuditLog, AuditBucket, AuditRollup, RollupWatermark, UsageBucket
+from db.wallet_models import UsageEvent
+
+log = logging.getLogger(__name__)
+
+GRAINS = {"minute": 60, "hour": 3600, "day": 86400}
+
+
+def iso_to_epoch(ts: str) -> int:
+    return calendar.timegm(time.strptime(ts[:19], "%Y-%m-%dT%H:%M:%S"))
+
+
+def epoch_to_iso(sec: int) -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(int(sec)))
+
+
+class Source:
+    def __init__(self, name: str, model, bucket_model, dims: Tuple[str, ...], measures: Tuple[str, ...]):
+        self.name = name
+        self.model = model
+        self.bucket_model = bucket_model
+        self.dims = dims
+        self.measures = measures
+
+    # usage_events.ts is unix seconds, audit_logs.ts an ISO string
+    def _minute(self):
+        ts = self.model.ts
+        return ts - ts % 60 if self.name == "usage" else func.substr(ts, 1, 16)
+
+    def _bound(self, sec: int):
+        return sec if self.name == "usage" else epoch_to_iso(sec)
+
+    def _to_epoch(self, minute) -> int:
+        return int(minute) if self.name == "usage" else iso_to_epoch(minute + ":00")
+
+    def oldest(self, db) -> Optional[int]:
+        ts = db.query(func.min(self.model.ts)).scalar()
+        if ts is None:
+            return None
+        return int(ts) if self.name == "usage" else iso_to_epoch(ts)
+
+    def minute_groups(self, db, lo: int, hi: int) -> List[Tuple[Any, ...]]:
+        m = self.model
+        error = func.sum(case((m.ok.is_(False), 1), else_=0))
+        if self.name == "usage":
+            agg = [func.count(), func.sum(func.coalesce(m.units, 0)), func.sum(func.coalesce(m.credits, 0)), error]
+        else:
+            agg = [func.count(), error, func.sum(func.coalesce(m.credits, 0))]
+        minute = self._minute()
+        dims = [func.coalesce(getattr(m, d), "") for d in self.dims]
+        q = (db.query(minute, *dims, *agg)
+             .filter(m.ts >= self._bound(lo), m.ts < self._bound(hi))
+             .group_by(minute, *dims))
+        return [(self._to_epoch(r[0]), *r[1:]) for r in q]
+
+
+SOURCES = {
+    "usage": Source("usage", UsageEvent, UsageBucket, ("tenant_id", "device_id", "action"),
+                    ("events", "units", "credits", "errors")),
+    "audit": Source("audit", AuditLog, AuditBucket, ("tenant_id", "device_id", "route"),
+                    ("requests", "errors", "credits")),
+}
+COUNT_MEASURE = {"usage": "events", "audit": "requests"}
+
+
+def _source(name: str) -> Source:
+    src = SOURCES.get(name)
+    if src is None:
+        raise ValueError(f"unknown source {name!r}; expected one of {sorted(SOURCES)}")
+    return src
+
+
+class AnalyticsRollups:
+    def __init__(self, interval_sec: float = ANALYTICS_ROLLUP_SEC, lag_sec: int = ANALYTICS_ROLLUP_LAG_SEC,
+                 max_span_sec: int = ANALYTICS_ROLLUP_MAX_SPAN_SEC):
+        self.interval_sec = interval_sec
+        self.lag_sec = lag_sec
+        self.max_span_sec = max_span_sec
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.passes = 0
+        self.source_rows = 0
+        self.upserts = 0
+
+    # ---------- maintenance ----------
+    def watermark(self, source: str) -> Optional[int]:
+        db = SessionLocal()
+        try:
+            row = db.get(RollupWatermark, source)
+            return row.watermark if row else None
+        finally:
+            db.close()
+
+    def _init_watermark(self, db, src: Source) -> Optional[int]:
+        oldest = src.oldest(db)
+        if oldest is None:
+            return None
+        start = oldest - oldest % 60
+        db.execute(dialect_insert(RollupWatermark).values(
+            source=src.name, watermark=start, updated_ts=int(time.time())).on_conflict_do_nothing())
+        db.commit()
+        return db.get(RollupWatermark, src.name).watermark
+
+    def _roll_once(self, src: Source, now: int) -> Optional[int]:
+        """Roll up one span of `src`; returns the new watermark, None if caught up or beaten by another worker."""
+        db = SessionLocal()
+        try:
+            row = db.get(RollupWatermark, src.name)
+            lo = row.watermark if row else self._init_watermark(db, src)
+            if lo is None:
+                return None
+            limit = now - self.lag_sec
+            hi = min(limit - limit % 60, lo + self.max_span_sec)
+            if hi <= lo:
+                return None
+            won = db.execute(update(RollupWatermark)
+                             .where(RollupWatermark.source == src.name, RollupWatermark.watermark == lo)
+                             .values(watermark=hi, updated_ts=int(time.time()))).rowcount
+            if not won:
+                db.rollback()
+                return None
+
+            groups: Dict[Tuple[Any, ...], List[int]] = defaultdict(lambda: [0] * len(src.measures))
+            minute_rows = src.minute_groups(db, lo, hi)
+            for minute, *rest in minute_rows:
+                dims, vals = tuple(rest[:len(src.dims)]), rest[len(src.dims):]
+                for grain, sec in GRAINS.items():
+                    acc = groups[(grain, minute - minute % sec, *dims)]
+                    for i, v in enumerate(vals):
+                        acc[i] += int(v or 0)
+            if groups:
+                table = src.bucket_model.__table__
+                stmt = dialect_insert(table)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[c.name for c in table.primary_key.columns],
+                    set_={m: table.c[m] + stmt.excluded[m] for m in src.measures},
+                )
+                keys = ("grain", "bucket", *src.dims)
+                db.execute(stmt, [{**dict(zip(keys, k)), **dict(zip(src.measures, v))} for k, v in groups.items()])
+            db.commit()
+            self.source_rows += sum(int(r[len(src.dims) + 1] or 0) for r in minute_rows)
+            self.upserts += len(groups)
+            return hi
+        except IntegrityError:
+            db.rollback()       # watermark row inserted concurrently; next pass retries
+            return None
+        finally:
+            db.close()
+
+    def roll(self, now: Optional[int] = None) -> Dict[str, Optional[int]]:
+        """Bring every source up to now - lag. Returns the watermarks."""
+        now = int(now if now is not None else time.time())
+        out = {}
+        for src in SOURCES.values():
+            while self._roll_once(src, now) is not None:
+                pass
+            out[src.name] = self.watermark(src.name)
+        self.passes += 1
+        return out
+
+    def apply_retention(self, now: Optional[int] = None) -> Dict[str, int]:
+        now = int(now if now is not None else time.time())
+        removed: Dict[str, int] = defaultdict(int)
+        db = SessionLocal()
+        try:
+            for grain, days in ANALYTICS_RETENTION_DAYS.items():
+                if days <= 0:
+                    continue
+                for src in SOURCES.values():
+                    m = src.bucket_model
+                    removed[grain] += db.execute(delete(m).where(m.grain == grain,
+                                                                 m.bucket < now - days * 86400)).rowcount
+            db.commit()
+        finally:
+            db.close()
+        return dict(removed)
+
+    @staticmethod
+    def _audit_rebuild_from(db) -> Optional[int]:
+        """First second whose audit rows are all still in audit_logs (None: no rows, nothing to redo)."""
+        from db.audit_partitions import period_bounds   # imports this module
+        starts = []
+        last_closed = db.query(func.max(AuditRollup.period)).scalar()
+        if last_closed:
+            # partitions close oldest first: everything after the last closed one is still in audit_logs
+            starts.append(iso_to_epoch(period_bounds(last_closed)[1]))
+        oldest = SOURCES["audit"].oldest(db)
+        if oldest is not None:
+            starts.append(oldest - oldest % 86400)
+        return max(starts) if starts else None
+
+    def rebuild(self) -> Dict[str, Optional[int]]:
+        """Drop buckets and watermarks and roll up again from the source tables.
+
+        usage_events keeps every row, so its buckets are recomputed from the oldest one.
+        audit_logs only holds partitions that are not closed yet: audit buckets before
+        that point are kept and the audit watermark restarts there.
+        """
+        db = SessionLocal()
+        try:
+            db.execute(delete(UsageBucket))
+            db.execute(delete(RollupWatermark).where(RollupWatermark.source == "usage"))
+            start = self._audit_rebuild_from(db)
+            if start is not None:
+                db.execute(delete(AuditBucket).where(AuditBucket.bucket >= start))
+                stmt = dialect_insert(RollupWatermark).values(source="audit", watermark=start,
+                                                              updated_ts=int(time.time()))
+                db.execute(stmt.on_conflict_do_update(index_elements=[RollupWatermark.source],
+                                                      set_={"watermark": start, "updated_ts": stmt.excluded.updated_ts}))
+            db.commit()
+        finally:
+            db.close()
+        return self.roll()
+
+    # ---------- background ----------
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="analytics-rollups", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_sec):
+            try:
+                self.roll()
+                self.apply_retention()
+            except Exception:
+                log.exception("analytics rollup pass failed")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    # ---------- queries ----------
+    @staticmethod
+    def _grain(since: int, until: int, grain: Optional[str]) -> str:
+        if grain is not None:
+            if grain not in GRAINS:
+                raise ValueError(f"unknown grain {grain!r}; expected one of {list(GRAINS)}")
+            return grain
+        span, age_days = until - since, (time.time() - since) / 86400
+        for g, max_span in (("minute", 6 * 3600), ("hour", 31 * 86400)):
+            keep = ANALYTICS_RETENTION_DAYS.get(g, 0)
+            if span <= max_span and (keep <= 0 or age_days <= keep):
+                return g
+        return "day"
+
+    def _window(self, since: Optional[str], until: Optional[str], grain: Optional[str]) -> Tuple[str, int, int]:
+        hi = iso_to_epoch(until) if until else int(time.time())
+        lo = iso_to_epoch(since) if since else hi - 86400
+        if lo >= hi:
+            raise ValueError("since must be before until")
+        g = self._grain(lo, hi, grain)
+        sec = GRAINS[g]
+        return g, lo - lo % sec, hi + (-hi) % sec
+
+    def _filtered(self, src: Source, grain: str, lo: int, hi: int, filters: Dict[str, Optional[str]]):
+        m = src.bucket_model
+        q_filters = [m.grain == grain, m.bucket >= lo, m.bucket < hi]
+        for k, v in filters.items():
+            if v is None:
+                continue
+            if k not in src.dims:
+                raise ValueError(f"{src.name} rollups have no dimension {k!r}; expected one of {list(src.dims)}")
+            q_filters.append(getattr(m, k) == v)
+        return q_filters
+
+    @staticmethod
+    def _sums(src: Source) -> Dict[str, Any]:
+        return {name: func.sum(getattr(src.bucket_model, name)).label(name) for name in src.measures}
+
+    @staticmethod
+    def _row(src: Source, vals: Dict[str, Any]) -> Dict[str, Any]:
+        out = {k: int(vals[k] or 0) for k in src.measures}
+        n = out[COUNT_MEASURE[src.name]]
+        out["error_rate"] = round(out["errors"] / n, 6) if n else 0.0
+        return out
+
+    def timeseries(self, source: str, since: Optional[str] = None, until: Optional[str] = None,
+                   grain: Optional[str] = None, **filters: Optional[str]) -> Dict[str, Any]:
+        """One point per bucket in [since, until) (empty buckets included), summed over the filtered dimensions."""
+        src = _source(source)
+        g, lo, hi = self._window(since, until, grain)
+        sec = GRAINS[g]
+        if (hi - lo) // sec > ANALYTICS_MAX_POINTS:
+            raise ValueError(f"{(hi - lo) // sec} {g} buckets requested; max {ANALYTICS_MAX_POINTS}, use a coarser grain")
+        m = src.bucket_model
+        sums = self._sums(src)
+        db = SessionLocal()
+        try:
+            rows = (db.query(m.bucket, *sums.values())
+                    .filter(*self._filtered(src, g, lo, hi, filters))
+                    .group_by(m.bucket).all())
+        finally:
+            db.close()
+        by_bucket = {r[0]: dict(zip(sums, r[1:])) for r in rows}
+        empty = dict.fromkeys(src.measures, 0)
+        points = [{"ts": epoch_to_iso(b), **self._row(src, by_bucket.get(b, empty))} for b in range(lo, hi, sec)]
+        return {"source": source, "grain": g, "since": epoch_to_iso(lo), "until": epoch_to_iso(hi),
+                "as_of": self._as_of(source), "points": points}
+
+    def top(self, source: str, by: str, metric: str, n: int = 10, since: Optional[str] = None,
+            until: Optional[str] = None, grain: Optional[str] = None, min_count: int = 1,
+            **filters: Optional[str]) -> Dict[str, Any]:
+        """Top `n` values of dimension `by` ranked by `metric` (a measure or error_rate) over the window."""
+        src = _source(source)
+        if by not in src.dims:
+            raise ValueError(f"{source} rollups have no dimension {by!r}; expected one of {list(src.dims)}")
+        if metric not in src.measures and metric != "error_rate":
+            raise ValueError(f"unknown metric {metric!r}; expected one of {list(src.measures) + ['error_rate']}")
+        g, lo, hi = self._window(since, until, grain)
+        m = src.bucket_model
+        sums = self._sums(src)
+        if metric == "error_rate":
+            order = (func.sum(m.errors) * 1.0 / func.sum(getattr(m, COUNT_MEASURE[source]))).desc()
+        else:
+            order = sums[metric].desc()
+        key = getattr(m, by)
+        db = SessionLocal()
+        try:
+            rows = (db.query(key, *sums.values())
+                    .filter(*self._filtered(src, g, lo, hi, filters))
+                    .group_by(key)
+                    .having(func.sum(getattr(m, COUNT_MEASURE[source])) >= max(1, min_count))
+                    .order_by(order, key)
+                    .limit(max(1, min(n, 1000))).all())
+        finally:
+            db.close()
+        return {"source": source, "by": by, "metric": metric, "grain": g,
+                "since": epoch_to_iso(lo), "until": epoch_to_iso(hi), "as_of": self._as_of(source),
+                "top": [{by: r[0], **self._row(src, dict(zip(sums, r[1:])))} for r in rows]}
+
+    def _as_of(self, source: str) -> Optional[str]:
+        wm = self.watermark(source)
+        return epoch_to_iso(wm) if wm is not None else None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "watermarks": {s: self._as_of(s) for s in SOURCES},
+            "passes": self.passes,
+            "source_rows": self.source_rows,
+            "bucket_upserts": self.upserts,
+        }
+
+
+ANALYTICS_ROLLUPS = AnalyticsRollups()
@@ -1,15 +1,44 @@
 from __future__ import annotations
+import logging
+import queue
+import threading
 import uuid
 import time
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 
+from api.config import AUDIT_QUEUE_MAX, AUDIT_BATCH_ROWS, AUDIT_FLUSH_MS, AUDIT_ENQUEUE_TIMEOUT_MS
 from db.database import SessionLocal
 from db.models import AuditLog
 
+log = logging.getLogger(__name__)
+
 def now_iso() -> str:
     return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
 
+def _audit_row(event: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "audit_id": event.get("audit_id") or str(uuid.uuid4()),
+        "ts": event.get("ts", now_iso()),
+        "tenant_id": event.get("tenant_id","unknown"),
+        "user_id": event.get("user_id","unknown"),
+        "device_id": event.get("device_id","unknown"),
+        "ip": event.get("ip","unknown"),
+        "route": event.get("route",""),
+        "action": event.get("action",""),
+        "target_id": event.get("target_id",""),
+        "ok": bool(event.get("ok", False)),
+        "credits": int(event.get("credits", 0)),
+        "error": (event.get("error") or "")[:800]
+    }
+
+def add_audit(db: Session, event: Dict[str, Any]) -> str:
+    """Stage an audit row in the caller's session (no commit)."""
+    row = AuditLog(**_audit_row(event))
+    db.add(row)
+    return row.audit_id
+
 def write_audit(event: Dict[str, Any]) -> str:
     """
     event keys:
@@ -17,23 +46,138 @@ def write_audit(event: Dict[str, Any]) -> str:
     """
     db: Session = SessionLocal()
     try:
-        aid = str(uuid.uuid4())
-        row = AuditLog(
-            audit_id=aid,
-            ts=event.get("ts", now_iso()),
-            tenant_id=event.get("tenant_id","unknown"),
-            user_id=event.get("user_id","unknown"),
-            device_id=event.get("device_id","unknown"),
-            ip=event.get("ip","unknown"),
-            route=event.get("route",""),
-            action=event.get("action",""),
-            target_id=event.get("target_id",""),
-            ok=bool(event.get("ok", False)),
-            credits=int(event.get("credits", 0)),
-            error=(event.get("error") or "")[:800]
-        )
-        db.add(row)
+        audit_id = add_audit(db, event)
+        db.commit()
+        return audit_id
+    finally:
+        db.close()
+
+def write_audit_batch(rows: List[Dict[str, Any]]) -> int:
+    """One multi-row INSERT + one commit for a batch of prepared audit rows."""
+    if not rows:
+        return 0
+    db: Session = SessionLocal()
+    try:
+        db.execute(insert(AuditLog), rows)
         db.commit()
-        return aid
+        return len(rows)
     finally:
         db.close()
+
+class AuditWriter:
+    """
+    Queue-backed audit writer: request handlers enqueue, a background thread
+    coalesces rows into multi-row inserts every AUDIT_FLUSH_MS or AUDIT_BATCH_ROWS.
+    When the queue is full, events are dropped (and counted) instead of
+    stalling the request path.
+    """
+
+    def __init__(self, max_queue: int = AUDIT_QUEUE_MAX, batch_rows: int = AUDIT_BATCH_ROWS,
+                 flush_ms: int = AUDIT_FLUSH_MS, enqueue_timeout_ms: int = AUDIT_ENQUEUE_TIMEOUT_MS):
+        self.batch_rows = batch_rows
+        self.flush_sec = flush_ms / 1000.0
+        self.enqueue_timeout = enqueue_timeout_ms / 1000.0
+        self._q: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._flush_lock = threading.Lock()
+        self.enqueued = 0
+        self.dropped = 0
+        self.flushed = 0
+        self.batches = 0
+        self.failed = 0
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, event: Dict[str, Any]) -> bool:
+        if self._thread is None:
+            self.start()
+        row = _audit_row(event)
+        try:
+            if self.enqueue_timeout > 0:
+                self._q.put(row, timeout=self.enqueue_timeout)
+            else:
+                self._q.put_nowait(row)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.enqueued += 1
+        return True
+
+    def _drain(self) -> List[Dict[str, Any]]:
+        rows: List[Dict[str, Any]] = []
+        while len(rows) < self.batch_rows:
+            try:
+                rows.append(self._q.get_nowait())
+            except queue.Empty:
+                break
+        return rows
+
+    def _write(self, rows: List[Dict[str, Any]]) -> None:
+        if not rows:
+            return
+        try:
+            self.flushed += write_audit_batch(rows)
+            self.batches += 1
+        except Exception:
+            self.failed += len(rows)
+            log.exception("audit batch insert failed (%d rows lost)", len(rows))
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                first = self._q.get(timeout=self.flush_sec)
+            except queue.Empty:
+                continue
+            # give the batch up to flush_sec to fill before writing it
+            deadline = time.time() + self.flush_sec
+            rows = [first]
+            while len(rows) < self.batch_rows:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                try:
+                    rows.append(self._q.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            with self._flush_lock:
+                self._write(rows)
+
+    def flush(self) -> int:
+        """Synchronously write everything currently queued."""
+        n = 0
+        with self._flush_lock:
+            while True:
+                rows = self._drain()
+                if not rows:
+                    return n
+                self._write(rows)
+                n += len(rows)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+        self.flush()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": self._q.qsize(),
+            "enqueued": self.enqueued,
+            "flushed": self.flushed,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "batches": self.batches,
+        }
+
+AUDIT_WRITER = AuditWriter()
+
+def enqueue_audit(event: Dict[str, Any]) -> bool:
+    """Non-blocking audit write for the request path (see AuditWriter)."""
+    return AUDIT_WRITER.submit(event)
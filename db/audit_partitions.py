@@ -0,0 +1,393 @@
+"""
+Time-partitioned audit storage.
+
+audit_logs only holds the open partition (today, or this month with
+AUDIT_PARTITION="month"), so it stays small and carries just two indexes.
+AUDIT_CLOSE_GRACE_SEC after a partition ends, and once the analytics rollups
+(db/analytics_rollups.py) have counted it, close_due() moves its rows out:
+
+1. streams them in (ts, audit_id) order onto logs/audit/audit-<period>.jsonl.gz,
+   appended as a sequence of gzip members of AUDIT_ARCHIVE_BLOCK_ROWS rows each
+   (still one valid .gz file for zcat / gzip.open);
+2. records the new blocks as "pending" in the time index audit-<period>.idx.json:
+   per block [first_ts, last_ts, byte offset, byte length, rows], so a range
+   read only decompresses the blocks it overlaps;
+3. in one transaction, adds them to the period's audit_rollups
+   (requests / errors / credits per tenant and route) and deletes those rows;
+4. moves the pending blocks into the time index and logs/audit/index.json.
+
+Rows that land after their period was closed (batched writes, clock skew) are
+picked up by a later pass the same way: their blocks are appended and their
+totals added, nothing already archived is rewritten. A pass that stopped
+before step 4 is settled by the next one: if its first row is gone from
+audit_logs the transaction committed and its blocks are kept, otherwise the
+archive is truncated back to the committed length and the rows are redone.
+apply_retention() deletes archives and rollups past their configured age.
+
+One worker at a time closes partitions (advisory lock on logs/audit/.lock);
+the others skip the pass.
+"""
+from __future__ import annotations
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+import zlib
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # non-POSIX: in-process lock only
+    fcntl = None
+
+from sqlalchemy import delete, func
+
+from api.config import (
+    AUDIT_PARTITION, AUDIT_ARCHIVE_BLOCK_ROWS, AUDIT_ARCHIVE_RETENTION_DAYS, AUDIT_ROLLUP_RETENTION_DAYS,
+    AUDIT_CLOSE_CHECK_SEC, AUDIT_CLOSE_GRACE_SEC,
+)
+from db.analytics_rollups import ANALYTICS_ROLLUPS, iso_to_epoch
+from db.database import SessionLocal, dialect_insert
+from db.models import AuditLog, AuditRollup
+from registry.snapshot import read_json, write_json
+
+log = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+ARCHIVE_DIR = BASE_DIR / "logs" / "audit"
+
+COLUMNS = ("audit_id", "ts", "tenant_id", "user_id", "device_id", "ip", "route", "action", "target_id",
+           "ok", "credits", "error")
+_FMT = "%Y-%m-%dT%H:%M:%SZ"
+
+
+def now_iso() -> str:
+    return time.strftime(_FMT, time.gmtime())
+
+
+def period_of(ts: str, granularity: str = AUDIT_PARTITION) -> str:
+    return ts[:7] if granularity == "month" else ts[:10]
+
+
+def period_bounds(period: str) -> Tuple[str, str]:
+    """[start, end) of a partition as ISO timestamps (compare as strings like audit_logs.ts)."""
+    if len(period) == 7:
+        start = datetime.strptime(period, "%Y-%m").replace(tzinfo=timezone.utc)
+        end = (start + timedelta(days=32)).replace(day=1)
+    else:
+        start = datetime.strptime(period, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+        end = start + timedelta(days=1)
+    return start.strftime(_FMT), end.strftime(_FMT)
+
+
+class AuditPartitions:
+    def __init__(self, directory: Path = ARCHIVE_DIR, granularity: str = AUDIT_PARTITION,
+                 block_rows: int = AUDIT_ARCHIVE_BLOCK_ROWS, check_sec: float = AUDIT_CLOSE_CHECK_SEC,
+                 grace_sec: int = AUDIT_CLOSE_GRACE_SEC):
+        if granularity not in ("day", "month"):
+            raise ValueError(f"unknown audit partition granularity {granularity!r}")
+        self.dir = directory
+        self.granularity = granularity
+        self.block_rows = block_rows
+        self.check_sec = check_sec
+        self.grace_sec = grace_sec
+        self.index_path = directory / "index.json"
+        self.lock_path = directory / ".lock"
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.closed = 0
+        self.archived_rows = 0
+
+    # ---------- paths / index ----------
+    def archive_path(self, period: str) -> Path:
+        return self.dir / f"audit-{period}.jsonl.gz"
+
+    def time_index_path(self, period: str) -> Path:
+        return self.dir / f"audit-{period}.idx.json"
+
+    def index(self) -> Dict[str, Any]:
+        return read_json(self.index_path, {"version": 1, "partitions": []})
+
+    def _save_partition(self, entry: Dict[str, Any]) -> None:
+        idx = self.index()
+        parts = [p for p in idx["partitions"] if p["period"] != entry["period"]] + [entry]
+        write_json(self.index_path, {**idx, "partitions": sorted(parts, key=lambda p: p["period"])}, indent=2)
+
+    @contextmanager
+    def _try_lock(self):
+        """Yields True if this process now owns the partition maintenance lock."""
+        if not self._lock.acquire(blocking=False):
+            yield False
+            return
+        try:
+            if fcntl is None:
+                yield True
+                return
+            self.dir.mkdir(parents=True, exist_ok=True)
+            with open(self.lock_path, "a") as lf:
+                try:
+                    fcntl.flock(lf, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    yield False
+                    return
+                try:
+                    yield True
+                finally:
+                    fcntl.flock(lf, fcntl.LOCK_UN)
+        finally:
+            self._lock.release()
+
+    # ---------- closing ----------
+    def current_period(self, now: Optional[str] = None) -> str:
+        return period_of(now or now_iso(), self.granularity)
+
+    def _oldest_period(self) -> Optional[str]:
+        db = SessionLocal()
+        try:
+            ts = db.query(func.min(AuditLog.ts)).scalar()
+        finally:
+            db.close()
+        return period_of(ts, self.granularity) if ts else None
+
+    def _meta(self, period: str) -> Dict[str, Any]:
+        """Time index of a partition (committed blocks only, plus any "pending" close pass)."""
+        path = self.time_index_path(period)
+        if path.exists():
+            return read_json(path, None, mutable=True)
+        start, end = period_bounds(period)
+        return {"period": period, "start": start, "end": end, "file": self.archive_path(period).name, "rows": 0,
+                "first_ts": None, "last_ts": None, "bytes": 0, "closed_at": None, "blocks": []}
+
+    @staticmethod
+    def _merge(meta: Dict[str, Any], pending: Dict[str, Any]) -> None:
+        meta["blocks"] += pending["blocks"]
+        meta["rows"] += pending["rows"]
+        meta["bytes"] = pending["bytes"]
+        # blocks from a later pass may hold rows older than earlier blocks (late audit writes)
+        meta["first_ts"] = min(b[0] for b in meta["blocks"])
+        meta["last_ts"] = max(b[1] for b in meta["blocks"])
+
+    def _settle(self, meta: Dict[str, Any]) -> None:
+        """Finish or undo a close pass that stopped between writing its blocks and updating the index."""
+        pending = meta.pop("pending", None)
+        if pending:
+            db = SessionLocal()
+            try:
+                # rows are deleted in the same transaction as the rollups are added: one probe row tells which
+                committed = db.get(AuditLog, pending["probe"]) is None
+            finally:
+                db.close()
+            if committed:
+                self._merge(meta, pending)
+        path = self.dir / meta["file"]
+        if path.exists() and path.stat().st_size > meta["bytes"]:
+            with open(path, "r+b") as f:
+                f.truncate(meta["bytes"])
+                os.fsync(f.fileno())
+
+    def _append_blocks(self, path: Path, rows: Iterator[Dict[str, Any]]) -> Dict[str, Any]:
+        """Append rows to the archive as new gzip members; existing bytes are never rewritten."""
+        blocks: List[List[Any]] = []
+        rollups: Dict[Tuple[str, str], List[int]] = defaultdict(lambda: [0, 0, 0])
+        ids: List[str] = []
+        with open(path, "ab") as f:
+            f.seek(0, os.SEEK_END)
+            buf: List[Dict[str, Any]] = []
+
+            def flush():
+                data = gzip.compress(b"".join(json.dumps(r, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+                                              + b"\n" for r in buf))
+                blocks.append([buf[0]["ts"], buf[-1]["ts"], f.tell(), len(data), len(buf)])
+                f.write(data)
+                buf.clear()
+
+            for r in rows:
+                buf.append(r)
+                ids.append(r["audit_id"])
+                g = rollups[(r["tenant_id"] or "", r["route"] or "")]
+                g[0] += 1
+                g[1] += 0 if r["ok"] else 1
+                g[2] += int(r["credits"] or 0)
+                if len(buf) >= self.block_rows:
+                    flush()
+            if buf:
+                flush()
+            f.flush()
+            os.fsync(f.fileno())
+            size = f.tell()
+        return {"blocks": blocks, "rollups": rollups, "ids": ids, "bytes": size}
+
+    def close_partition(self, period: str) -> Dict[str, Any]:
+        """Archive the partition's rows still in audit_logs, add them to its rollups and remove them.
+
+        A period closed before (late rows) gets new blocks appended to its archive
+        and its rollups incremented; earlier blocks and totals are left as they are.
+        """
+        start, end = period_bounds(period)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        meta = self._meta(period)
+        self._settle(meta)
+        db = SessionLocal()
+        try:
+            q = (db.query(*[getattr(AuditLog, c) for c in COLUMNS]).filter(AuditLog.ts >= start, AuditLog.ts < end)
+                 .order_by(AuditLog.ts, AuditLog.audit_id).yield_per(5000))
+            out = self._append_blocks(self.dir / meta["file"], (dict(zip(COLUMNS, r)) for r in q))
+            db.rollback()           # end the read transaction before writing
+            if not out["ids"]:
+                return {k: v for k, v in meta.items() if k != "blocks"}
+
+            meta["pending"] = {"blocks": out["blocks"], "rows": len(out["ids"]), "bytes": out["bytes"],
+                               "probe": out["ids"][0]}
+            write_json(self.time_index_path(period), meta, indent=None)
+
+            stmt = dialect_insert(AuditRollup)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[AuditRollup.period, AuditRollup.tenant_id, AuditRollup.route],
+                set_={m: getattr(AuditRollup, m) + stmt.excluded[m] for m in ("requests", "errors", "credits")},
+            )
+            db.execute(stmt, [
+                {"period": period, "tenant_id": t, "route": rt, "requests": g[0], "errors": g[1], "credits": g[2]}
+                for (t, rt), g in out["rollups"].items()
+            ])
+            # by id, not by range: rows written after the read above stay for the next pass
+            ids = out["ids"]
+            for i in range(0, len(ids), 500):
+                db.execute(delete(AuditLog).where(AuditLog.audit_id.in_(ids[i:i + 500])))
+            db.commit()
+        finally:
+            db.close()
+        self._merge(meta, meta.pop("pending"))
+        meta["closed_at"] = now_iso()
+        write_json(self.time_index_path(period), meta, indent=None)
+        entry = {k: v for k, v in meta.items() if k != "blocks"}
+        self._save_partition(entry)
+        self.closed += 1
+        self.archived_rows += len(out["ids"])
+        log.info("closed audit partition %s (%d rows, %d total)", period, len(out["ids"]), entry["rows"])
+        return entry
+
+    @staticmethod
+    def _rolled_up(end: str) -> bool:
+        """True once every audit row before `end` is in audit_buckets (db/analytics_rollups.py)."""
+        end_sec = iso_to_epoch(end)
+        wm = ANALYTICS_ROLLUPS.watermark("audit")
+        if wm is None or wm < end_sec:
+            ANALYTICS_ROLLUPS.roll()
+            wm = ANALYTICS_ROLLUPS.watermark("audit")
+        return wm is not None and wm >= end_sec
+
+    def close_due(self, now: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Close every partition that ended more than AUDIT_CLOSE_GRACE_SEC ago, is rolled up into
+        the analytics buckets and still has rows."""
+        now = now or now_iso()
+        cutoff = (datetime.strptime(now[:19], "%Y-%m-%dT%H:%M:%S")
+                  - timedelta(seconds=self.grace_sec)).strftime(_FMT)
+        closed = []
+        with self._try_lock() as owner:
+            if not owner:
+                return closed
+            while True:
+                oldest = self._oldest_period()
+                try:
+                    if oldest is None or period_bounds(oldest)[1] > cutoff:
+                        break
+                    if not self._rolled_up(period_bounds(oldest)[1]):
+                        log.info("audit partition %s waits for the analytics rollups to pass its end", oldest)
+                        break
+                    closed.append(self.close_partition(oldest))
+                except ValueError:
+                    # unparseable ts: leave the row for an operator instead of looping on it
+                    log.warning("audit partition %r has malformed timestamps; not closing", oldest)
+                    break
+        return closed
+
+    # ---------- retention ----------
+    def apply_retention(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        now = now or datetime.now(timezone.utc)
+        removed = {"archives": 0, "rollups": 0}
+        if AUDIT_ARCHIVE_RETENTION_DAYS > 0:
+            cutoff = (now - timedelta(days=AUDIT_ARCHIVE_RETENTION_DAYS)).strftime(_FMT)
+            idx = self.index()
+            keep = []
+            for p in idx["partitions"]:
+                if p["end"] <= cutoff:
+                    for path in (self.dir / p["file"], self.time_index_path(p["period"])):
+                        path.unlink(missing_ok=True)
+                    removed["archives"] += 1
+                else:
+                    keep.append(p)
+            if removed["archives"]:
+                write_json(self.index_path, {**idx, "partitions": keep}, indent=2)
+        if AUDIT_ROLLUP_RETENTION_DAYS > 0:
+            cutoff = period_of((now - timedelta(days=AUDIT_ROLLUP_RETENTION_DAYS)).strftime(_FMT), self.granularity)
+            db = SessionLocal()
+            try:
+                removed["rollups"] = db.execute(delete(AuditRollup).where(AuditRollup.period < cutoff)).rowcount
+                db.commit()
+            finally:
+                db.close()
+        return removed
+
+    # ---------- background ----------
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="audit-partitions", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.check_sec):
+            try:
+                if self.close_due():
+                    self.apply_retention()
+            except Exception:
+                log.exception("audit partition maintenance failed")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    # ---------- archive reads ----------
+    def read_archive(self, period: str, since: Optional[str] = None, until: Optional[str] = None,
+                     **match: Any) -> Iterator[Dict[str, Any]]:
+        """Rows of a closed partition in ts order per close pass (late rows come after the
+        first pass's); only blocks overlapping [since, until] are decompressed."""
+        path = self.time_index_path(period)
+        if not path.exists():
+            raise KeyError(period)
+        meta = read_json(path, None)
+        with open(self.dir / meta["file"], "rb") as f:
+            for first_ts, last_ts, offset, length, _ in meta["blocks"]:
+                if (since and last_ts < since) or (until and first_ts > until):
+                    continue
+                f.seek(offset)
+                raw = zlib.decompressobj(wbits=31).decompress(f.read(length))
+                for line in raw.splitlines():
+                    r = json.loads(line)
+                    if (since and r["ts"] < since) or (until and r["ts"] > until):
+                        continue
+                    if all(r.get(k) == v for k, v in match.items()):
+                        yield r
+
+    def stats(self) -> Dict[str, Any]:
+        idx = self.index()
+        return {
+            "granularity": self.granularity,
+            "current_period": self.current_period(),
+            "archived_partitions": len(idx["partitions"]),
+            "archived_rows": sum(p["rows"] for p in idx["partitions"]),
+            "closed_this_process": self.closed,
+        }
+
+
+AUDIT_PARTITIONS = AuditPartitions()
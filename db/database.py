@@ -1,18 +1,70 @@
 from __future__ import annotations
 
 from pathlib import Path
-from sqlalchemy import create_engine
+from typing import Any, Dict, Optional
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 
+from api.config import (
+    DATABASE_URL as CONFIGURED_URL, DB_PROFILE, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT_SEC,
+    DB_POOL_RECYCLE_SEC, SQLITE_BUSY_TIMEOUT_MS, SQLITE_MMAP_BYTES, SQLITE_CACHE_KIB,
+)
+
 # Stable DB location (always the same, no matter where you run the server from)
 BASE_DIR = Path(__file__).resolve().parent.parent   # .../python
 DB_FILE = BASE_DIR / "aipass.sqlite3"
-DATABASE_URL = f"sqlite:///{DB_FILE}"
+DATABASE_URL = CONFIGURED_URL or f"sqlite:///{DB_FILE}"
 
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False}  # needed for sqlite + FastAPI
-)
+# PRAGMAs run on every new SQLite connection.
+#   WAL: readers never block the writer and vice versa; synchronous=NORMAL is
+#   durable across process crashes in WAL mode (a power loss can drop the last
+#   commits, not corrupt the file); busy_timeout makes a second writer wait for
+#   the lock instead of failing with "database is locked".
+SQLITE_PROFILES: Dict[str, Dict[str, Any]] = {
+    "default": {},
+    "production": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": SQLITE_BUSY_TIMEOUT_MS,
+        "mmap_size": SQLITE_MMAP_BYTES,
+        "cache_size": -SQLITE_CACHE_KIB,     # negative = KiB
+        "temp_store": "MEMORY",
+    },
+}
+
+def make_engine(url: Optional[str] = None, profile: str = DB_PROFILE, pool_size: int = DB_POOL_SIZE,
+                max_overflow: int = DB_MAX_OVERFLOW) -> Engine:
+    url = url or DATABASE_URL
+    if url.startswith("sqlite"):
+        if profile not in SQLITE_PROFILES:
+            raise ValueError(f"unknown sqlite profile {profile!r}")
+        kw: Dict[str, Any] = {"connect_args": {"check_same_thread": False}}  # needed for sqlite + FastAPI
+        if ":memory:" not in url and url not in ("sqlite://", "sqlite:///"):
+            kw.update(pool_size=pool_size, max_overflow=max_overflow, pool_timeout=DB_POOL_TIMEOUT_SEC)
+        eng = create_engine(url, **kw)
+        pragmas = SQLITE_PROFILES[profile]
+        if pragmas:
+            @event.listens_for(eng, "connect")
+            def _sqlite_pragmas(dbapi_conn, _record):
+                cur = dbapi_conn.cursor()
+                for k, v in pragmas.items():
+                    cur.execute(f"PRAGMA {k}={v}")
+                cur.close()
+        return eng
+    # server databases (Postgres): pooled per worker, connections checked before use
+    return create_engine(url, pool_size=pool_size, max_overflow=max_overflow, pool_timeout=DB_POOL_TIMEOUT_SEC,
+                         pool_recycle=DB_POOL_RECYCLE_SEC, pool_pre_ping=True)
+
+engine = make_engine()
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
+
+def dialect_insert(table):
+    """INSERT construct with on_conflict_do_update/do_nothing for the configured database."""
+    if engine.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table)
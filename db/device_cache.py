@@ -0,0 +1,153 @@
+"""
+In-process cache of device binding state (tenant, current_jti, is_active).
+
+require_device_token reads from here instead of querying `devices` on every
+call. Writers (rotate / deactivate) bump a version row in `cache_versions`
+inside their own transaction - the source of truth - and after the commit
+replace a small signal file (logs/device_cache.signal). Every request stat()s
+that file; when it changed, the worker re-reads the version row and drops its
+cache if the version moved, so a revoked token fails on the very next request.
+Workers that do not share the file (other hosts) still poll the row at most
+once per DEVICE_CACHE_CHECK_SEC. The worker that made the change invalidates
+locally right away.
+"""
+from __future__ import annotations
+import os
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from api.config import DEVICE_CACHE_CHECK_SEC, DEVICE_CACHE_MAX_ENTRIES, DEVICE_CACHE_SIGNAL_FILE
+from db.database import SessionLocal, engine
+from db.models import CacheVersion, Device
+
+VERSION_KEY = "devices"
+SIGNAL_FILE = Path(DEVICE_CACHE_SIGNAL_FILE or Path(__file__).resolve().parent.parent / "logs" / "device_cache.signal")
+
+
+@dataclass(frozen=True)
+class DeviceState:
+    device_id: str
+    tenant_id: str
+    user_id: str
+    current_jti: str
+    is_active: bool
+
+
+def _read_version(db: Session) -> int:
+    row = db.query(CacheVersion.version).filter(CacheVersion.name == VERSION_KEY).first()
+    return int(row[0]) if row else 0
+
+
+def bump_version(db: Session) -> None:
+    """Publish a device change to other workers. Call before db.commit()."""
+    res = db.execute(update(CacheVersion).where(CacheVersion.name == VERSION_KEY).values(version=CacheVersion.version + 1))
+    if res.rowcount == 0:
+        db.add(CacheVersion(name=VERSION_KEY, version=1))
+
+
+def publish_change(path: Path = SIGNAL_FILE) -> None:
+    """Wake every worker's cache. Call after the db.commit() that carried bump_version()."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # atomic replace: new inode and mtime, so a stat() on the other side always sees the change
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_text(f"{time.time_ns()}\n", encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _signal(path: Path) -> Tuple[int, int]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return (-1, -1)
+    return (st.st_mtime_ns, st.st_ino)
+
+
+class DeviceCache:
+    def __init__(self, check_sec: float = DEVICE_CACHE_CHECK_SEC, max_entries: int = DEVICE_CACHE_MAX_ENTRIES,
+                 signal_file: Path = SIGNAL_FILE):
+        self.check_sec = check_sec
+        self.max_entries = max_entries
+        self.signal_file = signal_file
+        self._signal: Tuple[int, int] = (-2, -2)
+        self._entries: Dict[str, DeviceState] = {}
+        self._version = -1
+        self._epoch = 0   # bumped on every clear/invalidate, local or version-triggered
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._table_ready = False
+        self.hits = 0
+        self.misses = 0
+
+    def _ensure_table(self) -> None:
+        if not self._table_ready:
+            CacheVersion.__table__.create(bind=engine, checkfirst=True)
+            self._table_ready = True
+
+    def _sync(self, db: Session) -> None:
+        now = time.time()
+        # one stat() per request; the version row is only read when the signal moved or the poll is due
+        sig = _signal(self.signal_file)
+        if sig == self._signal and self.check_sec and now - self._checked_at < self.check_sec:
+            return
+        self._ensure_table()
+        version = _read_version(db)
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._epoch += 1
+                self._version = version
+            self._signal = sig
+            self._checked_at = now
+
+    def get(self, device_id: str) -> Optional[DeviceState]:
+        db = SessionLocal()
+        try:
+            self._sync(db)
+            st = self._entries.get(device_id)
+            if st is not None:
+                self.hits += 1
+                return st
+
+            self.misses += 1
+            # a clear or invalidate between this read and the insert must not leave stale state cached
+            epoch = self._epoch
+            d = db.query(Device).filter(Device.device_id == device_id).first()
+            if not d:
+                return None
+            st = DeviceState(
+                device_id=d.device_id,
+                tenant_id=d.tenant_id,
+                user_id=d.user_id,
+                current_jti=d.current_jti or "",
+                is_active=bool(d.is_active),
+            )
+            with self._lock:
+                if self._epoch == epoch:
+                    if len(self._entries) >= self.max_entries:
+                        self._entries.clear()
+                    self._entries[device_id] = st
+            return st
+        finally:
+            db.close()
+
+    def invalidate(self, device_id: str) -> None:
+        with self._lock:
+            self._entries.pop(device_id, None)
+            self._epoch += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._epoch += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self._entries), "version": self._version, "hits": self.hits, "misses": self.misses}
+
+
+DEVICE_CACHE = DeviceCache()
@@ -1,10 +1,10 @@
-from db.database import engine, Base
-from db import models  # noqa: F401
-from db.wallet_models import Wallet, UsageEvent
+from db.migrations import migrate, status
 
 def main():
-    Base.metadata.create_all(bind=engine)
-    print("✅ SQLite DB ready: tables created")
+    # baseline create_all plus every pending schema migration (db/migrations.py)
+    applied = migrate()
+    print(f"✅ SQLite DB ready: schema version {status()['version']}"
+          + (f" ({len(applied)} migrations applied)" if applied else ""))
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,176 @@
+"""
+Versioned schema migrations.
+
+create_all() only creates missing tables, so indexes and columns added to the
+models never reach an existing aipass.sqlite3. Each migration here runs once,
+in its own transaction, and records itself in `schema_version`:
+
+    python -m db.migrations            # apply pending migrations
+    python -m db.migrations --status   # current version / pending list
+
+The API applies pending migrations at startup (several workers racing on the
+same step is harmless: every step is idempotent and only one version row wins).
+
+Steps are frozen once released: to change the schema, append a new one.
+"""
+from __future__ import annotations
+import argparse
+import json
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import IntegrityError
+
+from db.database import Base, engine
+from db import models  # noqa: F401  (registers the tables)
+from db import wallet_models  # noqa: F401
+
+
+def _create_indexes(conn: Connection, *names: str) -> None:
+    """Create the indexes declared under these names in the models."""
+    # a name no longer declared was removed by a later step, which also drops it
+    wanted = set(names)
+    for table in Base.metadata.sorted_tables:
+        for ix in table.indexes:
+            if ix.name in wanted:
+                ix.create(bind=conn, checkfirst=True)
+
+
+def _drop_indexes(conn: Connection, *names: str) -> None:
+    for name in names:
+        conn.execute(text(f'DROP INDEX IF EXISTS "{name}"'))
+
+
+def add_column(conn: Connection, table: str, ddl: str) -> None:
+    """ALTER TABLE .. ADD COLUMN unless the column exists (`ddl` = "name TYPE ...")."""
+    have = {c["name"] for c in inspect(conn).get_columns(table)}
+    if ddl.split()[0] not in have:
+        conn.execute(text(f'ALTER TABLE "{table}" ADD COLUMN {ddl}'))
+
+
+# ---------- steps ----------
+def _baseline(conn: Connection) -> None:
+    Base.metadata.create_all(bind=conn)
+
+
+def _keyset_listing_indexes(conn: Connection) -> None:
+    # (filter, ts, id) indexes behind the cursor-paginated listings (db/pagination.py)
+    _create_indexes(
+        conn,
+        "ix_reviews_ts_review_id", "ix_reviews_skill_id_ts",
+        "ix_billing_events_ts_event_id", "ix_billing_events_tenant_id_ts",
+        "ix_audit_logs_ts_audit_id", "ix_audit_logs_tenant_id_ts", "ix_audit_logs_action_ts", "ix_audit_logs_route_ts",
+        "ix_workflow_versions_developer_id_created_ts", "ix_submissions_developer_id_updated_ts",
+        "ix_usage_events_ts_id", "ix_usage_events_tenant_id_ts", "ix_usage_events_action_ts",
+    )
+
+
+# single-column indexes the models used to declare on every column (index=True);
+# each is now unused, a prefix of a composite index, or duplicates the primary key
+LEGACY_SINGLE_COLUMN_INDEXES: Dict[str, Tuple[str, ...]] = {
+    "reviews": ("review_id", "ts", "skill_id", "tenant_id", "user_id"),
+    "billing_events": ("event_id", "ts", "tenant_id", "skill_id", "developer_id"),
+    "users": ("user_id", "tenant_id", "role"),
+    "devices": ("device_id", "tenant_id", "user_id"),
+    "audit_logs": ("audit_id", "ts", "tenant_id", "user_id", "device_id", "ip", "route", "action", "target_id"),
+    "rate_counters": ("key", "window_start"),
+    "suspensions": ("suspend_id", "tenant_id", "device_id"),
+    "workflow_versions": ("wf_ver_id", "workflow_id", "version", "developer_id", "status", "created_ts"),
+    "submissions": ("submission_id", "workflow_id", "version", "developer_id", "status", "created_ts", "updated_ts"),
+    "version_locks": ("lock_id", "tenant_id", "workflow_id", "locked_version", "updated_ts"),
+    "tenant_installs": ("install_id", "tenant_id", "workflow_id", "current_version", "updated_ts"),
+    "install_events": ("event_id", "tenant_id", "workflow_id", "version", "action", "by_user_id", "device_id", "created_ts"),
+    "wallets": ("tenant_id",),
+    "usage_events": ("id", "ts", "tenant_id", "user_id", "device_id", "action", "ref_id"),
+}
+
+
+def _query_indexes(conn: Connection) -> None:
+    # composite indexes matched to the lookups in db/rate_limit_db.py, db/install_db.py, db/workflow_db.py
+    _create_indexes(
+        conn,
+        "ix_suspensions_tenant_id_device_id", "ix_suspensions_until_ts",
+        "ix_workflow_versions_workflow_id_version", "ix_submissions_status_updated_ts",
+        "ix_version_locks_tenant_id_workflow_id", "ix_tenant_installs_tenant_id_workflow_id",
+        "ix_install_events_tenant_id_workflow_id",
+    )
+    _drop_indexes(conn, *[f"ix_{t}_{c}" for t, cols in LEGACY_SINGLE_COLUMN_INDEXES.items() for c in cols])
+
+
+def _audit_partitions(conn: Connection) -> None:
+    # audit_logs is now only the open partition (db/audit_partitions.py)
+    models.AuditRollup.__table__.create(bind=conn, checkfirst=True)
+    _drop_indexes(conn, "ix_audit_logs_action_ts", "ix_audit_logs_route_ts")
+
+
+def _analytics_rollups(conn: Connection) -> None:
+    # GROUP BY rollups behind /admin/analytics (db/analytics_rollups.py)
+    for model in (models.UsageBucket, models.AuditBucket, models.RollupWatermark):
+        model.__table__.create(bind=conn, checkfirst=True)
+
+
+Migration = Tuple[int, str, Callable[[Connection], None]]
+
+MIGRATIONS: List[Migration] = [
+    (1, "baseline", _baseline),
+    (2, "keyset_listing_indexes", _keyset_listing_indexes),
+    (3, "query_indexes", _query_indexes),
+    (4, "audit_partitions", _audit_partitions),
+    (5, "analytics_rollups", _analytics_rollups),
+]
+
+
+# ---------- runner ----------
+def _ensure_version_table(bind: Engine) -> None:
+    with bind.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_version ("
+            "version INTEGER PRIMARY KEY, name TEXT NOT NULL, applied_ts INTEGER NOT NULL)"
+        ))
+
+
+def applied_versions(bind: Engine = engine) -> List[int]:
+    _ensure_version_table(bind)
+    with bind.connect() as conn:
+        return [int(v) for (v,) in conn.execute(text("SELECT version FROM schema_version ORDER BY version"))]
+
+
+def status(bind: Engine = engine) -> Dict[str, Any]:
+    done = set(applied_versions(bind))
+    return {
+        "version": max(done, default=0),
+        "latest": MIGRATIONS[-1][0],
+        "pending": [f"{v}_{name}" for v, name, _ in MIGRATIONS if v not in done],
+    }
+
+
+def migrate(target: Optional[int] = None, bind: Engine = engine) -> List[Dict[str, Any]]:
+    """Apply pending migrations up to `target` (default: all). Returns what this call applied."""
+    done = set(applied_versions(bind))
+    applied = []
+    for version, name, step in MIGRATIONS:
+        if version in done or (target is not None and version > target):
+            continue
+        t0 = time.time()
+        try:
+            with bind.begin() as conn:
+                step(conn)
+                conn.execute(text("INSERT INTO schema_version (version, name, applied_ts) VALUES (:v, :n, :t)"),
+                             {"v": version, "n": name, "t": int(time.time())})
+        except IntegrityError:
+            continue        # another worker recorded this version first
+        applied.append({"version": version, "name": name, "seconds": round(time.time() - t0, 3)})
+    return applied
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--status", action="store_true")
+    ap.add_argument("--target", type=int, default=None)
+    args = ap.parse_args()
+    if args.status:
+        print(json.dumps(status(), indent=2))
+    else:
+        print(json.dumps({"applied": migrate(args.target), **status()}, indent=2))
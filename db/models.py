@@ -1,133 +1,230 @@
 from __future__ import annotations
-from sqlalchemy import Column, String, Integer, Float, Boolean, Text
+from sqlalchemy import Column, String, Integer, Float, Boolean, Text, Index
 from db.database import Base
 
 class Review(Base):
     __tablename__ = "reviews"
-    review_id = Column(String, primary_key=True, index=True)
-    ts = Column(String, index=True)
-    skill_id = Column(String, index=True)
-    tenant_id = Column(String, index=True)
-    user_id = Column(String, index=True)
+    review_id = Column(String, primary_key=True)
+    ts = Column(String)
+    skill_id = Column(String)
+    tenant_id = Column(String)
+    user_id = Column(String)
     rating = Column(Integer)
     text = Column(Text)
     verified = Column(Boolean, default=False)
     abuse_score = Column(Integer, default=0)
     developer_response = Column(Text, nullable=True)
 
+    # keyset pagination (db/pagination.py): filter columns first, sort key last
+    __table_args__ = (
+        Index("ix_reviews_ts_review_id", "ts", "review_id"),
+        Index("ix_reviews_skill_id_ts", "skill_id", "ts", "review_id"),
+    )
+
 class BillingEvent(Base):
     __tablename__ = "billing_events"
-    event_id = Column(String, primary_key=True, index=True)
-    ts = Column(String, index=True)
-    tenant_id = Column(String, index=True)
-    skill_id = Column(String, index=True)
+    event_id = Column(String, primary_key=True)
+    ts = Column(String)
+    tenant_id = Column(String)
+    skill_id = Column(String)
     version = Column(String)
     credits = Column(Integer)
     gross_usd = Column(Float)
     platform_fee_usd = Column(Float)
     developer_net_usd = Column(Float)
-    developer_id = Column(String, index=True)
+    developer_id = Column(String)
     latency_ms = Column(Integer, nullable=True)
 
+    __table_args__ = (
+        Index("ix_billing_events_ts_event_id", "ts", "event_id"),
+        Index("ix_billing_events_tenant_id_ts", "tenant_id", "ts", "event_id"),
+    )
+
 class User(Base):
     __tablename__ = "users"
-    user_id = Column(String, primary_key=True, index=True)
-    tenant_id = Column(String, index=True)   # e.g. "t1"
+    user_id = Column(String, primary_key=True)
+    tenant_id = Column(String)               # e.g. "t1"
     email = Column(String, unique=True, index=True)
     password_hash = Column(String)
-    role = Column(String, index=True)        # "admin" | "developer" | "tenant"
+    role = Column(String)                    # "admin" | "developer" | "tenant"
     is_active = Column(Boolean, default=True)
 
 class Device(Base):
     __tablename__ = "devices"
-    device_id = Column(String, primary_key=True, index=True)
-    tenant_id = Column(String, index=True)
-    user_id = Column(String, index=True)
+    device_id = Column(String, primary_key=True)
+    tenant_id = Column(String)
+    user_id = Column(String)
     name = Column(String)
     current_jti = Column(String)             # rotation: only latest jti is valid
     is_active = Column(Boolean, default=True)
 
 class AuditLog(Base):
     __tablename__ = "audit_logs"
-    audit_id = Column(String, primary_key=True, index=True)
-    ts = Column(String, index=True)
-    tenant_id = Column(String, index=True)
-    user_id = Column(String, index=True)
-    device_id = Column(String, index=True)
-    ip = Column(String, index=True)
-    route = Column(String, index=True)
-    action = Column(String, index=True)   # e.g. SKILL_RUN / WORKFLOW_RUN / AGENT_RUN
-    target_id = Column(String, index=True)  # skill_id or workflow_id
+    audit_id = Column(String, primary_key=True)
+    ts = Column(String)
+    tenant_id = Column(String)
+    user_id = Column(String)
+    device_id = Column(String)
+    ip = Column(String)
+    route = Column(String)
+    action = Column(String)               # e.g. SKILL_RUN / WORKFLOW_RUN / AGENT_RUN
+    target_id = Column(String)              # skill_id or workflow_id
     ok = Column(Boolean, default=False)
     credits = Column(Integer, default=0)
     error = Column(Text, nullable=True)
 
+    __table_args__ = (
+        # open partition only (db/audit_partitions.py): kept small, so two indexes are enough
+        Index("ix_audit_logs_ts_audit_id", "ts", "audit_id"),
+        Index("ix_audit_logs_tenant_id_ts", "tenant_id", "ts", "audit_id"),
+    )
+
+class AuditRollup(Base):
+    __tablename__ = "audit_rollups"
+    period = Column(String, primary_key=True)      # closed audit partition, "2026-02-12" or "2026-02"
+    tenant_id = Column(String, primary_key=True)
+    route = Column(String, primary_key=True)
+    requests = Column(Integer, default=0)
+    errors = Column(Integer, default=0)            # ok = false
+    credits = Column(Integer, default=0)
+
+# analytics rollups (db/analytics_rollups.py): one row per (grain, bucket, dimensions);
+# bucket = unix seconds at the start of the minute / hour / day (UTC), "" for missing dimensions
+class UsageBucket(Base):
+    __tablename__ = "usage_buckets"
+    grain = Column(String, primary_key=True)       # minute / hour / day
+    bucket = Column(Integer, primary_key=True)
+    tenant_id = Column(String, primary_key=True)
+    device_id = Column(String, primary_key=True)
+    action = Column(String, primary_key=True)
+    events = Column(Integer, default=0)
+    units = Column(Integer, default=0)
+    credits = Column(Integer, default=0)
+    errors = Column(Integer, default=0)            # ok = false
+
+    __table_args__ = (
+        Index("ix_usage_buckets_grain_tenant_id_bucket", "grain", "tenant_id", "bucket"),
+    )
+
+class AuditBucket(Base):
+    __tablename__ = "audit_buckets"
+    grain = Column(String, primary_key=True)
+    bucket = Column(Integer, primary_key=True)
+    tenant_id = Column(String, primary_key=True)
+    device_id = Column(String, primary_key=True)
+    route = Column(String, primary_key=True)
+    requests = Column(Integer, default=0)
+    errors = Column(Integer, default=0)
+    credits = Column(Integer, default=0)
+
+    __table_args__ = (
+        Index("ix_audit_buckets_grain_tenant_id_bucket", "grain", "tenant_id", "bucket"),
+    )
+
+class RollupWatermark(Base):
+    __tablename__ = "rollup_watermarks"
+    source = Column(String, primary_key=True)      # usage / audit
+    watermark = Column(Integer)                    # rows with ts < watermark are in the buckets
+    updated_ts = Column(Integer)
+
 class RateCounter(Base):
     __tablename__ = "rate_counters"
-    key = Column(String, primary_key=True, index=True)     # tenant/device/route/window
-    window_start = Column(Integer, index=True)             # unix seconds
+    key = Column(String, primary_key=True)                 # tenant/device/route/window
+    window_start = Column(Integer)                         # unix seconds
     window_sec = Column(Integer)
     count = Column(Integer, default=0)
 
 class Suspension(Base):
     __tablename__ = "suspensions"
-    suspend_id = Column(String, primary_key=True, index=True)
-    tenant_id = Column(String, index=True)
-    device_id = Column(String, index=True)
-    until_ts = Column(Integer, index=True)                 # unix seconds
+    suspend_id = Column(String, primary_key=True)
+    tenant_id = Column(String)
+    device_id = Column(String)
+    until_ts = Column(Integer)                             # unix seconds
     reason = Column(Text)
 
+    __table_args__ = (
+        Index("ix_suspensions_tenant_id_device_id", "tenant_id", "device_id", "until_ts"),
+        Index("ix_suspensions_until_ts", "until_ts"),          # active-suspension cache load
+    )
+
 class WorkflowVersion(Base):
     __tablename__ = "workflow_versions"
-    wf_ver_id = Column(String, primary_key=True, index=True)
-    workflow_id = Column(String, index=True)          # stable id
-    version = Column(String, index=True)              # "1.0.0"
-    developer_id = Column(String, index=True)
+    wf_ver_id = Column(String, primary_key=True)
+    workflow_id = Column(String)                      # stable id
+    version = Column(String)                          # "1.0.0"
+    developer_id = Column(String)
     tenant_scope = Column(String, default="public")   # public|enterprise|private
     visibility = Column(Text, default="public")       # simple string rules
-    status = Column(String, index=True)               # DRAFT|APPROVED|REJECTED|LOCKED
-    created_ts = Column(Integer, index=True)
+    status = Column(String)                           # DRAFT|APPROVED|REJECTED|LOCKED
+    created_ts = Column(Integer)
     payload_json = Column(Text)                       # full workflow definition JSON
 
+    __table_args__ = (
+        Index("ix_workflow_versions_workflow_id_version", "workflow_id", "version"),
+        Index("ix_workflow_versions_developer_id_created_ts", "developer_id", "created_ts", "wf_ver_id"),
+    )
+
 class Submission(Base):
     __tablename__ = "submissions"
-    submission_id = Column(String, primary_key=True, index=True)
-    workflow_id = Column(String, index=True)
-    version = Column(String, index=True)
-    developer_id = Column(String, index=True)
-    status = Column(String, index=True)               # SUBMITTED|SECURITY_SCAN|HUMAN_REVIEW|APPROVED|REJECTED
-    created_ts = Column(Integer, index=True)
-    updated_ts = Column(Integer, index=True)
+    submission_id = Column(String, primary_key=True)
+    workflow_id = Column(String)
+    version = Column(String)
+    developer_id = Column(String)
+    status = Column(String)                           # SUBMITTED|SECURITY_SCAN|HUMAN_REVIEW|APPROVED|REJECTED
+    created_ts = Column(Integer)
+    updated_ts = Column(Integer)
     scan_report_json = Column(Text, default="")       # from security scan
     reviewer_notes = Column(Text, default="")
     decision_by = Column(String, default="")          # admin user id
 
+    __table_args__ = (
+        Index("ix_submissions_developer_id_updated_ts", "developer_id", "updated_ts", "submission_id"),
+        Index("ix_submissions_status_updated_ts", "status", "updated_ts"),    # admin review queue
+    )
+
 class VersionLock(Base):
     __tablename__ = "version_locks"
-    lock_id = Column(String, primary_key=True, index=True)
-    tenant_id = Column(String, index=True)
-    workflow_id = Column(String, index=True)
-    locked_version = Column(String, index=True)
+    lock_id = Column(String, primary_key=True)
+    tenant_id = Column(String)
+    workflow_id = Column(String)
+    locked_version = Column(String)
     is_locked = Column(Boolean, default=True)
     reason = Column(Text, default="")
-    updated_ts = Column(Integer, index=True)
+    updated_ts = Column(Integer)
+
+    __table_args__ = (
+        Index("ix_version_locks_tenant_id_workflow_id", "tenant_id", "workflow_id"),
+    )
 
 class TenantInstall(Base):
     __tablename__ = "tenant_installs"
-    install_id = Column(String, primary_key=True, index=True)
-    tenant_id = Column(String, index=True)
-    workflow_id = Column(String, index=True)
-    current_version = Column(String, index=True)
-    updated_ts = Column(Integer, index=True)
+    install_id = Column(String, primary_key=True)
+    tenant_id = Column(String)
+    workflow_id = Column(String)
+    current_version = Column(String)
+    updated_ts = Column(Integer)
+
+    __table_args__ = (
+        Index("ix_tenant_installs_tenant_id_workflow_id", "tenant_id", "workflow_id"),
+    )
 
 class InstallEvent(Base):
     __tablename__ = "install_events"
-    event_id = Column(String, primary_key=True, index=True)
-    tenant_id = Column(String, index=True)
-    workflow_id = Column(String, index=True)
-    version = Column(String, index=True)
-    action = Column(String, index=True)          # INSTALL | ROLLBACK
-    by_user_id = Column(String, index=True)
-    device_id = Column(String, index=True)
+    event_id = Column(String, primary_key=True)
+    tenant_id = Column(String)
+    workflow_id = Column(String)
+    version = Column(String)
+    action = Column(String)               # INSTALL | ROLLBACK
+    by_user_id = Column(String)
+    device_id = Column(String)
     reason = Column(Text, default="")
-    created_ts = Column(Integer, index=True)
+    created_ts = Column(Integer)
+
+    __table_args__ = (
+        Index("ix_install_events_tenant_id_workflow_id", "tenant_id", "workflow_id", "created_ts"),
+    )
+
+class CacheVersion(Base):
+    __tablename__ = "cache_versions"
+    name = Column(String, primary_key=True)      # e.g. "devices"
+    version = Column(Integer, default=0)         # bumped on every change, polled by other workers
@@ -0,0 +1,62 @@
+"""
+Keyset (cursor) pagination for the listing endpoints.
+
+A page is ordered by a unique key, e.g. (ts, audit_id) descending; the cursor
+is the key of the last row returned, so the next page starts with
+`WHERE ts <= :ts AND (ts, id) < (:ts, :id)` and is an index range scan instead of an
+OFFSET over everything before it. Each listing has a composite index whose
+trailing columns are its sort key ((tenant_id, ts, audit_id), ...), see the
+__table_args__ in db/models.py and db/wallet_models.py.
+
+Cursors are opaque to clients: urlsafe base64 of the JSON key values.
+"""
+from __future__ import annotations
+import base64
+import json
+from typing import Any, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, literal, tuple_
+from sqlalchemy.orm import Query
+
+MAX_PAGE = 200
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    raw = json.dumps(list(values), separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str, width: int) -> List[Any]:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    except (ValueError, TypeError):
+        raise ValueError("invalid cursor")
+    if not isinstance(values, list) or len(values) != width:
+        raise ValueError("invalid cursor")
+    return values
+
+
+def _after(cols: Sequence[Any], values: Sequence[Any], desc: bool):
+    # row-value comparison (SQLite >= 3.15, PostgreSQL); the extra bound on the
+    # leading column keeps the planner on the index range instead of an OR scan
+    key, bound = tuple_(*cols), tuple_(*[literal(v) for v in values])
+    if desc:
+        return and_(cols[0] <= values[0], key < bound)
+    return and_(cols[0] >= values[0], key > bound)
+
+
+def keyset_page(q: Query, cols: Sequence[Any], cursor: Optional[str] = None, limit: int = 50,
+                desc: bool = True) -> Tuple[List[Any], Optional[str]]:
+    """
+    One page of `q` ordered by `cols` (the last one must be unique), plus the
+    cursor of the next page (None on the last page). Raises ValueError on a bad cursor.
+    """
+    limit = max(1, min(int(limit), MAX_PAGE))
+    if cursor:
+        q = q.filter(_after(cols, decode_cursor(cursor, len(cols)), desc))
+    q = q.order_by(*[c.desc() if desc else c.asc() for c in cols])
+    rows = q.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor([getattr(rows[-1], c.key) for c in cols])
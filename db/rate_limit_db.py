@@ -1,10 +1,14 @@
 from __future__ import annotations
-import json, time, uuid
+import json, logging, threading, time, uuid
 from pathlib import Path
-from typing import Dict, Any, Tuple
+from typing import Dict, Any, List, Tuple
 from sqlalchemy.orm import Session
+from api.config import RATE_LIMIT_BACKEND, RATE_PERSIST_SEC, RATE_SUSPENSION_REFRESH_SEC
 from db.database import SessionLocal
-from db.models import RateCounter, Suspension
+from db.models import Suspension
+from db.rate_limiter import MemoryBackend, SharedBackend
+
+log = logging.getLogger(__name__)
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 POLICY_PATH = BASE_DIR / "registry" / "rate_limit_policy.json"
@@ -12,15 +16,23 @@ POLICY_PATH = BASE_DIR / "registry" / "rate_limit_policy.json"
 def now() -> int:
     return int(time.time())
 
+_DEFAULT_POLICY = {
+    "tenant": {"per_minute": 120, "per_hour": 2000},
+    "device": {"per_minute": 60, "per_hour": 800},
+    "route_costs": {},
+    "auto_suspend": {"enabled": True, "minutes": 10, "threshold_429_per_5min": 20}
+}
+_policy_cache: Dict[str, Any] = {"mtime": None, "data": None}
+
 def load_policy() -> Dict[str, Any]:
+    # re-parsed only when the file changes on disk
     if not POLICY_PATH.exists():
-        return {
-            "tenant": {"per_minute": 120, "per_hour": 2000},
-            "device": {"per_minute": 60, "per_hour": 800},
-            "route_costs": {},
-            "auto_suspend": {"enabled": True, "minutes": 10, "threshold_429_per_5min": 20}
-        }
-    return json.loads(POLICY_PATH.read_text(encoding="utf-8"))
+        return _DEFAULT_POLICY
+    mtime = POLICY_PATH.stat().st_mtime_ns
+    if _policy_cache["mtime"] != mtime:
+        _policy_cache["data"] = json.loads(POLICY_PATH.read_text(encoding="utf-8"))
+        _policy_cache["mtime"] = mtime
+    return _policy_cache["data"]
 
 def _db():
     db = SessionLocal()
@@ -52,78 +64,154 @@ def suspend(db: Session, tenant_id: str, device_id: str, minutes: int, reason: s
     )
     db.add(row)
     db.commit()
+    RATE_LIMITER.suspensions.add(tenant_id, device_id, until_ts, reason)
     return sid
 
 def _key(prefix: str, tenant_id: str, device_id: str, route: str, window_sec: int) -> str:
     # Keep keys stable and simple
     return f"{prefix}:{tenant_id}:{device_id}:{route}:{window_sec}"
 
-def _touch_counter(db: Session, key: str, window_sec: int, cost: int) -> int:
-    ts = now()
-    window_start = ts - (ts % window_sec)
+class SuspensionCache:
+    """Active suspensions by (tenant_id, device_id), reloaded every RATE_SUSPENSION_REFRESH_SEC."""
 
-    row = db.query(RateCounter).filter(RateCounter.key == key).first()
-    if not row:
-        row = RateCounter(key=key, window_start=window_start, window_sec=window_sec, count=0)
-        db.add(row)
+    def __init__(self):
+        self._active: Dict[Tuple[str, str], Tuple[int, str]] = {}
+        self._lock = threading.Lock()
 
-    # reset if window changed
-    if row.window_start != window_start:
-        row.window_start = window_start
-        row.count = 0
+    def refresh(self, db: Session) -> None:
+        ts = now()
+        active: Dict[Tuple[str, str], Tuple[int, str]] = {}
+        for r in db.query(Suspension).filter(Suspension.until_ts > ts).all():
+            k = (r.tenant_id, r.device_id)
+            if k not in active or r.until_ts > active[k][0]:
+                active[k] = (r.until_ts, r.reason or "")
+        with self._lock:
+            self._active = active
 
-    row.count += cost
-    db.commit()
-    return row.count
+    def add(self, tenant_id: str, device_id: str, until_ts: int, reason: str) -> None:
+        with self._lock:
+            cur = self._active.get((tenant_id, device_id))
+            if not cur or until_ts > cur[0]:
+                self._active[(tenant_id, device_id)] = (until_ts, reason)
 
-def check_rate_limit(tenant_id: str, device_id: str, route: str, cost: int = 1) -> Dict[str, Any]:
-    pol = load_policy()
+    def get(self, tenant_id: str, device_id: str, ts: int) -> Tuple[int, str] | None:
+        item = self._active.get((tenant_id, device_id))
+        if item and item[0] > ts:
+            return item
+        return None
 
-    # normalize route buckets
-    route_bucket = route
-    if route.startswith("POST /skills/"):
-        route_bucket = "POST /skills"
-    if route.startswith("POST /rag/"):
-        route_bucket = "POST /rag"
+class RateLimiter:
+    """
+    Counters live in the configured backend (db/rate_limiter.py); suspensions
+    are served from memory. A daemon thread persists memory counters and
+    reloads suspensions in the background.
+    """
 
-    # apply route cost override
-    route_costs = pol.get("route_costs", {})
-    cost = int(route_costs.get(route_bucket, cost))
+    def __init__(self, backend: str = RATE_LIMIT_BACKEND):
+        self.backend = SharedBackend() if backend == "shared" else MemoryBackend()
+        self.suspensions = SuspensionCache()
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+
+    def start(self) -> None:
+        with self._start_lock:
+            if self._thread and self._thread.is_alive():
+                return
+            db = SessionLocal()
+            try:
+                if isinstance(self.backend, MemoryBackend):
+                    self.backend.load(db, time.time())
+                self.suspensions.refresh(db)
+            finally:
+                db.close()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="rate-limiter", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        interval = min(RATE_PERSIST_SEC, RATE_SUSPENSION_REFRESH_SEC)
+        while not self._stop.wait(interval):
+            try:
+                self.flush()
+            except Exception:
+                log.exception("rate limiter maintenance failed")
+
+    def flush(self) -> None:
+        db = SessionLocal()
+        try:
+            if isinstance(self.backend, MemoryBackend):
+                self.backend.persist(db)
+            self.suspensions.refresh(db)
+        finally:
+            db.close()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.flush()
+
+    def _headers(self, limits: List[int], counts: List[int], windows: List[Tuple[str, int]], ts: float) -> Dict[str, str]:
+        # report the counter closest to its limit
+        i = min(range(len(limits)), key=lambda j: limits[j] - counts[j])
+        return {
+            "X-RateLimit-Limit": str(limits[i]),
+            "X-RateLimit-Remaining": str(max(0, limits[i] - counts[i])),
+            "X-RateLimit-Reset": str(max(1, self.backend.reset(ts, windows[i][1]) - int(ts))),
+        }
+
+    def check(self, pol: Dict[str, Any], tenant_id: str, device_id: str, route_bucket: str, cost: int) -> Dict[str, Any]:
+        if self._thread is None:
+            self.start()
+        ts = time.time()
 
-    db = SessionLocal()
-    try:
         # suspension check
-        blocked, until_ts, reason = is_suspended(db, tenant_id, device_id)
-        if blocked:
-            return {"allowed": False, "retry_after": max(1, until_ts - now()), "reason": f"suspended: {reason}"}
+        susp = self.suspensions.get(tenant_id, device_id, int(ts))
+        if susp:
+            until_ts, reason = susp
+            return {"allowed": False, "retry_after": max(1, until_ts - int(ts)), "reason": f"suspended: {reason}"}
 
         # thresholds
-        t_min = int(pol["tenant"]["per_minute"])
-        t_hr = int(pol["tenant"]["per_hour"])
-        d_min = int(pol["device"]["per_minute"])
-        d_hr = int(pol["device"]["per_hour"])
-
-        # counters
-        tenant_min_key = _key("tenant", tenant_id, "all", route_bucket, 60)
-        tenant_hr_key  = _key("tenant", tenant_id, "all", route_bucket, 3600)
-        dev_min_key    = _key("device", tenant_id, device_id, route_bucket, 60)
-        dev_hr_key     = _key("device", tenant_id, device_id, route_bucket, 3600)
-
-        tenant_min = _touch_counter(db, tenant_min_key, 60, cost)
-        tenant_hr  = _touch_counter(db, tenant_hr_key, 3600, cost)
-        dev_min    = _touch_counter(db, dev_min_key, 60, cost)
-        dev_hr     = _touch_counter(db, dev_hr_key, 3600, cost)
+        limits = [
+            int(pol["tenant"]["per_minute"]),
+            int(pol["tenant"]["per_hour"]),
+            int(pol["device"]["per_minute"]),
+            int(pol["device"]["per_hour"]),
+        ]
+        windows = [
+            (_key("tenant", tenant_id, "all", route_bucket, 60), 60),
+            (_key("tenant", tenant_id, "all", route_bucket, 3600), 3600),
+            (_key("device", tenant_id, device_id, route_bucket, 60), 60),
+            (_key("device", tenant_id, device_id, route_bucket, 3600), 3600),
+        ]
+
+        if isinstance(self.backend, SharedBackend):
+            db = SessionLocal()
+            try:
+                counts = self.backend.hit_db(db, windows, cost, ts)
+            finally:
+                db.close()
+        else:
+            counts = self.backend.hit(windows, cost, ts)
+        tenant_min, tenant_hr, dev_min, dev_hr = counts
+        headers = self._headers(limits, counts, windows, ts)
 
         # enforce
-        if tenant_min > t_min or tenant_hr > t_hr or dev_min > d_min or dev_hr > d_hr:
+        if any(c > lim for c, lim in zip(counts, limits)):
             # auto suspend if configured (quick protection)
             auto = pol.get("auto_suspend", {})
             if auto.get("enabled", True):
                 mins = int(auto.get("minutes", 10))
-                suspend(db, tenant_id, device_id, mins, "rate_limit_exceeded")
-                return {"allowed": False, "retry_after": mins * 60, "reason": "rate_limited_and_suspended"}
+                db = SessionLocal()
+                try:
+                    suspend(db, tenant_id, device_id, mins, "rate_limit_exceeded")
+                finally:
+                    db.close()
+                return {"allowed": False, "retry_after": mins * 60, "reason": "rate_limited_and_suspended", "headers": headers}
 
-            return {"allowed": False, "retry_after": 60, "reason": "rate_limited"}
+            return {"allowed": False, "retry_after": 60, "reason": "rate_limited", "headers": headers}
 
         return {
             "allowed": True,
@@ -131,10 +219,27 @@ def check_rate_limit(tenant_id: str, device_id: str, route: str, cost: int = 1)
             "tenant_hr": tenant_hr,
             "device_min": dev_min,
             "device_hr": dev_hr,
-            "cost": cost
+            "cost": cost,
+            "headers": headers
         }
-    finally:
-        db.close()
+
+RATE_LIMITER = RateLimiter()
+
+def check_rate_limit(tenant_id: str, device_id: str, route: str, cost: int = 1) -> Dict[str, Any]:
+    pol = load_policy()
+
+    # normalize route buckets
+    route_bucket = route
+    if route.startswith("POST /skills/"):
+        route_bucket = "POST /skills"
+    if route.startswith("POST /rag/"):
+        route_bucket = "POST /rag"
+
+    # apply route cost override
+    route_costs = pol.get("route_costs", {})
+    cost = int(route_costs.get(route_bucket, cost))
+
+    return RATE_LIMITER.check(pol, tenant_id, device_id, route_bucket, cost)
 
 def list_suspensions(limit: int = 50) -> list[dict]:
     db = SessionLocal()
@@ -160,6 +265,7 @@ def clear_suspension(suspend_id: str) -> bool:
             return False
         db.delete(row)
         db.commit()
+        RATE_LIMITER.suspensions.refresh(db)
         return True
     finally:
         db.close()
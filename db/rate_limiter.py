@@ -0,0 +1,151 @@
+"""
+Counter backends for db/rate_limit_db.check_rate_limit.
+
+Both take a list of (key, window_sec) and a cost, increment every counter and
+return the resulting counts in the same order.
+
+MemoryBackend  sliding-window counters kept in process memory
+               (estimate = current + previous * overlap), persisted to
+               rate_counters periodically so a restart keeps its windows.
+               Counters that no longer overlap the sliding window are evicted
+               from memory and from rate_counters on each persist.
+SharedBackend  fixed windows in rate_counters, all counters updated by a single
+               INSERT .. ON CONFLICT DO UPDATE .. RETURNING statement.
+"""
+from __future__ import annotations
+import threading
+import time
+from typing import Dict, List, Tuple
+
+from sqlalchemy import case, delete
+from sqlalchemy.orm import Session
+
+from db.database import dialect_insert
+from db.models import RateCounter
+
+Window = Tuple[str, int]   # (key, window_sec)
+
+
+def window_start(ts: float, window_sec: int) -> int:
+    t = int(ts)
+    return t - (t % window_sec)
+
+
+class MemoryBackend:
+    name = "memory"
+
+    def __init__(self):
+        # key -> [window_sec, window_start, count, prev_count]
+        self._c: Dict[str, List[int]] = {}
+        self._dirty: set[str] = set()
+        self._lock = threading.Lock()
+
+    def _roll(self, key: str, window_sec: int, ws: int) -> List[int]:
+        c = self._c.get(key)
+        if c is None:
+            c = [window_sec, ws, 0, 0]
+            self._c[key] = c
+        elif c[1] != ws:
+            # previous window only counts if it is the one right before this one
+            c[3] = c[2] if c[1] == ws - window_sec else 0
+            c[1] = ws
+            c[2] = 0
+        return c
+
+    def hit(self, windows: List[Window], cost: int, ts: float) -> List[int]:
+        out = []
+        with self._lock:
+            for key, window_sec in windows:
+                ws = window_start(ts, window_sec)
+                c = self._roll(key, window_sec, ws)
+                c[2] += cost
+                self._dirty.add(key)
+                overlap = 1.0 - (ts - ws) / window_sec
+                out.append(c[2] + int(c[3] * overlap))
+        return out
+
+    def evict(self, ts: float) -> int:
+        """Drop counters whose window started more than one window length ago."""
+        with self._lock:
+            stale = [k for k, c in self._c.items() if c[1] < window_start(ts, c[0]) - c[0]]
+            for k in stale:
+                del self._c[k]
+                self._dirty.discard(k)
+        return len(stale)
+
+    def persist(self, db: Session, ts: float | None = None) -> int:
+        """Evict expired windows, then write dirty counters to rate_counters (current window only)."""
+        ts = time.time() if ts is None else ts
+        self.evict(ts)
+        with self._lock:
+            rows = [{"key": k, "window_start": self._c[k][1], "window_sec": self._c[k][0], "count": self._c[k][2]}
+                    for k in self._dirty if k in self._c]
+            self._dirty.clear()
+        # a row is dead once neither its window nor the one after it is current
+        db.execute(delete(RateCounter).where(RateCounter.window_start + 2 * RateCounter.window_sec <= int(ts)))
+        if not rows:
+            db.commit()
+            return 0
+        stmt = dialect_insert(RateCounter).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[RateCounter.key],
+            set_={
+                # other workers may have persisted the same window: keep the larger count
+                "count": case(
+                    (RateCounter.window_start == stmt.excluded.window_start,
+                     case((RateCounter.count > stmt.excluded.count, RateCounter.count), else_=stmt.excluded.count)),
+                    else_=stmt.excluded.count,
+                ),
+                "window_start": stmt.excluded.window_start,
+                "window_sec": stmt.excluded.window_sec,
+            },
+        )
+        db.execute(stmt)
+        db.commit()
+        return len(rows)
+
+    def load(self, db: Session, ts: float) -> int:
+        """Seed counters from rate_counters rows that are still current or previous."""
+        n = 0
+        with self._lock:
+            for r in db.query(RateCounter).all():
+                if not r.window_sec:
+                    continue
+                ws = window_start(ts, r.window_sec)
+                if r.window_start == ws:
+                    self._c[r.key] = [r.window_sec, ws, int(r.count or 0), 0]
+                elif r.window_start == ws - r.window_sec:
+                    self._c[r.key] = [r.window_sec, ws, 0, int(r.count or 0)]
+                else:
+                    continue
+                n += 1
+        return n
+
+    def reset(self, ts: float, window_sec: int) -> int:
+        return window_start(ts, window_sec) + window_sec
+
+
+class SharedBackend:
+    name = "shared"
+
+    def hit_db(self, db: Session, windows: List[Window], cost: int, ts: float) -> List[int]:
+        rows = [{"key": k, "window_start": window_start(ts, w), "window_sec": w, "count": cost} for k, w in windows]
+        stmt = dialect_insert(RateCounter).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[RateCounter.key],
+            set_={
+                # same window: add; window moved on: restart from this cost
+                "count": case(
+                    (RateCounter.window_start == stmt.excluded.window_start, RateCounter.count + stmt.excluded.count),
+                    else_=stmt.excluded.count,
+                ),
+                "window_start": stmt.excluded.window_start,
+                "window_sec": stmt.excluded.window_sec,
+            },
+        ).returning(RateCounter.key, RateCounter.count)
+        counts = {k: c for k, c in db.execute(stmt).all()}
+        db.commit()
+        return [int(counts.get(k, cost)) for k, _ in windows]
+
+    def reset(self, ts: float, window_sec: int) -> int:
+        return window_start(ts, window_sec) + window_sec
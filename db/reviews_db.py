@@ -1,10 +1,11 @@
 from __future__ import annotations
 import uuid
 import time
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from sqlalchemy.orm import Session
 from db.database import SessionLocal
 from db.models import Review
+from db.pagination import keyset_page
 
 def now_iso() -> str:
     return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
@@ -46,19 +47,28 @@ def add_review_db(payload: Dict[str, Any]) -> Dict[str, Any]:
     finally:
         db.close()
 
-def list_reviews_db(skill_id: str | None = None) -> List[Dict[str, Any]]:
+def page_reviews_db(skill_id: str | None = None, limit: int = 200, cursor: Optional[str] = None,
+                    since: str | None = None, until: str | None = None) -> Dict[str, Any]:
+    """Newest first, keyset-paginated on (ts, review_id); pass next_cursor back for the next page."""
     db: Session = SessionLocal()
     try:
         q = db.query(Review)
         if skill_id:
             q = q.filter(Review.skill_id == skill_id)
-        rows = q.order_by(Review.ts.desc()).limit(200).all()
-        return [{
+        if since:
+            q = q.filter(Review.ts >= since)
+        if until:
+            q = q.filter(Review.ts <= until)
+        rows, next_cursor = keyset_page(q, (Review.ts, Review.review_id), cursor, limit)
+        return {"reviews": [{
             "review_id": r.review_id, "ts": r.ts, "skill_id": r.skill_id,
             "tenant_id": r.tenant_id, "user_id": r.user_id,
             "rating": r.rating, "text": r.text,
             "verified": r.verified, "abuse_score": r.abuse_score,
             "developer_response": r.developer_response
-        } for r in rows]
+        } for r in rows], "next_cursor": next_cursor}
     finally:
         db.close()
+
+def list_reviews_db(skill_id: str | None = None) -> List[Dict[str, Any]]:
+    return page_reviews_db(skill_id)["reviews"]
@@ -0,0 +1,100 @@
+from __future__ import annotations
+from typing import Dict, Optional
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from db.database import SessionLocal, dialect_insert
+from db.wallet_models import Wallet
+
+def _insert_if_missing(db: Session, tenant_id: str, balance: int) -> None:
+    stmt = dialect_insert(Wallet).values(tenant_id=tenant_id, balance=int(balance))
+    db.execute(stmt.on_conflict_do_nothing(index_elements=[Wallet.tenant_id]))
+
+def _decrement(db: Session, tenant_id: str, credits: int) -> bool:
+    # single conditional UPDATE: atomic under concurrent workers, no read-modify-write
+    res = db.execute(
+        update(Wallet)
+        .where(Wallet.tenant_id == tenant_id, Wallet.balance >= credits)
+        .values(balance=Wallet.balance - credits)
+    )
+    return res.rowcount == 1
+
+def charge_in(db: Session, tenant_id: str, credits: int, starter: Optional[int] = None) -> bool:
+    """
+    Conditional decrement inside the caller's transaction (no commit).
+    Returns False on insufficient funds. With `starter`, a missing wallet is
+    created with that balance first.
+    """
+    credits = int(credits)
+    if _decrement(db, tenant_id, credits):
+        return True
+    if starter is None:
+        return False
+    _insert_if_missing(db, tenant_id, starter)
+    return _decrement(db, tenant_id, credits)
+
+def charge(tenant_id: str, credits: int, starter: Optional[int] = None) -> bool:
+    db = SessionLocal()
+    try:
+        ok = charge_in(db, tenant_id, credits, starter=starter)
+        if ok:
+            db.commit()
+        else:
+            db.rollback()
+        return ok
+    finally:
+        db.close()
+
+def get_balance(tenant_id: str) -> Optional[int]:
+    db = SessionLocal()
+    try:
+        row = db.query(Wallet.balance).filter(Wallet.tenant_id == tenant_id).first()
+        return int(row[0]) if row else None
+    finally:
+        db.close()
+
+def ensure_wallet(tenant_id: str, starter: int) -> int:
+    db = SessionLocal()
+    try:
+        _insert_if_missing(db, tenant_id, starter)
+        db.commit()
+        row = db.query(Wallet.balance).filter(Wallet.tenant_id == tenant_id).first()
+        return int(row[0])
+    finally:
+        db.close()
+
+def set_balances(balances: Dict[str, int], overwrite: bool = True) -> int:
+    """Bulk import (used by migrations). Returns the number of wallets written."""
+    if not balances:
+        return 0
+    db = SessionLocal()
+    try:
+        rows = [{"tenant_id": t, "balance": int(b)} for t, b in balances.items()]
+        stmt = dialect_insert(Wallet).values(rows)
+        if overwrite:
+            stmt = stmt.on_conflict_do_update(index_elements=[Wallet.tenant_id], set_={"balance": stmt.excluded.balance})
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=[Wallet.tenant_id])
+        n = db.execute(stmt).rowcount
+        db.commit()
+        return n
+    finally:
+        db.close()
+
+def credit(tenant_id: str, credits: int) -> int:
+    """Top up (creates the wallet at 0 if missing). Returns the new balance."""
+    db = SessionLocal()
+    try:
+        _insert_if_missing(db, tenant_id, 0)
+        db.execute(update(Wallet).where(Wallet.tenant_id == tenant_id).values(balance=Wallet.balance + int(credits)))
+        db.commit()
+        return int(db.query(Wallet.balance).filter(Wallet.tenant_id == tenant_id).scalar())
+    finally:
+        db.close()
+
+def all_balances() -> Dict[str, int]:
+    db = SessionLocal()
+    try:
+        return {t: int(b or 0) for t, b in db.query(Wallet.tenant_id, Wallet.balance).all()}
+    finally:
+        db.close()
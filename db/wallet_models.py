@@ -1,22 +1,29 @@
-from sqlalchemy import Column, String, Integer, Boolean, Text, BigInteger
+from sqlalchemy import Column, String, Integer, Boolean, Text, BigInteger, Index
 from db.database import Base
 
 class Wallet(Base):
     __tablename__ = "wallets"
-    tenant_id = Column(String, primary_key=True, index=True)
+    tenant_id = Column(String, primary_key=True)
     balance = Column(Integer, default=0)
 
 class UsageEvent(Base):
     __tablename__ = "usage_events"
-    id = Column(String, primary_key=True, index=True)
-    ts = Column(BigInteger, index=True)
-    tenant_id = Column(String, index=True)
-    user_id = Column(String, index=True)
-    device_id = Column(String, index=True, nullable=True)
+    id = Column(String, primary_key=True)
+    ts = Column(BigInteger)
+    tenant_id = Column(String)
+    user_id = Column(String)
+    device_id = Column(String, nullable=True)
 
-    action = Column(String, index=True)      # SKILL_RUN / RAG_QUERY / WORKFLOW_RUN / CHAT
+    action = Column(String)                  # SKILL_RUN / RAG_QUERY / WORKFLOW_RUN / CHAT
     units = Column(Integer, default=1)
     credits = Column(Integer, default=0)
     ok = Column(Boolean, default=True)
-    ref_id = Column(String, index=True, nullable=True)
+    ref_id = Column(String, nullable=True)
     error = Column(Text, nullable=True)
+
+    # keyset pagination (db/pagination.py): filter columns first, sort key last
+    __table_args__ = (
+        Index("ix_usage_events_ts_id", "ts", "id"),
+        Index("ix_usage_events_tenant_id_ts", "tenant_id", "ts", "id"),
+        Index("ix_usage_events_action_ts", "action", "ts", "id"),
+    )
@@ -1,9 +1,10 @@
 from __future__ import annotations
 import json, time, uuid
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
 from sqlalchemy.orm import Session
 
 from db.models import WorkflowVersion, Submission, VersionLock
+from db.pagination import keyset_page
 
 def now() -> int:
     return int(time.time())
@@ -57,18 +58,21 @@ def submit_workflow(db: Session, developer_id: str, workflow_id: str, version: s
     db.commit()
     return {"submission_id": sub.submission_id, "status": sub.status}
 
-def dev_list_workflows(db: Session, developer_id: str) -> List[Dict[str, Any]]:
-    rows = db.query(WorkflowVersion).filter(WorkflowVersion.developer_id == developer_id).order_by(WorkflowVersion.created_ts.desc()).all()
+def dev_list_workflows(db: Session, developer_id: str, limit: int = 50, cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    # newest first, keyset-paginated: returns (page, next_cursor)
+    q = db.query(WorkflowVersion).filter(WorkflowVersion.developer_id == developer_id)
+    rows, next_cursor = keyset_page(q, (WorkflowVersion.created_ts, WorkflowVersion.wf_ver_id), cursor, limit)
     out = []
     for r in rows:
         out.append({
             "workflow_id": r.workflow_id, "version": r.version, "status": r.status,
             "tenant_scope": r.tenant_scope, "visibility": r.visibility, "created_ts": r.created_ts
         })
-    return out
+    return out, next_cursor
 
-def dev_list_submissions(db: Session, developer_id: str) -> List[Dict[str, Any]]:
-    rows = db.query(Submission).filter(Submission.developer_id == developer_id).order_by(Submission.updated_ts.desc()).all()
+def dev_list_submissions(db: Session, developer_id: str, limit: int = 50, cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    q = db.query(Submission).filter(Submission.developer_id == developer_id)
+    rows, next_cursor = keyset_page(q, (Submission.updated_ts, Submission.submission_id), cursor, limit)
     return [{
         "submission_id": r.submission_id,
         "workflow_id": r.workflow_id,
@@ -77,7 +81,7 @@ def dev_list_submissions(db: Session, developer_id: str) -> List[Dict[str, Any]]
         "created_ts": r.created_ts,
         "updated_ts": r.updated_ts,
         "reviewer_notes": r.reviewer_notes
-    } for r in rows]
+    } for r in rows], next_cursor
 
 def admin_queue(db: Session, limit: int = 50) -> List[Dict[str, Any]]:
     rows = db.query(Submission).filter(Submission.status.in_(["SUBMITTED","SECURITY_SCAN","HUMAN_REVIEW"])).order_by(Submission.updated_ts.asc()).limit(min(limit,200)).all()
@@ -0,0 +1,171 @@
+"""
+Insert / query benchmark for the schema migrations (db/migrations.py).
+
+Builds two scratch SQLite databases with the same tables:
+  - legacy:   one single-column index per column (the old `index=True` models)
+  - migrated: the result of db/migrations.migrate()
+then times bulk inserts into the write-heavy tables and the lookups the API
+runs per request (suspension check, install history, version lock / current
+install, audit page for one tenant), and prints each query's plan.
+
+    python deployment/benchmark_db.py --rows 50000 --queries 2000
+"""
+import argparse
+import json
+import random
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import create_engine, text  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from db.database import Base  # noqa: E402
+from db.migrations import LEGACY_SINGLE_COLUMN_INDEXES, migrate  # noqa: E402
+from db.models import AuditLog, InstallEvent, Suspension, TenantInstall, VersionLock  # noqa: E402
+from db.wallet_models import UsageEvent  # noqa: E402
+from db import install_db, rate_limit_db  # noqa: E402
+from db.pagination import keyset_page  # noqa: E402
+
+TENANTS = 200
+DEVICES = 20
+WORKFLOWS = 50
+
+
+def _legacy_schema(eng):
+    Base.metadata.create_all(bind=eng)
+    with eng.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            for ix in table.indexes:
+                if not ix.unique:
+                    conn.execute(text(f'DROP INDEX IF EXISTS "{ix.name}"'))
+        for t, cols in LEGACY_SINGLE_COLUMN_INDEXES.items():
+            for c in cols:
+                conn.execute(text(f'CREATE INDEX IF NOT EXISTS "ix_{t}_{c}" ON "{t}" ("{c}")'))
+        conn.execute(text('CREATE INDEX IF NOT EXISTS "ix_suspensions_until_ts" ON "suspensions" ("until_ts")'))
+
+
+def _migrated_schema(eng):
+    migrate(bind=eng)
+
+
+def _rows(n, rnd):
+    t0 = 1_700_000_000
+    for i in range(n):
+        tenant = f"t{rnd.randrange(TENANTS)}"
+        device = f"d{rnd.randrange(DEVICES)}"
+        wf = f"wf{rnd.randrange(WORKFLOWS)}"
+        ts = t0 + i
+        iso = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(ts))
+        yield [
+            AuditLog(audit_id=str(uuid.uuid4()), ts=iso, tenant_id=tenant, user_id="u1", device_id=device,
+                     ip="10.0.0.1", route="POST /skills/summarize", action="SKILL_RUN", target_id="summarize",
+                     ok=True, credits=1),
+            UsageEvent(id=str(uuid.uuid4()), ts=ts, tenant_id=tenant, user_id="u1", device_id=device,
+                       action="SKILL_RUN", units=1, credits=1, ok=True, ref_id="summarize"),
+            InstallEvent(event_id=str(uuid.uuid4()), tenant_id=tenant, workflow_id=wf, version="1.0.0",
+                         action="INSTALL", by_user_id="u1", device_id=device, created_ts=ts),
+        ]
+
+
+def _load(Session, rows, rnd):
+    db = Session()
+    t0 = time.perf_counter()
+    batch = 0
+    for objs in _rows(rows, rnd):
+        db.add_all(objs)
+        batch += 1
+        if batch == 500:
+            db.commit()
+            batch = 0
+    db.commit()
+    dt = time.perf_counter() - t0
+    # small lookup tables
+    for t in range(TENANTS):
+        for w in range(WORKFLOWS):
+            db.add(TenantInstall(install_id=str(uuid.uuid4()), tenant_id=f"t{t}", workflow_id=f"wf{w}",
+                                 current_version="1.0.0", updated_ts=0))
+            if w % 5 == 0:
+                db.add(VersionLock(lock_id=str(uuid.uuid4()), tenant_id=f"t{t}", workflow_id=f"wf{w}",
+                                   locked_version="1.0.0", is_locked=True, updated_ts=0))
+        for d in range(0, DEVICES, 4):
+            db.add(Suspension(suspend_id=str(uuid.uuid4()), tenant_id=f"t{t}", device_id=f"d{d}",
+                              until_ts=int(time.time()) + rnd.randrange(-3600, 3600), reason="bench"))
+    db.commit()
+    db.close()
+    return {"rows_per_table": rows, "seconds": round(dt, 3), "inserts_per_sec": round(3 * rows / dt, 1)}
+
+
+def _queries(Session, n, rnd):
+    def tenant():
+        return f"t{rnd.randrange(TENANTS)}"
+
+    def wf():
+        return f"wf{rnd.randrange(WORKFLOWS)}"
+
+    cases = {
+        "is_suspended": lambda db: rate_limit_db.is_suspended(db, tenant(), f"d{rnd.randrange(DEVICES)}"),
+        "install_history": lambda db: install_db.history(db, tenant(), wf(), limit=20),
+        "version_lock": lambda db: install_db._get_lock(db, tenant(), wf()),
+        "current_install": lambda db: install_db.get_current(db, tenant(), wf()),
+        "audit_tenant_page": lambda db: keyset_page(db.query(AuditLog).filter(AuditLog.tenant_id == tenant()),
+                                                    (AuditLog.ts, AuditLog.audit_id), None, 50),
+    }
+    out = {}
+    db = Session()
+    try:
+        for name, fn in cases.items():
+            fn(db)   # warm up
+            t0 = time.perf_counter()
+            for _ in range(n):
+                fn(db)
+            out[name] = round((time.perf_counter() - t0) / n * 1e6, 1)
+    finally:
+        db.close()
+    return out
+
+
+PLANS = {
+    "is_suspended": "SELECT * FROM suspensions WHERE tenant_id='t1' AND device_id='d1' AND until_ts > 0 ORDER BY until_ts DESC LIMIT 1",
+    "install_history": "SELECT * FROM install_events WHERE tenant_id='t1' AND workflow_id='wf1' ORDER BY created_ts DESC LIMIT 20",
+    "version_lock": "SELECT * FROM version_locks WHERE tenant_id='t1' AND workflow_id='wf1' LIMIT 1",
+    "current_install": "SELECT * FROM tenant_installs WHERE tenant_id='t1' AND workflow_id='wf1' LIMIT 1",
+    "audit_tenant_page": "SELECT * FROM audit_logs WHERE tenant_id='t1' ORDER BY ts DESC, audit_id DESC LIMIT 51",
+}
+
+
+def _plans(eng):
+    with eng.connect() as conn:
+        return {name: "; ".join(r[3] for r in conn.execute(text("EXPLAIN QUERY PLAN " + sql)))
+                for name, sql in PLANS.items()}
+
+
+def bench(schema, rows, queries, seed):
+    rnd = random.Random(seed)
+    with tempfile.TemporaryDirectory() as d:
+        eng = create_engine(f"sqlite:///{Path(d) / 'bench.sqlite3'}")
+        {"legacy": _legacy_schema, "migrated": _migrated_schema}[schema](eng)
+        Session = sessionmaker(bind=eng, autoflush=False)
+        with eng.connect() as conn:
+            n_indexes = conn.execute(text("SELECT COUNT(*) FROM sqlite_master WHERE type='index'")).scalar()
+        out = {"schema": schema, "indexes": n_indexes, "insert": _load(Session, rows, rnd)}
+        with eng.begin() as conn:
+            conn.execute(text("ANALYZE"))
+        out["query_us"] = _queries(Session, queries, rnd)
+        out["plans"] = _plans(eng)
+        eng.dispose()
+    return out
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=50000)
+    ap.add_argument("--queries", type=int, default=2000)
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+    for schema in ("legacy", "migrated"):
+        print(json.dumps(bench(schema, args.rows, args.queries, args.seed), indent=2))
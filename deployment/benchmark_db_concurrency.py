@@ -0,0 +1,143 @@
+"""
+Concurrency benchmark for the SQLite engine profiles (db/database.py).
+
+Each profile gets a scratch database; N processes x T threads then run a
+mixed workload for a fixed time:
+  - write: insert an audit row + decrement a wallet balance, one transaction
+  - read:  one keyset page of a tenant's audit log
+and the script reports throughput, latency percentiles and how many
+operations failed with "database is locked".
+
+    python deployment/benchmark_db_concurrency.py --procs 4 --threads 8 --seconds 10 --writes 0.5
+    python deployment/benchmark_db_concurrency.py --url postgresql+psycopg2://...   # one run against a server db
+"""
+import argparse
+import json
+import random
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from multiprocessing import Pool
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import update  # noqa: E402
+from sqlalchemy.exc import OperationalError  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from db.database import make_engine, SQLITE_PROFILES  # noqa: E402
+from db.migrations import migrate  # noqa: E402
+from db.models import AuditLog  # noqa: E402
+from db.wallet_models import Wallet  # noqa: E402
+from db.pagination import keyset_page  # noqa: E402
+
+TENANTS = 50
+
+
+def _write(db, rnd):
+    tenant = f"t{rnd.randrange(TENANTS)}"
+    db.add(AuditLog(audit_id=str(uuid.uuid4()), ts=time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                    tenant_id=tenant, user_id="u1", device_id="d1", ip="10.0.0.1", route="POST /skills/summarize",
+                    action="SKILL_RUN", target_id="summarize", ok=True, credits=1))
+    db.execute(update(Wallet).where(Wallet.tenant_id == tenant).values(balance=Wallet.balance - 1))
+    db.commit()
+
+
+def _read(db, rnd):
+    q = db.query(AuditLog).filter(AuditLog.tenant_id == f"t{rnd.randrange(TENANTS)}")
+    keyset_page(q, (AuditLog.ts, AuditLog.audit_id), None, 50)
+    db.rollback()
+
+
+def _thread(Session, deadline, write_ratio, seed, out):
+    rnd = random.Random(seed)
+    lat, locked, errors = [], 0, 0
+    db = Session()
+    try:
+        while time.time() < deadline:
+            fn = _write if rnd.random() < write_ratio else _read
+            t0 = time.perf_counter()
+            try:
+                fn(db, rnd)
+                lat.append(time.perf_counter() - t0)
+            except OperationalError as e:
+                db.rollback()
+                if "locked" in str(e) or "busy" in str(e):
+                    locked += 1
+                else:
+                    errors += 1
+    finally:
+        db.close()
+    out.append((lat, locked, errors))
+
+
+def _proc(args):
+    url, profile, threads, seconds, write_ratio, seed = args
+    eng = make_engine(url, profile=profile, pool_size=threads, max_overflow=0)
+    Session = sessionmaker(bind=eng, autoflush=False)
+    deadline = time.time() + seconds
+    out = []
+    ts = [threading.Thread(target=_thread, args=(Session, deadline, write_ratio, seed * 1000 + i, out))
+          for i in range(threads)]
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+    eng.dispose()
+    lat = [x for o in out for x in o[0]]
+    return lat, sum(o[1] for o in out), sum(o[2] for o in out)
+
+
+def _setup(url, profile):
+    eng = make_engine(url, profile=profile)
+    migrate(bind=eng)
+    Session = sessionmaker(bind=eng)
+    db = Session()
+    for t in range(TENANTS):
+        db.merge(Wallet(tenant_id=f"t{t}", balance=10**9))
+    db.commit()
+    db.close()
+    eng.dispose()
+
+
+def bench(url, profile, procs, threads, seconds, write_ratio):
+    _setup(url, profile)
+    t0 = time.time()
+    with Pool(procs) as pool:
+        parts = pool.map(_proc, [(url, profile, threads, seconds, write_ratio, p) for p in range(procs)])
+    dt = time.time() - t0
+    lat = sorted(x for p in parts for x in p[0])
+
+    def pct(q):
+        return round(lat[min(len(lat) - 1, int(q * len(lat)))] * 1000, 2) if lat else None
+
+    return {
+        "profile": profile,
+        "workers": f"{procs}x{threads}",
+        "ok_ops": len(lat),
+        "ops_per_sec": round(len(lat) / dt, 1),
+        "p50_ms": pct(0.50),
+        "p99_ms": pct(0.99),
+        "database_locked": sum(p[1] for p in parts),
+        "other_errors": sum(p[2] for p in parts),
+    }
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--procs", type=int, default=4)
+    ap.add_argument("--threads", type=int, default=8)
+    ap.add_argument("--seconds", type=float, default=10)
+    ap.add_argument("--writes", type=float, default=0.5, help="fraction of operations that write")
+    ap.add_argument("--url", default=None, help="benchmark this database instead of scratch sqlite files")
+    args = ap.parse_args()
+    if args.url:
+        print(json.dumps(bench(args.url, "production", args.procs, args.threads, args.seconds, args.writes), indent=2))
+    else:
+        for profile in SQLITE_PROFILES:
+            with tempfile.TemporaryDirectory() as d:
+                url = f"sqlite:///{Path(d) / 'bench.sqlite3'}"
+                print(json.dumps(bench(url, profile, args.procs, args.threads, args.seconds, args.writes), indent=2))
@@ -0,0 +1,100 @@
+"""
+Concurrency benchmark for wallet charging.
+
+Runs N processes x M charges of 1 credit against
+  - the old JSON read-modify-write path (temp wallets.json copy), and
+  - the SQL conditional decrement (db/wallet_db.charge),
+then reports throughput and whether the final balance is exact.
+
+    python deployment/benchmark_wallet.py --procs 8 --charges 200
+"""
+import argparse
+import json
+import sys
+import tempfile
+import time
+import uuid
+from multiprocessing import Pool
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+def _json_worker(args):
+    path, tenant_id, n = args
+    p = Path(path)
+    ok = 0
+    for _ in range(n):
+        # legacy registry/wallet.charge_wallet: read whole file, edit, rewrite
+        try:
+            data = json.loads(p.read_text(encoding="utf-8"))
+        except ValueError:
+            continue  # torn read of a concurrently rewritten file: the charge fails
+        bal = int(data["tenants"][tenant_id]["credits"])
+        if bal < 1:
+            continue
+        data["tenants"][tenant_id]["credits"] = bal - 1
+        p.write_text(json.dumps(data, indent=2), encoding="utf-8")
+        ok += 1
+    return ok
+
+def _sql_worker(args):
+    tenant_id, n = args
+    from db.wallet_db import charge
+    ok = 0
+    for _ in range(n):
+        ok += 1 if charge(tenant_id, 1) else 0
+    return ok
+
+def _run(fn, jobs):
+    t0 = time.time()
+    with Pool(len(jobs)) as pool:
+        done = sum(pool.map(fn, jobs))
+    return done, time.time() - t0
+
+def bench_json(procs: int, charges: int, start: int):
+    tenant_id = "bench"
+    with tempfile.TemporaryDirectory() as d:
+        path = Path(d) / "wallets.json"
+        path.write_text(json.dumps({"tenants": {tenant_id: {"credits": start}}}), encoding="utf-8")
+        done, dt = _run(_json_worker, [(str(path), tenant_id, charges)] * procs)
+        final = json.loads(path.read_text(encoding="utf-8"))["tenants"][tenant_id]["credits"]
+    return _report(procs * charges, done, dt, start, final)
+
+def bench_sql(procs: int, charges: int, start: int):
+    from db.init_db import main as init_db
+    from db.wallet_db import set_balances, get_balance
+    from db.database import SessionLocal
+    from db.wallet_models import Wallet
+
+    init_db()
+    tenant_id = f"bench-{uuid.uuid4()}"
+    set_balances({tenant_id: start})
+    try:
+        done, dt = _run(_sql_worker, [(tenant_id, charges)] * procs)
+        final = get_balance(tenant_id)
+    finally:
+        db = SessionLocal()
+        db.query(Wallet).filter(Wallet.tenant_id == tenant_id).delete()
+        db.commit()
+        db.close()
+    return _report(procs * charges, done, dt, start, final)
+
+def _report(requested, done, dt, start, final):
+    return {
+        "charges": requested,
+        "succeeded": done,
+        "seconds": round(dt, 3),
+        "charges_per_sec": round(requested / dt, 1) if dt else None,
+        "final_balance": final,
+        "expected_balance": start - done,
+        "lost_updates": final - (start - done) if final is not None else None,
+    }
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--procs", type=int, default=8)
+    ap.add_argument("--charges", type=int, default=200)
+    args = ap.parse_args()
+    start = args.procs * args.charges * 2
+    print("json:", bench_json(args.procs, args.charges, start))
+    print("sql: ", bench_sql(args.procs, args.charges, start))
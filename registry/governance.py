@@ -1,7 +1,8 @@
 from __future__ import annotations
+import threading
 from pathlib import Path
-from typing import Dict, Any
-import json
+from typing import Dict, Any, Set, Tuple
+from registry.snapshot import Signature, read_json, signature
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 REG = BASE_DIR / "registry"
@@ -10,12 +11,85 @@ TENANT_INSTALLS = REG / "tenant_installs.json"
 APPROVALS = REG / "approvals.json"
 LOCKS = REG / "locks.json"
 
-def _read(path: Path, default):
-    if not path.exists():
-        path.parent.mkdir(parents=True, exist_ok=True)
-        path.write_text(json.dumps(default, indent=2), encoding="utf-8")
-        return default
-    return json.loads(path.read_text(encoding="utf-8"))
+class GovernanceIndex:
+    """
+    Precomputed lookups for enforce():
+      installed  (tenant_id, skill_id) -> installed version
+      approved   {(skill_id, version)}
+      locks      skill_id -> locked version
+    Each part remembers the signature of the file it was built from and is
+    rebuilt only when that file changed behind our back (another worker).
+    Writers in this process patch it in place through the note_* hooks; they
+    pass the file signature taken before their write, and the stored signature
+    only advances if nobody else changed the file since our last build.
+    """
+
+    def __init__(self):
+        self.installed: Dict[Tuple[str, str], str] = {}
+        self.approved: Set[Tuple[str, str]] = set()
+        self.locks: Dict[str, str] = {}
+        self._sigs: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _build_installed(self) -> None:
+        data = read_json(TENANT_INSTALLS, {"tenants": {}})
+        self.installed = {
+            (tenant_id, skill_id): version
+            for tenant_id, t in data.get("tenants", {}).items()
+            for skill_id, version in (t.get("installed") or {}).items()
+        }
+
+    def _build_approved(self) -> None:
+        data = read_json(APPROVALS, {"approved": []})
+        self.approved = {(a.get("skill_id"), a.get("version")) for a in data.get("approved", [])}
+
+    def _build_locks(self) -> None:
+        data = read_json(LOCKS, {"locks": {}})
+        self.locks = {k: v.get("locked_version") for k, v in data.get("locks", {}).items() if v and v.get("locked_version")}
+
+    def refresh(self) -> "GovernanceIndex":
+        for path, build in ((TENANT_INSTALLS, self._build_installed),
+                            (APPROVALS, self._build_approved),
+                            (LOCKS, self._build_locks)):
+            sig = signature(path)
+            if self._sigs.get(path.name) != sig:
+                with self._lock:
+                    build()
+                    # signature from before the read: a change during build() forces another rebuild
+                    self._sigs[path.name] = sig
+        return self
+
+    def _advance(self, path: Path, before: Signature) -> None:
+        if self._sigs.get(path.name) == before:
+            self._sigs[path.name] = signature(path)
+        else:
+            # file changed behind our back since the last build: rebuild on next refresh()
+            self._sigs.pop(path.name, None)
+
+    # --- incremental updates, called right after the owning module wrote the file;
+    #     `before` is signature(file) taken just before that write ---
+    def note_install(self, tenant_id: str, skill_id: str, version: str | None, before: Signature) -> None:
+        with self._lock:
+            if version:
+                self.installed[(tenant_id, skill_id)] = version
+            else:
+                self.installed.pop((tenant_id, skill_id), None)
+            self._advance(TENANT_INSTALLS, before)
+
+    def note_approval(self, skill_id: str, version: str, before: Signature) -> None:
+        with self._lock:
+            self.approved.add((skill_id, version))
+            self._advance(APPROVALS, before)
+
+    def note_lock(self, skill_id: str, version: str | None, before: Signature) -> None:
+        with self._lock:
+            if version:
+                self.locks[skill_id] = version
+            else:
+                self.locks.pop(skill_id, None)
+            self._advance(LOCKS, before)
+
+INDEX = GovernanceIndex()
 
 def enforce(tenant_id: str, skill_id: str) -> Dict[str, Any]:
     """
@@ -25,20 +99,15 @@ def enforce(tenant_id: str, skill_id: str) -> Dict[str, Any]:
     - if locked version exists, must match installed version
     Returns: {"installed_version": "..."}
     """
-    installs = _read(TENANT_INSTALLS, {"tenants": {}})
-    t = installs.get("tenants", {}).get(tenant_id, {})
-    installed = t.get("installed", {})
-    version = installed.get(skill_id)
+    idx = INDEX.refresh()
+    version = idx.installed.get((tenant_id, skill_id))
     if not version:
         raise ValueError(f"Skill not installed for tenant: {tenant_id} -> {skill_id}")
 
-    approvals = _read(APPROVALS, {"approved": []})
-    ok = any(a.get("skill_id") == skill_id and a.get("version") == version for a in approvals.get("approved", []))
-    if not ok:
+    if (skill_id, version) not in idx.approved:
         raise ValueError(f"Skill version not approved: {skill_id}@{version}")
 
-    locks = _read(LOCKS, {"locks": {}})
-    locked = locks.get("locks", {}).get(skill_id, {}).get("locked_version")
+    locked = idx.locks.get(skill_id)
     if locked and locked != version:
         raise ValueError(f"Skill locked to version {locked} (installed {version})")
 
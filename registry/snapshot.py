@@ -0,0 +1,85 @@
+"""
+Read-through snapshot cache for registry/*.json.
+
+read_json() parses a file once and serves the parsed object until the file's
+(mtime, size, inode) changes on disk or write_json() bumps its in-process generation.
+The returned object is shared: treat it as read-only, or pass mutable=True
+to get a private deep copy for read-modify-write.
+"""
+from __future__ import annotations
+import copy
+import json
+import os
+import threading
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+Signature = Tuple[int, int, int, int]   # (mtime_ns, size, inode, generation)
+
+_lock = threading.Lock()
+_cache: Dict[str, Tuple[Signature, Any]] = {}
+_generation: Dict[str, int] = defaultdict(int)
+_stats: Dict[str, Dict[str, int]] = defaultdict(lambda: {"hits": 0, "misses": 0, "writes": 0})
+
+
+def signature(path: Path) -> Signature:
+    """Cheap change token for a registry file (one stat call)."""
+    key = str(path)
+    try:
+        st = os.stat(key)
+    except FileNotFoundError:
+        return (-1, -1, -1, _generation[key])
+    # write_json replaces the file, so a same-size rewrite within the mtime granularity still gets a new inode
+    return (st.st_mtime_ns, st.st_size, st.st_ino, _generation[key])
+
+
+def read_json(path: Path, default: Any, mutable: bool = False) -> Any:
+    key = str(path)
+    sig = signature(path)
+    if sig[0] == -1:
+        write_json(path, default, indent=2, ensure_ascii=True)
+        return copy.deepcopy(default) if mutable else default
+
+    item = _cache.get(key)
+    if item is not None and item[0] == sig:
+        _stats[key]["hits"] += 1
+        data = item[1]
+    else:
+        _stats[key]["misses"] += 1
+        data = json.loads(path.read_text(encoding="utf-8"))
+        with _lock:
+            _cache[key] = (sig, data)
+    return copy.deepcopy(data) if mutable else data
+
+
+def write_json(path: Path, data: Any, indent: int | None = 2, ensure_ascii: bool = False) -> None:
+    key = str(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # atomic replace: other readers see either the old or the new file, never a partial one
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_text(json.dumps(data, indent=indent, ensure_ascii=ensure_ascii), encoding="utf-8")
+    with _lock:
+        os.replace(tmp, path)
+        _generation[key] += 1
+        _stats[key]["writes"] += 1
+        _cache[key] = (signature(path), data)
+
+
+def invalidate(path: Path | None = None) -> None:
+    with _lock:
+        if path is None:
+            _cache.clear()
+        else:
+            _cache.pop(str(path), None)
+
+
+def stats() -> Dict[str, Any]:
+    files = {Path(k).name: dict(v) for k, v in _stats.items()}
+    return {
+        "hits": sum(v["hits"] for v in files.values()),
+        "misses": sum(v["misses"] for v in files.values()),
+        "writes": sum(v["writes"] for v in files.values()),
+        "cached_files": len(_cache),
+        "files": files,
+    }
@@ -0,0 +1,45 @@
+"""
+Audit partition maintenance (db/audit_partitions.py) outside the API process.
+
+    python scripts/audit_partitions.py                       # status
+    python scripts/audit_partitions.py --close --retention   # what the API's background thread does
+    python scripts/audit_partitions.py --read 2026-02-12 --tenant t1 --limit 20
+
+--close archives every partition that ended more than AUDIT_CLOSE_GRACE_SEC ago
+and still has rows in audit_logs (late rows are appended to its archive); --retention drops archives / rollups past their configured age.
+"""
+import argparse
+import json
+import sys
+from itertools import islice
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from db.audit_partitions import AUDIT_PARTITIONS  # noqa: E402
+from db.migrations import migrate  # noqa: E402
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--close", action="store_true")
+    ap.add_argument("--retention", action="store_true")
+    ap.add_argument("--read", metavar="PERIOD", default=None, help="print rows of an archived partition")
+    ap.add_argument("--tenant", default=None)
+    ap.add_argument("--since", default=None)
+    ap.add_argument("--until", default=None)
+    ap.add_argument("--limit", type=int, default=50)
+    args = ap.parse_args()
+
+    migrate()
+    out = {}
+    if args.close:
+        out["closed"] = AUDIT_PARTITIONS.close_due()
+    if args.retention:
+        out["removed"] = AUDIT_PARTITIONS.apply_retention()
+    if args.read:
+        match = {"tenant_id": args.tenant} if args.tenant else {}
+        rows = AUDIT_PARTITIONS.read_archive(args.read, since=args.since, until=args.until, **match)
+        out["logs"] = list(islice(rows, args.limit))
+    out["status"] = AUDIT_PARTITIONS.stats()
+    print(json.dumps(out, indent=2))
@@ -0,0 +1,34 @@
+"""
+Recompute the per-user / per-tenant review stats from the review log.
+
+    python scripts/backfill_review_stats.py                 # rebuild registry/review_stats.json
+    python scripts/backfill_review_stats.py --user u1       # ... and print one user's features
+    python scripts/backfill_review_stats.py --tenant t1     # ... or one tenant's
+
+Also creates the log (importing registry/reviews.json) on first run.
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from api.review_log import REVIEW_LOG  # noqa: E402
+from api.review_stats import REVIEW_STATS  # noqa: E402
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--user", action="append", default=[])
+    ap.add_argument("--tenant", action="append", default=[])
+    args = ap.parse_args()
+
+    REVIEW_LOG.ensure()
+    n = REVIEW_STATS.rebuild()
+    out = {"reviews": n, **REVIEW_STATS.stats()}
+    if args.user:
+        out["user_stats"] = {u: REVIEW_STATS.user(u) for u in args.user}
+    if args.tenant:
+        out["tenant_stats"] = {t: REVIEW_STATS.tenant(t) for t in args.tenant}
+    print(json.dumps(out, indent=2))
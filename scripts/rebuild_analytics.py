@@ -0,0 +1,38 @@
+"""
+Usage / audit analytics rollups (db/analytics_rollups.py) outside the API process.
+
+    python scripts/rebuild_analytics.py                # roll up new rows (what the API thread does)
+    python scripts/rebuild_analytics.py --rebuild      # drop buckets and recompute from usage_events / audit_logs
+    python scripts/rebuild_analytics.py --top audit route error_rate --since 2026-02-12T00:00:00Z
+
+--rebuild recomputes all usage buckets, but audit buckets only from the end of
+the last closed audit partition (what audit_logs still holds); older audit
+buckets are kept as they are.
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from db.analytics_rollups import ANALYTICS_ROLLUPS  # noqa: E402
+from db.migrations import migrate  # noqa: E402
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rebuild", action="store_true")
+    ap.add_argument("--top", nargs=3, metavar=("SOURCE", "BY", "METRIC"), default=None)
+    ap.add_argument("--since", default=None)
+    ap.add_argument("--until", default=None)
+    ap.add_argument("-n", type=int, default=10)
+    args = ap.parse_args()
+
+    migrate()
+    out = {"watermarks": ANALYTICS_ROLLUPS.rebuild() if args.rebuild else ANALYTICS_ROLLUPS.roll()}
+    out["removed"] = ANALYTICS_ROLLUPS.apply_retention()
+    if args.top:
+        source, by, metric = args.top
+        out["top"] = ANALYTICS_ROLLUPS.top(source, by, metric, n=args.n, since=args.since, until=args.until)
+    print(json.dumps(out, indent=2))
@@ -0,0 +1,86 @@
+"""
+Compare tenant balances across the legacy JSON wallets and the SQL wallets table.
+
+    python scripts/reconcile_wallets.py                     # report only
+    python scripts/reconcile_wallets.py --apply             # write the chosen balance to SQL
+    python scripts/reconcile_wallets.py --apply --strategy registry
+
+Sources:
+    registry    registry/wallets.json          {"tenants": {"tenant": {"credits": n}}}
+    tenant      registry/tenant_wallets.json   {"tenants": {"tenant": {"credits": n}}}
+    telemetry   logs/wallet.json               {"tenants": {"tenant": {"credits_total", "credits_used"}}}
+    sql         wallets table (source of truth)
+
+Strategy "min" (default) picks the lowest known balance, so nothing spent in any
+store is handed back.
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from db.init_db import main as init_db  # noqa: E402
+from api import wallet_service  # noqa: E402
+
+STRATEGIES = ("min", "max", "sql", "registry", "tenant", "telemetry")
+
+
+def _load(path: Path):
+    if not path.exists():
+        return {}
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except Exception:
+        return {}
+
+
+def legacy_balances():
+    out = {"registry": {}, "tenant": {}, "telemetry": {}}
+    for tid, w in _load(ROOT / "registry" / "wallets.json").get("tenants", {}).items():
+        out["registry"][tid] = int(w.get("credits", 0))
+    for tid, w in _load(ROOT / "registry" / "tenant_wallets.json").get("tenants", {}).items():
+        out["tenant"][tid] = int(w.get("credits", 0))
+    for tid, w in _load(ROOT / "logs" / "wallet.json").get("tenants", {}).items():
+        out["telemetry"][tid] = int(w.get("credits_total", 0)) - int(w.get("credits_used", 0))
+    return out
+
+
+def reconcile(strategy: str = "min"):
+    sources = legacy_balances()
+    sources["sql"] = wallet_service.get_backend().all_balances()
+    tenants = sorted(set().union(*(s.keys() for s in sources.values())))
+
+    report = []
+    for tid in tenants:
+        seen = {name: s[tid] for name, s in sources.items() if tid in s}
+        if strategy == "min":
+            target = min(seen.values())
+        elif strategy == "max":
+            target = max(seen.values())
+        else:
+            target = seen.get(strategy, seen.get("sql"))
+        report.append({
+            "tenant_id": tid,
+            "sources": seen,
+            "target": target,
+            "consistent": len(set(seen.values())) == 1,
+        })
+    return report
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--strategy", choices=STRATEGIES, default="min")
+    ap.add_argument("--apply", action="store_true", help="write target balances to the wallet service")
+    args = ap.parse_args()
+
+    init_db()
+    report = reconcile(args.strategy)
+    result = {"strategy": args.strategy, "tenants": report}
+    if args.apply:
+        targets = {r["tenant_id"]: r["target"] for r in report if r["target"] is not None}
+        result["applied"] = wallet_service.get_backend().set_balances(targets, overwrite=True)
+    print(json.dumps(result, indent=2))
@@ -0,0 +1,27 @@
+"""
+Re-rate billing ledger events with the current (or a given) billing policy.
+
+    python scripts/rerate_ledger.py --since 2026-01-01T00:00:00Z --until 2026-01-31T23:59:59Z --dry-run
+    python scripts/rerate_ledger.py --since 2026-01-01T00:00:00Z --policy new_policy.json
+
+Prints totals before/after. Without --dry-run, affected segments get a new
+revision and the billing rollups are updated (check with scripts/verify_rollups.py).
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from api.billing_rerate import rerate  # noqa: E402
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--since", help="ISO timestamp, inclusive")
+    ap.add_argument("--until", help="ISO timestamp, inclusive")
+    ap.add_argument("--policy", help="billing policy JSON (default: registry/billing_policy.json)")
+    ap.add_argument("--dry-run", action="store_true")
+    args = ap.parse_args()
+    policy = json.loads(Path(args.policy).read_text(encoding="utf-8")) if args.policy else None
+    print(json.dumps(rerate(args.since, args.until, policy=policy, dry_run=args.dry_run), indent=2))
@@ -0,0 +1,72 @@
+"""
+Check the materialized billing rollups against a full scan of the ledger.
+
+    python scripts/verify_rollups.py             # exit 1 on any mismatch
+    python scripts/verify_rollups.py --rebuild   # recompute rollups from the ledger first
+"""
+import argparse
+import json
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from api.ledger_store import LEDGER  # noqa: E402
+from api.billing_rollups import ROLLUPS, scan, micros, usd, EVENTS, CREDITS, GROSS, FEE, NET  # noqa: E402
+
+
+def _totals(events, field):
+    out = defaultdict(lambda: [0, 0, 0, 0, 0])
+    for e in events:
+        t = out[e.get(field) if field else None]
+        t[EVENTS] += 1
+        t[CREDITS] += int(e.get("credits", 0))
+        t[GROSS] += micros(e.get("gross_usd"))
+        t[FEE] += micros(e.get("platform_fee_usd"))
+        t[NET] += micros(e.get("developer_net_usd"))
+    return out
+
+
+def verify():
+    rolled = ROLLUPS.groups()
+    events = list(LEDGER.iter_events())
+    reference = scan(events)
+    problems = []
+
+    for k in sorted(set(rolled) | set(reference)):
+        if rolled.get(k) != reference.get(k):
+            problems.append({"group": list(k), "rollup": rolled.get(k), "scan": reference.get(k)})
+
+    # dashboards vs direct per-event sums
+    for tid, t in _totals(events, "tenant_id").items():
+        d = ROLLUPS.tenant(tid)
+        if (d["total_events"], d["total_credits_used"], d["total_spend_usd"]) != (t[EVENTS], t[CREDITS], usd(t[GROSS])):
+            problems.append({"tenant_id": tid, "dashboard": d, "scan": t})
+    for did, t in _totals(events, "developer_id").items():
+        d = ROLLUPS.developer(did)
+        if (d["total_events"], d["gross_usd"], d["platform_fee_usd"], d["net_usd"]) != (t[EVENTS], usd(t[GROSS]), usd(t[FEE]), usd(t[NET])):
+            problems.append({"developer_id": did, "dashboard": d, "scan": t})
+    t = _totals(events, None)[None]
+    p = ROLLUPS.platform()
+    if (p["total_events"], p["gross_usd"], p["platform_fee_usd"], p["developer_net_usd"]) != (t[EVENTS], usd(t[GROSS]), usd(t[FEE]), usd(t[NET])):
+        problems.append({"platform": p, "scan": t})
+
+    return {
+        "ok": not problems,
+        "events": len(events),
+        "groups": len(reference),
+        "watermark": list(ROLLUPS.watermark()),
+        "mismatches": problems[:50],
+    }
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rebuild", action="store_true")
+    args = ap.parse_args()
+    if args.rebuild:
+        ROLLUPS.rebuild()
+    result = verify()
+    print(json.dumps(result, indent=2))
+    sys.exit(0 if result["ok"] else 1)
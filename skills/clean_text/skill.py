@@ -15,7 +15,7 @@ class CleanTextSkill(SkillBase):
         "type":"object",
         "properties":{"cleaned":{"type":"string"},"_credits":{"type":"integer"}},
         "required":["cleaned","_credits"],
-        "additionalProperties":True
+        "additionalProperties":False
     }
 
     def execute(self, ctx, inp):
@@ -14,7 +14,7 @@ class DecisionClassifierSkill(SkillBase):
         "type":"object",
         "properties":{"decision":{"type":"string"},"reason":{"type":"string"},"_credits":{"type":"integer"}},
         "required":["decision","reason","_credits"],
-        "additionalProperties":True
+        "additionalProperties":False
     }
 
     def execute(self, ctx, inp):
@@ -16,7 +16,7 @@ class JsonExtractSkill(SkillBase):
         "type":"object",
         "properties":{"json_objects":{"type":"array","items":{"type":"object"}},"_credits":{"type":"integer"}},
         "required":["json_objects","_credits"],
-        "additionalProperties":True
+        "additionalProperties":False
     }
 
     def execute(self, ctx, inp):
@@ -18,7 +18,7 @@ class KeywordExtractSkill(SkillBase):
         "type":"object",
         "properties":{"keywords":{"type":"array","items":{"type":"string"}},"_credits":{"type":"integer"}},
         "required":["keywords","_credits"],
-        "additionalProperties":True
+        "additionalProperties":False
     }
 
     def execute(self, ctx, inp):
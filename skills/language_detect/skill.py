@@ -14,7 +14,7 @@ class LanguageDetectSkill(SkillBase):
         "type":"object",
         "properties":{"lang":{"type":"string"},"confidence":{"type":"number"},"_credits":{"type":"integer"}},
         "required":["lang","confidence","_credits"],
-        "additionalProperties":True
+        "additionalProperties":False
     }
 
     def execute(self, ctx, inp):
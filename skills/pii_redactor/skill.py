@@ -18,7 +18,7 @@ class PiiRedactorSkill(SkillBase):
         "type":"object",
         "properties":{"redacted":{"type":"string"},"_credits":{"type":"integer"}},
         "required":["redacted","_credits"],
-        "additionalProperties":True
+        "additionalProperties":False
     }
 
     def execute(self, ctx, inp):
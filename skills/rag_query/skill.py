@@ -35,7 +35,7 @@ class RagQuerySkill(SkillBase):
             "_credits": {"type": "integer"}
         },
         "required": ["answer", "citations", "_credits"],
-        "additionalProperties": True
+        "additionalProperties": False
     }
 
     def execute(self, ctx, inp):
@@ -17,7 +17,7 @@ class SentimentScoreSkill(SkillBase):
         "type":"object",
         "properties":{"score":{"type":"number"},"label":{"type":"string"},"_credits":{"type":"integer"}},
         "required":["score","label","_credits"],
-        "additionalProperties":True
+        "additionalProperties":False
     }
 
     def execute(self, ctx, inp):
@@ -28,7 +28,7 @@ class SummarizeSkill(SkillBase):
             "_credits": {"type": "integer"}
         },
         "required": ["summary", "_credits"],
-        "additionalProperties": True
+        "additionalProperties": False
     }
 
     def execute(self, ctx, inp):
@@ -28,7 +28,7 @@ class TranslateSkill(SkillBase):
             "_credits": {"type": "integer"}
         },
         "required": ["translated_text", "_credits"],
-        "additionalProperties": True
+        "additionalProperties": False
     }
 
     def execute(self, ctx, inp):
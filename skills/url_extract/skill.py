@@ -17,7 +17,7 @@ class UrlExtractSkill(SkillBase):
         "type":"object",
         "properties":{"urls":{"type":"array","items":{"type":"string"}},"_credits":{"type":"integer"}},
         "required":["urls","_credits"],
-        "additionalProperties":True
+        "additionalProperties":False
     }
 
     def execute(self, ctx, inp):